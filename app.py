@@ -1,15 +1,16 @@
 # app.py
 import streamlit as st
+import json
 import time
 from pathlib import Path
 from configg import get_secret
 
 # ---- Import your project modules ----
-from clickup_extractor import ClickUpTaskExtractor
-from figma_extractor import FigmaPrototypeAnalyzer
-from data_preprocessor import Preprocessor
-from summarizer.run_summarizer import run_summarizer
-from story_generator.run_story_generator import run_story_generation
+# The pipeline itself runs in worker processes (see worker_pool.py)
+from job_queue import JobQueue
+from prefetch import Prefetcher
+from worker_pool import WorkerPool
+from tracing import waterfall_rows
 
 # ---- Streamlit Page Config ----
 st.set_page_config(
@@ -27,6 +28,114 @@ except ValueError as e:
     st.info("**Local Development:** Add credentials to `.env` file\n\n**Streamlit Cloud:** Configure in Settings → Secrets")
     st.stop()
 
+POLL_SECONDS = 1.5
+
+STAGE_MESSAGES = {
+    "fetching": " Fetching data from ClickUp and Figma... Please wait.",
+    "preprocessing": "⚙️ Preprocessing data...",
+    "summarizing": "🔍 Summarizing Figma Screens...",
+    "generating": "📄 Generating Confluence Story Document...",
+}
+
+
+@st.cache_resource
+def get_job_queue() -> JobQueue:
+    return JobQueue()
+
+
+@st.cache_resource
+def get_worker_pool() -> WorkerPool:
+    """One worker pool per Streamlit server process, shared by all sessions."""
+    return WorkerPool(num_workers=int(get_secret("STORY_WORKERS", 2))).start()
+
+
+def get_prefetcher() -> Prefetcher:
+    """Per-session background fetches of the inputs typed so far."""
+    if "prefetcher" not in st.session_state:
+        st.session_state["prefetcher"] = Prefetcher(CLICKUP_TOKEN, FIGMA_TOKEN)
+    return st.session_state["prefetcher"]
+
+
+PREFETCH_LABELS = {"running": "loading…", "ready": "ready", "failed": "will be fetched on generate"}
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_document(path: str) -> bytes:
+    """Document bytes for the download button. Artifacts are content-addressed, so a path never changes contents."""
+    return Path(path).read_bytes()
+
+
+def render_timing_breakdown(trace_file: str):
+    """Waterfall of the run's spans (stages, HTTP calls, LLM calls) from its exported trace."""
+    try:
+        rows = waterfall_rows(json.loads(Path(trace_file).read_text(encoding="utf-8")))
+    except (OSError, ValueError):
+        return
+    if not rows:
+        return
+    # Only needed once a job has finished, so kept off the first-paint path
+    import altair as alt
+    import pandas as pd
+
+    with st.expander("⏱️ Timing breakdown"):
+        df = pd.DataFrame(rows)
+        chart = alt.Chart(df).mark_bar().encode(
+            x=alt.X("start_ms:Q", title="ms since start"),
+            x2="end_ms:Q",
+            y=alt.Y("span:N", sort=alt.EncodingSortField(field="row"), title=None),
+            color=alt.condition("datum.error", alt.value("#d62728"), alt.value("#4c78a8")),
+            tooltip=["span", "duration_ms", "start_ms"],
+        ).properties(height=max(200, 18 * len(df)))
+        st.altair_chart(chart, use_container_width=True)
+        st.dataframe(df[["span", "start_ms", "duration_ms", "error"]], use_container_width=True, hide_index=True)
+
+
+def job_events(job_id: str) -> list:
+    """All events of a job so far; only the new ones are read from the queue on each poll."""
+    state = st.session_state.get("job_events")
+    if not state or state["job_id"] != job_id:
+        state = {"job_id": job_id, "seq": 0, "events": []}
+    new = job_queue.events(job_id, after=state["seq"])
+    if new:
+        state["events"].extend(new)
+        state["seq"] = new[-1]["seq"]
+    st.session_state["job_events"] = state
+    return state["events"]
+
+
+def render_partial_results(job_id: str, stage: str):
+    """Frames, screen summaries and generated rows reported by the worker so far."""
+    frames, screens, rows = [], {}, {}
+    for event in job_events(job_id):
+        payload = event["payload"]
+        if event["kind"] == "frames":
+            frames = payload["frames"]
+        elif event["kind"] == "screen":
+            screens[payload["frame_id"]] = payload
+        elif event["kind"] == "row":
+            rows[payload["frame_id"]] = payload
+
+    latest = {"summarizing": screens, "generating": rows}.get(stage)
+    if latest:
+        last = max(latest.values(), key=lambda p: p["done"])
+        st.progress(last["done"] / max(last["total"], 1), text=f"{last['done']}/{last['total']} screens")
+    if frames and not screens:
+        st.caption(f"{len(frames)} frames: " + ", ".join(f["screen_name"] or f["node_id"] for f in frames))
+
+    names = {f["node_id"]: f["screen_name"] for f in frames}
+    for frame_id, screen in screens.items():
+        row = rows.get(frame_id)
+        title = row["heading"] if row else names.get(frame_id) or frame_id
+        with st.expander(f"✅ {title}" if row else title):
+            st.write(screen["frame_summary"] or "_No summary_")
+            if row:
+                st.markdown("**Business rules**")
+                st.text(row["business_rules"])
+
+
+job_queue = get_job_queue()
+get_worker_pool().ensure_alive()
+
 # ---- Custom CSS for beauty ----
 st.markdown("""
 <style>
@@ -71,7 +180,31 @@ with col2:
     figma_file_key = st.text_input("🔹 Figma File Key", placeholder="e.g., WPOfKpvJOgFbWQ1PX6U8sQ")
 
 with col3:
-    figma_node_id = st.text_input("🔹 Figma Node ID", placeholder="e.g., 1677:9265")
+    figma_node_id = st.text_input("🔹 Figma Node ID(s)", placeholder="e.g., 1677:9265, 1677:9300")
+
+# ---- Prefetch ----
+# Start fetching ClickUp and Figma as soon as their fields are valid, unless a job is already in progress
+prefetcher = get_prefetcher()
+current_job_id = st.session_state.get("job_id") or st.query_params.get("job")
+current_job = job_queue.get(current_job_id) if current_job_id else None
+if not (current_job and current_job["status"] in ("queued", "running")):
+    prefetcher.update(clickup_task_id, figma_file_key, figma_node_id)
+    statuses = [
+        f"{label} {PREFETCH_LABELS[status]}"
+        for label, status in (("ClickUp task", prefetcher.status("clickup")), ("Figma frames", prefetcher.status("figma")))
+        if status
+    ]
+    if statuses:
+        st.caption(" · ".join(statuses))
+
+OUTPUT_OPTIONS = {"Word document (DOCX)": "docx", "Confluence page": "confluence"}
+default_backend = str(get_secret("OUTPUT_BACKEND", "docx")).strip().lower()
+output_label = st.radio(
+    "Output",
+    list(OUTPUT_OPTIONS),
+    index=list(OUTPUT_OPTIONS.values()).index(default_backend) if default_backend in OUTPUT_OPTIONS.values() else 0,
+    horizontal=True,
+)
 
 # ---- Button ----
 st.markdown("---")
@@ -82,40 +215,61 @@ if generate_btn:
     if not (clickup_task_id and figma_file_key and figma_node_id):
         st.error(" Please fill in all three fields before proceeding.")
     else:
+        job_id = job_queue.enqueue({
+            "clickup_task_id": clickup_task_id,
+            "figma_file_key": figma_file_key,
+            "figma_node_id": figma_node_id,
+            "prefetched": prefetcher.take(),
+            "output_backend": OUTPUT_OPTIONS[output_label],
+        })
+        st.session_state["job_id"] = job_id
+        # Keep the job id in the URL so a browser refresh picks the run back up
+        st.query_params["job"] = job_id
+
+# ---- Job Status (polled) ----
+active_job_id = st.session_state.get("job_id") or st.query_params.get("job")
+if active_job_id:
+    job = job_queue.get(active_job_id)
+    if job is None:
+        st.warning(" Job not found. It may have been removed.")
+        st.query_params.clear()
+        st.session_state.pop("job_id", None)
+    elif job["status"] in ("queued", "running"):
+        if job["status"] == "queued":
+            st.info(f"⏳ Job queued ({job_queue.position(active_job_id)} ahead of you)...")
+        else:
+            st.info(STAGE_MESSAGES.get(job["stage"], "⏳ Starting..."))
+            render_partial_results(active_job_id, job["stage"])
+        if st.button("✖ Cancel", key="cancel_job"):
+            job_queue.cancel(active_job_id)
+            st.rerun()
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+    elif job["status"] == "cancelled":
+        st.warning("Story generation was cancelled.")
+    elif job["status"] == "failed":
+        error_text = job["error"] or ""
+        st.error(f" An error occurred: {error_text.splitlines()[0] if error_text else 'unknown error'}")
+        with st.expander("Details"):
+            st.code(error_text)  # Shows full traceback in development
+    elif job["result"].get("page_url"):
+        st.success("✅ Story published to Confluence!")
+        st.markdown(f"[Open the Confluence page]({job['result']['page_url']})")
+        if job["result"].get("trace_file"):
+            render_timing_breakdown(job["result"]["trace_file"])
+    else:
+        output_file = job["result"]["output_file"]
+        st.success("✅ Story generated successfully!")
         try:
-            with st.spinner(" Fetching data from ClickUp and Figma... Please wait."):
-                # Step 1: Fetch data from ClickUp and Figma
-                clickup_extractor = ClickUpTaskExtractor(CLICKUP_TOKEN)
-                clickup_data = clickup_extractor.fetch_task_enhanced(clickup_task_id)
-
-                figma_extractor = FigmaPrototypeAnalyzer(FIGMA_TOKEN, figma_file_key, figma_node_id)
-                figma_data = figma_extractor.run_extraction()  
-                time.sleep(1)
-
-            with st.spinner("⚙️ Preprocessing data..."):
-                preprocessor = Preprocessor(clickup_data, figma_data, save_clickup=False)
-                processed_data = preprocessor.run_all()
-                preprocessed_clickup = processed_data["clickup_processed"]
-                preprocessed_figma = processed_data["figma_processed"]
-                time.sleep(1)
-
-            with st.spinner("🔍 Summarizing Figma Screens..."):
-                summarized_figma_data = run_summarizer(preprocessed_figma)
-                time.sleep(1)
-
-            with st.spinner("📄 Generating Confluence Story Document..."):
-                output_file = run_story_generation(preprocessed_clickup, summarized_figma_data)
-                time.sleep(1)
-
-            st.success("✅ Story generated successfully!")
             st.download_button(
                 label="📥 Download Generated DOCX",
-                data=open(output_file, "rb").read(),
-                file_name=Path(output_file).name,
+                data=load_document(output_file),
+                file_name=f"confluence_story_{Path(output_file).stem[:12]}.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
             )
-        except Exception as e:
-            st.error(f" An error occurred: {str(e)}")
-            st.exception(e)  # Shows full traceback in development
+        except FileNotFoundError:
+            st.warning("This document has been evicted from the artifact store. Generate it again to download it.")
+        if job["result"].get("trace_file"):
+            render_timing_breakdown(job["result"]["trace_file"])
 
 st.markdown('<div class="footer">Built with ❤️ using Streamlit and Azure OpenAI</div>', unsafe_allow_html=True)
\ No newline at end of file
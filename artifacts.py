@@ -0,0 +1,102 @@
+# artifacts.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_DIR = os.path.join("data", "artifacts")
+
+
+def artifact_key(*inputs: Any) -> str:
+    """Content hash of JSON-serializable inputs; equal inputs give the same key regardless of dict order."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for generated documents: `<key><suffix>` files
+    under `base_dir`, where the key is a hash of everything that went into
+    the document (see artifact_key). Identical regenerations can be served
+    from here, and every document gets a unique, collision-free name.
+
+    Files older than `max_age` seconds are evicted, then the least recently
+    used ones until the store is under `max_bytes`. Eviction runs on every put.
+    """
+
+    def __init__(
+        self,
+        base_dir: str = DEFAULT_ARTIFACT_DIR,
+        max_bytes: int = 500 * 2**20,
+        max_age: float = 30 * 24 * 3600,
+        suffix: str = ".docx",
+    ):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(base_dir, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.base_dir, f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of the stored artifact, or None. A hit counts as a use for eviction."""
+        path = self.path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store `data` under `key` (atomically) and return its path."""
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Apply the age and size limits; returns the number of files removed. `keep` is never removed."""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.base_dir):
+                path = os.path.join(self.base_dir, name)
+                if not name.endswith(self.suffix) or path == keep:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            if keep and os.path.exists(keep):
+                total += os.path.getsize(keep)
+
+            removed = 0
+            for mtime, size, path in sorted(entries):
+                if now - mtime <= self.max_age and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+
+        if removed:
+            log.info(f"Evicted {removed} artifacts from {self.base_dir}")
+        return removed
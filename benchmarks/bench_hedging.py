@@ -0,0 +1,75 @@
+# benchmarks/bench_hedging.py
+"""
+Compare AzureVisionClient latency with and without request hedging against a
+local fake Azure server with heavy-tailed delays.
+
+    python -m benchmarks.bench_hedging --calls 300 --percentile 95
+"""
+import time
+import random
+import argparse
+import statistics
+
+from benchmarks.fake_azure import FakeAzureServer, heavy_tailed_delay
+from summarizer.azure_client import AzureVisionClient
+from summarizer.hedging import Hedger
+
+
+def _percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def run(endpoint: str, calls: int, hedger=None) -> dict:
+    client = AzureVisionClient(
+        model_name="fake",
+        api_key="fake-key",
+        azure_endpoint=endpoint,
+        api_version="2024-12-01-preview",
+        hedger=hedger,
+    )
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        client.summarize(f"https://example.com/image_{i}.png", "system", "user", max_retries=1, timeout=60)
+        latencies.append(time.perf_counter() - start)
+
+    result = {
+        "calls": calls,
+        "mean": statistics.mean(latencies),
+        "p50": _percentile(latencies, 50),
+        "p90": _percentile(latencies, 90),
+        "p99": _percentile(latencies, 99),
+        "max": max(latencies),
+    }
+    if hedger:
+        result.update(hedger.stats)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--max-hedge-ratio", type=float, default=0.1)
+    parser.add_argument("--min-delay", type=float, default=0.05, help="Never hedge earlier than this (seconds)")
+    parser.add_argument("--base-delay", type=float, default=0.05)
+    parser.add_argument("--alpha", type=float, default=1.3, help="Pareto shape; lower means heavier tail")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    with FakeAzureServer(delay_fn=heavy_tailed_delay(args.base_delay, args.alpha)) as server:
+        baseline = run(server.endpoint, args.calls)
+        hedged = run(server.endpoint, args.calls, Hedger(
+            percentile=args.percentile, max_hedge_ratio=args.max_hedge_ratio, min_delay=args.min_delay
+        ))
+
+    print(f"{'':10}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for name, res in (("baseline", baseline), ("hedged", hedged)):
+        print(f"{name:10}" + "".join(f"{res[k]:9.3f}" for k in ("mean", "p50", "p90", "p99", "max")))
+    print(f"hedged {hedged['hedged']}/{hedged['calls']} calls, hedge won {hedged['hedge_wins']}")
+
+
+if __name__ == "__main__":
+    main()
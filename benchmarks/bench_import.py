@@ -0,0 +1,114 @@
+# benchmarks/bench_import.py
+"""
+Import-time budget for the Streamlit app's cold start, from `-X importtime`.
+
+Each target is imported in a fresh interpreter; the report shows total import
+time and the slowest packages by cumulative time.
+
+    python -m benchmarks.bench_import            # report
+    python -m benchmarks.bench_import --check    # exit 1 if over budget (for CI)
+
+The "first_paint" target is everything app.py imports before it renders the
+form. Its budget covers Streamlit itself plus our own modules; "app_modules"
+is the share of that which comes from this repo. The pipeline target is
+informational: it only loads in worker processes.
+"""
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List
+
+TARGETS = {
+    "first_paint": "import streamlit, configg, job_queue, prefetch, worker_pool, tracing",
+    "pipeline": "import pipeline",
+}
+
+# Milliseconds
+BUDGETS = {
+    "first_paint": 1500,
+    "app_modules": 50,
+}
+
+# Top-level modules that belong to this repo
+OWN_MODULES = {
+    "app", "configg", "job_queue", "worker_pool", "tracing", "pipeline", "checkpoints", "incremental",
+    "resilience", "singleflight", "http_client", "metrics", "clickup_extractor", "figma_extractor",
+    "data_preprocessor", "summarizer", "story_generator", "prefetch", "artifacts", "clients", "run_batch",
+}
+
+
+def import_times(statement: str) -> List[Dict]:
+    """Parse `-X importtime` output for `statement` into rows (self/cumulative in ms, depth, module)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({
+            "module": name.strip(),
+            "depth": depth,
+            "self_ms": int(self_us) / 1000.0,
+            "cumulative_ms": int(cumulative_us) / 1000.0,
+        })
+    return rows
+
+
+def summarize(rows: List[Dict], top: int) -> Dict:
+    roots = [r for r in rows if r["depth"] == 0]
+    own = [r for r in rows if r["module"].split(".")[0] in OWN_MODULES]
+    return {
+        "total_ms": round(sum(r["cumulative_ms"] for r in roots), 1),
+        "app_modules_ms": round(sum(r["self_ms"] for r in own), 1),
+        "modules": len(rows),
+        "slowest": [
+            {"module": r["module"], "cumulative_ms": round(r["cumulative_ms"], 1)}
+            for r in sorted(roots, key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs per target")
+    parser.add_argument("--output", default=None, help="Also write the report as JSON")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a budget is exceeded")
+    args = parser.parse_args()
+
+    report = {"budgets_ms": BUDGETS, "targets": {}}
+    for name, statement in TARGETS.items():
+        runs = [summarize(import_times(statement), args.top) for _ in range(args.repeat)]
+        report["targets"][name] = min(runs, key=lambda r: r["total_ms"])
+
+    over = []
+    first_paint = report["targets"]["first_paint"]
+    if first_paint["total_ms"] > BUDGETS["first_paint"]:
+        over.append(f"first paint imports {first_paint['total_ms']}ms > {BUDGETS['first_paint']}ms")
+    if first_paint["app_modules_ms"] > BUDGETS["app_modules"]:
+        over.append(f"app modules {first_paint['app_modules_ms']}ms > {BUDGETS['app_modules']}ms")
+
+    for name, result in report["targets"].items():
+        print(f"{name}: {result['total_ms']} ms total, {result['app_modules_ms']} ms in app modules, {result['modules']} modules")
+        for row in result["slowest"]:
+            print(f"    {row['cumulative_ms']:>8.1f} ms  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if over:
+        print("Over budget: " + "; ".join(over))
+        if args.check:
+            raise SystemExit(1)
+    else:
+        print("Within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_memory.py
+"""
+Peak and retained memory of Figma extraction and preprocessing on a large
+synthetic file (about 100k nodes by default), fully offline.
+
+    python -m benchmarks.bench_memory --frames 400 --depth 5 --fanout 4 [--two-phase]
+
+"peak" is the tracemalloc high-water mark during the stage, including the
+API response and its parsed tree; "retained" is what is still allocated
+afterwards while the analyzer and its output are alive.
+"""
+import gc
+import json
+import time
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, Tuple
+
+NODE_ID = "0:1"
+
+
+def _profile(fn: Callable[[], Any]) -> Tuple[Any, Dict[str, float]]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+        seconds = time.perf_counter() - start
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {
+        "seconds": round(seconds, 3),
+        "peak_mib": round(peak / 2**20, 2),
+        "retained_mib": round(retained / 2**20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=400)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--interaction-density", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--two-phase", action="store_true", help="Fetch the outline first, then the subtrees in chunks")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    import http_client
+    from benchmarks.synthetic import SyntheticApi, make_clickup_task, make_figma_file, node_count
+    from figma_extractor import FigmaPrototypeAnalyzer
+    from data_preprocessor import Preprocessor
+
+    figma_file = make_figma_file(
+        frames=args.frames, depth=args.depth, fanout=args.fanout,
+        interaction_density=args.interaction_density, node_id=NODE_ID, seed=args.seed,
+    )
+    results: Dict[str, Any] = {"params": vars(args), "nodes": node_count(figma_file)}
+
+    with SyntheticApi() as api:
+        api.mount(http_client.get_session())
+        analyzer = FigmaPrototypeAnalyzer("fake-token", f"BENCHMEM{time.time_ns()}", NODE_ID, two_phase=args.two_phase)
+        api.add_figma_file(analyzer.file_key, figma_file)
+        figma_data, results["figma_run_extraction"] = _profile(analyzer.run_extraction)
+        clickup = make_clickup_task()["task"]
+        _, results["preprocessor_run_all"] = _profile(lambda: Preprocessor(clickup, figma_data).run_all())
+
+    results["frames"] = figma_data["total_frames"]
+    results["interactions"] = figma_data["total_interactions"]
+    print(f"{results['nodes']} nodes, {results['frames']} frames, {results['interactions']} interactions")
+    for stage in ("figma_run_extraction", "preprocessor_run_all"):
+        r = results[stage]
+        print(f"  {stage:<22} {r['seconds']:>7.3f}s  peak {r['peak_mib']:>8.2f} MiB  retained {r['retained_mib']:>8.2f} MiB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
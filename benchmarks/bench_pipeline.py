@@ -0,0 +1,224 @@
+# benchmarks/bench_pipeline.py
+"""
+Time and memory-profile each pipeline stage on synthetic inputs at several
+scales, fully offline. Figma and ClickUp are served by benchmarks.synthetic
+and Azure OpenAI by benchmarks.fake_azure.
+
+    python -m benchmarks.bench_pipeline --scales small medium --repeat 3 --output bench_results.json
+    python -m benchmarks.bench_pipeline --scales small --compare bench_results.json
+
+The results file records the git commit, so runs from different commits can
+be compared with --compare.
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+log = logging.getLogger(__name__)
+
+SCALES: Dict[str, Dict[str, Any]] = {
+    "small": {"frames": 10, "depth": 3, "fanout": 3, "interaction_density": 0.08, "description_chars": 1000, "comments": 5, "attachments": 2},
+    "medium": {"frames": 50, "depth": 4, "fanout": 4, "interaction_density": 0.03, "description_chars": 4000, "comments": 30, "attachments": 5},
+    "large": {"frames": 200, "depth": 5, "fanout": 4, "interaction_density": 0.01, "description_chars": 12000, "comments": 120, "attachments": 20},
+}
+
+NODE_ID = "0:1"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _measure(fn: Callable[..., Any], repeat: int, setup: Callable[[], tuple] = tuple) -> Tuple[Any, Dict[str, float]]:
+    """
+    Time `fn(*setup())` `repeat` times, then run it once more under
+    tracemalloc for peak memory. Only `fn` is measured, not `setup`.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        "seconds_median": round(statistics.median(times), 4),
+        "seconds_min": round(min(times), 4),
+        "seconds_max": round(max(times), 4),
+        "peak_mib": round(peak / 2**20, 2),
+    }
+
+
+def run_scale(name: str, params: Dict[str, Any], repeat: int, azure_delay: float, seed: int) -> Dict[str, Any]:
+    # Imported here so --help works without the app's dependencies installed
+    import clients
+    import http_client
+    from benchmarks.fake_azure import FakeAzureServer, constant_delay
+    from benchmarks.synthetic import SyntheticApi, make_clickup_task, make_figma_file, node_count
+    from clickup_extractor import ClickUpTaskExtractor
+    from figma_extractor import FigmaPrototypeAnalyzer
+    from data_preprocessor import Preprocessor
+    from summarizer.summarizer_core import SummarizerCore
+    from story_generator.config import StoryConfig
+    from story_generator.confluence_agent import ConfluenceAgent
+    from story_generator.generator_core import ConfluenceStoryGenerator
+
+    figma_file = make_figma_file(
+        frames=params["frames"], depth=params["depth"], fanout=params["fanout"],
+        interaction_density=params["interaction_density"], node_id=NODE_ID, seed=seed,
+    )
+    clickup_task = make_clickup_task(
+        task_id=f"bench-{name}", description_chars=params["description_chars"],
+        comments=params["comments"], attachments=params["attachments"], seed=seed,
+    )
+    results: Dict[str, Any] = {"scale": name, "params": params, "nodes": node_count(figma_file), "benchmarks": {}}
+    run_counter = [0]
+
+    def fresh_key() -> str:
+        # A new file key per run keeps single-flight results and image URLs from being reused across runs
+        run_counter[0] += 1
+        key = f"BENCH{name.upper()}{run_counter[0]}"
+        api.add_figma_file(key, figma_file)
+        return key
+
+    with SyntheticApi() as api, FakeAzureServer(constant_delay(azure_delay)) as azure:
+        os.environ.update({
+            "AZURE_OPENAI_ENDPOINT": azure.endpoint,
+            "AZURE_OPENAI_API_KEY": "fake-key",
+            "AZURE_OPENAI_MODEL_NAME": "fake",
+            "AZURE_OPENAI_MODEL": "fake",
+        })
+        # Each scale has its own fake server, so drop clients cached for the previous one
+        clients.clear()
+        api.add_clickup_task(clickup_task["task"]["id"], clickup_task)
+        api.mount(http_client.get_session())
+
+        _, results["benchmarks"]["clickup_fetch_task"] = _measure(
+            lambda: ClickUpTaskExtractor("fake-token")._fetch_task_enhanced(clickup_task["task"]["id"]), repeat
+        )
+        clickup_data = ClickUpTaskExtractor("fake-token")._fetch_task_enhanced(clickup_task["task"]["id"])
+
+        figma_data, results["benchmarks"]["figma_run_extraction"] = _measure(
+            lambda: FigmaPrototypeAnalyzer("fake-token", fresh_key(), NODE_ID).run_extraction(), repeat
+        )
+        results["interactions"] = figma_data["total_interactions"]
+
+        processed, results["benchmarks"]["preprocessor_run_all"] = _measure(
+            lambda: Preprocessor(clickup_data, figma_data).run_all(), repeat
+        )
+
+        def fresh_frames():
+            # Fresh extraction so image URLs (and the summary single-flight keys) are new each run
+            fresh = FigmaPrototypeAnalyzer("fake-token", fresh_key(), NODE_ID).run_extraction()
+            return (Preprocessor(clickup_data, fresh).run_all()["figma_processed"],)
+
+        requests_before = azure.stats["requests"]
+        summarized, results["benchmarks"]["summarizer_core_run"] = _measure(
+            # No pacing sleep between batches, so timings measure the work rather than time.sleep
+            lambda frames: SummarizerCore(frames, inter_batch_sleep=0).run(), repeat, setup=fresh_frames
+        )
+        results["benchmarks"]["summarizer_core_run"]["azure_requests_per_run"] = (
+            (azure.stats["requests"] - requests_before) // (repeat + 1)
+        )
+
+        config = StoryConfig(azure_openai_key="fake-key", azure_openai_endpoint=azure.endpoint, deployment_name="fake")
+        scratch = tempfile.mkdtemp(prefix="bench_story_")
+        try:
+            _, results["benchmarks"]["confluence_agent_generate"] = _measure(
+                lambda: ConfluenceAgent(ConfluenceStoryGenerator(config), base_path=scratch).generate_complete_story(
+                    processed["clickup_processed"], summarized
+                ),
+                repeat,
+            )
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        results["synthetic_api_calls"] = dict(api.calls)
+        results["fake_azure"] = dict(azure.stats)
+    return results
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lines describing each benchmark's change against a previous results file."""
+    lines = [f"Comparing {current['meta']['commit']} against {baseline['meta']['commit']}"]
+    old = {(r["scale"], name): b for r in baseline["results"] for name, b in r["benchmarks"].items()}
+    for r in current["results"]:
+        for name, b in r["benchmarks"].items():
+            prev = old.get((r["scale"], name))
+            if not prev:
+                continue
+            ratio = b["seconds_median"] / prev["seconds_median"] if prev["seconds_median"] else float("inf")
+            mem = b["peak_mib"] - prev["peak_mib"]
+            lines.append(f"  {r['scale']:<7} {name:<28} time x{ratio:.2f}  peak {mem:+.2f} MiB")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--azure-delay", type=float, default=0.0, help="Fake Azure latency per call (seconds)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "azure_delay": args.azure_delay,
+            "seed": args.seed,
+        },
+        "results": [],
+    }
+    for name in args.scales:
+        print(f"Running {name} scale...", flush=True)
+        report["results"].append(run_scale(name, SCALES[name], args.repeat, args.azure_delay, args.seed))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for r in report["results"]:
+        print(f"\n{r['scale']} ({r['params']['frames']} frames, {r['nodes']} nodes, {r['interactions']} interactions)")
+        for name, b in r["benchmarks"].items():
+            print(f"  {name:<28} median {b['seconds_median']:.4f}s  peak {b['peak_mib']:.2f} MiB")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n" + "\n".join(compare(report, json.load(f))))
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# benchmarks/fake_azure.py
+"""
+Local stand-in for the Azure OpenAI chat.completions endpoint, for load
+testing without an Azure subscription.
+
+    python -m benchmarks.fake_azure --port 8089 --latency lognormal --median 0.8 --rate-limit 0.05
+
+then point the app at it:
+
+    AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089 AZURE_OPENAI_API_KEY=fake ...
+
+Handles text and image_url messages, JSON mode (batched image summaries),
+configurable latency distributions, 429s with Retry-After, and templated
+responses with estimated token usage.
+"""
+import re
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Rough vision token costs per image at each detail level
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+# (pattern matched against the last user text, response template); first match wins.
+# Templates may use {images}, {bullets} and {model}.
+DEFAULT_TEMPLATES = [
+    (r"step heading", "Review Screen Details And Continue"),
+    (r"user story", "As a user, I want to complete this flow\nSo that I can reach my goal\nGiven the screens described"),
+    (r"business rules", "{bullets}"),
+    (r".*", "A fake summary of the screen with a header, a form and a primary call-to-action button."),
+]
+
+
+def constant_delay(seconds: float = 0.0) -> Callable[[], float]:
+    return lambda: seconds
+
+
+def uniform_delay(low: float = 0.05, high: float = 0.5) -> Callable[[], float]:
+    return lambda: random.uniform(low, high)
+
+
+def lognormal_delay(median: float = 0.8, sigma: float = 0.6, cap: float = 60.0) -> Callable[[], float]:
+    """Log-normal delays around `median` seconds; a realistic shape for LLM latency."""
+    mu = math.log(median)
+    return lambda: min(cap, random.lognormvariate(mu, sigma))
+
+
+def heavy_tailed_delay(base: float = 0.05, alpha: float = 1.5, cap: float = 10.0) -> Callable[[], float]:
+    """Pareto-distributed delays: most calls take ~`base` seconds, a few take far longer."""
+    return lambda: min(cap, base * random.paretovariate(alpha))
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _message_parts(messages: List[Dict[str, Any]]):
+    """All text and image_url parts of a chat request, in order."""
+    texts, images = [], []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                texts.append(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                images.append(part.get("image_url", {}))
+    return texts, images
+
+
+class FakeAzureServer:
+    """
+    Minimal stand-in for the Azure OpenAI chat.completions endpoint.
+
+    Every POST to /openai/deployments/<name>/chat/completions sleeps for
+    `delay_fn()` seconds and answers with a templated completion. A
+    `rate_limit_rate` fraction of requests, plus any beyond
+    `requests_per_minute`, get a 429 with Retry-After instead.
+    """
+
+    def __init__(
+        self,
+        delay_fn: Callable[[], float] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        rate_limit_rate: float = 0.0,
+        requests_per_minute: Optional[int] = None,
+        retry_after: float = 1.0,
+        templates: Optional[List[tuple]] = None,
+        completion_delay_per_token: float = 0.0,
+    ):
+        self.delay_fn = delay_fn or constant_delay(0.0)
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.retry_after = retry_after
+        self.templates = [(re.compile(p, re.IGNORECASE), t) for p, t in (templates or DEFAULT_TEMPLATES)]
+        self.completion_delay_per_token = completion_delay_per_token
+        self.requests = 0
+        self.stats = {"requests": 0, "rate_limited": 0, "images": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._window: List[float] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, {"error": {"code": "BadRequest", "message": "Invalid JSON body"}})
+                    return
+
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    self._send(404, {"error": {"code": "404", "message": "Resource not found"}})
+                    return
+
+                throttled = server._admit()
+                if throttled is not None:
+                    self._send(
+                        429,
+                        {"error": {"code": "429", "message": f"Rate limit exceeded. Please retry after {throttled:g} seconds."}},
+                        {"Retry-After": f"{math.ceil(throttled)}", "retry-after-ms": f"{int(throttled * 1000)}"},
+                    )
+                    return
+
+                body, completion_tokens = server._complete(payload, self.path)
+                time.sleep(server.delay_fn() + completion_tokens * server.completion_delay_per_token)
+                self._send(200, body)
+
+            def _send(self, status: int, body: dict, headers: Dict[str, str] = None):
+                data = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for key, value in (headers or {}).items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    def _admit(self) -> Optional[float]:
+        """None to serve the request, otherwise the Retry-After seconds for a 429."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            self.stats["requests"] += 1
+            if self.requests_per_minute:
+                self._window = [t for t in self._window if now - t < 60.0]
+                if len(self._window) >= self.requests_per_minute:
+                    self.stats["rate_limited"] += 1
+                    return max(0.1, 60.0 - (now - self._window[0]))
+                self._window.append(now)
+            if self.rate_limit_rate and random.random() < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return self.retry_after
+        return None
+
+    def _render(self, prompt: str, images: int, model: str) -> str:
+        bullets_wanted = re.search(r"Total bullet points should be:\s*(\d+)", prompt)
+        count = int(bullets_wanted.group(1)) if bullets_wanted else 1
+        for pattern, template in self.templates:
+            if pattern.search(prompt):
+                return template.format(
+                    images=images,
+                    model=model,
+                    bullets="\n".join(f"- Rule {i + 1}: The screen behaves as designed." for i in range(count)),
+                )
+        return ""
+
+    def _complete(self, payload: Dict[str, Any], path: str):
+        messages = payload.get("messages", [])
+        texts, images = _message_parts(messages)
+        model = payload.get("model") or path.split("/deployments/")[-1].split("/")[0]
+        prompts = [t for t in texts if not re.fullmatch(r"Image \d+:", t.strip())]
+        prompt = prompts[-1] if prompts else ""
+        if (payload.get("response_format") or {}).get("type") == "json_object" and images:
+            # Batched image summaries: one entry per image index, as AzureVisionClient.summarize_batch expects
+            content = json.dumps({str(i): self._render(prompt, 1, model) for i in range(len(images))})
+        else:
+            content = self._render(prompt, len(images), model)
+
+        max_tokens = payload.get("max_tokens") or payload.get("max_completion_tokens")
+        completion_tokens = _estimate_tokens(content)
+        if max_tokens:
+            completion_tokens = min(completion_tokens, int(max_tokens))
+        prompt_tokens = sum(_estimate_tokens(t) for t in texts) + sum(
+            IMAGE_TOKENS.get(image.get("detail", "auto"), 765) for image in images
+        )
+        with self._lock:
+            self.stats["images"] += len(images)
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+        return {
+            "id": f"chatcmpl-fake-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, completion_tokens
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def delay_from_args(args) -> Callable[[], float]:
+    if args.latency == "constant":
+        return constant_delay(args.median)
+    if args.latency == "uniform":
+        return uniform_delay(args.low, args.high)
+    if args.latency == "pareto":
+        return heavy_tailed_delay(args.median, args.alpha, args.cap)
+    return lognormal_delay(args.median, args.sigma, args.cap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", choices=["constant", "uniform", "lognormal", "pareto"], default="lognormal")
+    parser.add_argument("--median", type=float, default=0.8, help="Median (lognormal), base (pareto) or fixed delay, seconds")
+    parser.add_argument("--sigma", type=float, default=0.6)
+    parser.add_argument("--alpha", type=float, default=1.5)
+    parser.add_argument("--low", type=float, default=0.05)
+    parser.add_argument("--high", type=float, default=0.5)
+    parser.add_argument("--cap", type=float, default=60.0)
+    parser.add_argument("--per-token", type=float, default=0.0, help="Extra seconds per completion token")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute before 429s")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--templates", default=None, help="JSON file of [pattern, template] pairs")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.seed is not None:
+        random.seed(args.seed)
+    templates = None
+    if args.templates:
+        with open(args.templates, encoding="utf-8") as f:
+            templates = [tuple(pair) for pair in json.load(f)]
+
+    server = FakeAzureServer(
+        delay_fn=delay_from_args(args),
+        host=args.host,
+        port=args.port,
+        rate_limit_rate=args.rate_limit,
+        requests_per_minute=args.rpm,
+        retry_after=args.retry_after,
+        templates=templates,
+        completion_delay_per_token=args.per_token,
+    )
+    log.info(f"Fake Azure OpenAI listening on {server.endpoint}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log.info(f"Served: {server.stats}")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# benchmarks/fake_confluence.py
+"""
+Local stub of the Confluence REST API, enough to publish stories through
+story_generator.confluence_storage without a Confluence site.
+
+    python -m benchmarks.fake_confluence --port 8090 --delay 0.2
+
+then:
+
+    CONFLUENCE_BASE_URL=http://127.0.0.1:8090 CONFLUENCE_USER=me CONFLUENCE_API_TOKEN=x CONFLUENCE_SPACE_KEY=DEV ...
+
+Supports creating, finding and updating pages (including chunked request
+bodies), uploading multipart attachments and reading pages back. It keeps everything in
+memory and records connection and concurrency stats, so tests can check
+that uploads really ran in parallel over reused connections.
+"""
+import json
+import time
+import logging
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict
+from urllib.parse import parse_qs
+from xml.etree import ElementTree
+
+log = logging.getLogger(__name__)
+
+# Namespaces used by storage format; declared so the body can be checked as XML
+STORAGE_NAMESPACES = 'xmlns:ac="http://atlassian.com/content" xmlns:ri="http://atlassian.com/resource/identifier"'
+
+
+def storage_is_well_formed(value: str) -> bool:
+    """True if a storage-format body parses as XML."""
+    try:
+        ElementTree.fromstring(f"<root {STORAGE_NAMESPACES}>{value}</root>")
+        return True
+    except ElementTree.ParseError:
+        return False
+
+
+class FakeConfluenceServer:
+    """
+    In-memory Confluence: POST /rest/api/content creates a page (400 if the
+    title is taken), GET /rest/api/content?spaceKey=&title= finds one, PUT
+    /rest/api/content/<id> updates it (409 unless the version is the next
+    one), POST/PUT /rest/api/content/<id>/child/attachment add attachments
+    (requires the X-Atlassian-Token: no-check header, like the real API;
+    POST rejects existing names, PUT replaces them) and GET
+    /rest/api/content/<id> returns the page with its storage body. Every
+    request needs Basic auth and waits `delay_fn()` seconds.
+    """
+
+    def __init__(self, delay_fn: Callable[[], float] = None, host: str = "127.0.0.1", port: int = 0):
+        self.delay_fn = delay_fn or (lambda: 0.0)
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.stats = {
+            "requests": 0,
+            "connections": 0,
+            "pages": 0,
+            "updates": 0,
+            "attachments": 0,
+            "attachment_bytes": 0,
+            "chunked_bodies": 0,
+            "max_concurrent": 0,
+        }
+        self._active = 0
+        self._next_id = 1000
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so pooled client connections are actually reused
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.stats["connections"] += 1
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PUT(self):
+                self._handle("PUT")
+
+            def _handle(self, method: str):
+                body = self._read_body()
+                with server._lock:
+                    server.stats["requests"] += 1
+                    server._active += 1
+                    server.stats["max_concurrent"] = max(server.stats["max_concurrent"], server._active)
+                try:
+                    time.sleep(server.delay_fn())
+                    if not self.headers.get("Authorization", "").startswith("Basic "):
+                        self._send(401, {"message": "Basic authentication required"})
+                        return
+                    status, payload = server._route(method, self.path, self.headers, body)
+                    self._send(status, payload)
+                finally:
+                    with server._lock:
+                        server._active -= 1
+
+            def _read_body(self) -> bytes:
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    with server._lock:
+                        server.stats["chunked_bodies"] += 1
+                    chunks = []
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                        if size == 0:
+                            # Skip trailers up to the blank line
+                            while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                                pass
+                            return b"".join(chunks)
+                        chunks.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+
+            def _send(self, status: int, body: dict):
+                data = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    def _route(self, method: str, path: str, headers, body: bytes):
+        path, _, query = path.partition("?")
+        segments = [s for s in path.split("/") if s]
+        if segments[:3] != ["rest", "api", "content"]:
+            return 404, {"message": f"No route for {path}"}
+        rest = segments[3:]
+
+        if method == "POST" and not rest:
+            return self._create_page(body)
+        if method == "GET" and not rest:
+            return self._find_pages(parse_qs(query))
+        if method == "GET" and len(rest) == 1:
+            page = self.pages.get(rest[0])
+            return (200, self._page_json(page)) if page else (404, {"message": "Page not found"})
+        if method == "PUT" and len(rest) == 1:
+            return self._update_page(rest[0], body)
+        if method in ("POST", "PUT") and len(rest) == 3 and rest[1:] == ["child", "attachment"]:
+            if headers.get("X-Atlassian-Token") != "no-check":
+                return 403, {"message": "XSRF check failed"}
+            return self._add_attachments(rest[0], headers.get("Content-Type", ""), body, replace=method == "PUT")
+        return 404, {"message": f"No route for {method} {path}"}
+
+    def _find_pages(self, query: Dict[str, list]):
+        space = (query.get("spaceKey") or [None])[0]
+        title = (query.get("title") or [None])[0]
+        with self._lock:
+            found = [p for p in self.pages.values() if p["space"] == space and p["title"] == title]
+        results = [self._page_json(p) for p in found]
+        return 200, {"results": results, "size": len(results)}
+
+    def _parse_page(self, body: bytes):
+        payload = json.loads(body)
+        return payload, payload["body"]["storage"]["value"], payload["title"], payload["space"]["key"]
+
+    def _update_page(self, page_id: str, body: bytes):
+        try:
+            payload, storage, title, space = self._parse_page(body)
+            version = payload["version"]["number"]
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"message": f"Invalid page payload: {e}"}
+        if not storage_is_well_formed(storage):
+            return 400, {"message": "Body is not well-formed storage format"}
+        with self._lock:
+            page = self.pages.get(page_id)
+            if not page:
+                return 404, {"message": "Page not found"}
+            if version != page["version"] + 1:
+                return 409, {"message": f"Version must be incremented on update. Current version is: {page['version']}"}
+            page.update(title=title, space=space, storage=storage, version=version)
+            self.stats["updates"] += 1
+        return 200, self._page_json(page)
+
+    def _create_page(self, body: bytes):
+        try:
+            payload, storage, title, space = self._parse_page(body)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"message": f"Invalid page payload: {e}"}
+        if not storage_is_well_formed(storage):
+            return 400, {"message": "Body is not well-formed storage format"}
+
+        with self._lock:
+            if any(p["title"] == title and p["space"] == space for p in self.pages.values()):
+                return 400, {"message": "A page with this title already exists"}
+            page_id = str(self._next_id)
+            self._next_id += 1
+            self.pages[page_id] = {
+                "id": page_id,
+                "title": title,
+                "space": space,
+                "ancestors": payload.get("ancestors", []),
+                "storage": storage,
+                "version": 1,
+                "attachments": {},
+            }
+            self.stats["pages"] += 1
+        return 200, self._page_json(self.pages[page_id])
+
+    def _add_attachments(self, page_id: str, content_type: str, body: bytes, replace: bool = False):
+        page = self.pages.get(page_id)
+        if not page:
+            return 404, {"message": "Page not found"}
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+        )
+        results = []
+        for part in message.iter_parts():
+            filename = part.get_filename()
+            if not filename:
+                continue
+            data = part.get_payload(decode=True) or b""
+            with self._lock:
+                if filename in page["attachments"] and not replace:
+                    return 400, {"message": f"Cannot add a new attachment with same file name as an existing attachment: {filename}"}
+                page["attachments"][filename] = data
+                self.stats["attachments"] += 1
+                self.stats["attachment_bytes"] += len(data)
+            results.append({"id": f"att{page_id}-{len(page['attachments'])}", "title": filename, "type": "attachment"})
+        if not results:
+            return 400, {"message": "No file in request"}
+        return 200, {"results": results, "size": len(results)}
+
+    def _page_json(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": page["id"],
+            "type": "page",
+            "title": page["title"],
+            "space": {"key": page["space"]},
+            "version": {"number": page["version"]},
+            "body": {"storage": {"value": page["storage"], "representation": "storage"}},
+            "_links": {"base": self.endpoint, "webui": f"/spaces/{page['space']}/pages/{page['id']}"},
+        }
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds added to every request")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    server = FakeConfluenceServer(delay_fn=lambda: args.delay, host=args.host, port=args.port)
+    log.info(f"Fake Confluence listening on {server.endpoint}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log.info(f"Served: {server.stats}")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# benchmarks/synthetic.py
+"""
+Synthetic Figma files, ClickUp tasks and rendered images for benchmarks.
+
+Everything is generated from a seed, so the same parameters always produce
+the same payloads. SyntheticApi serves them in-process to the real
+extractors. It is mounted as a transport adapter for api.figma.com and
+api.clickup.com, and runs a local HTTP server for the rendered PNGs.
+"""
+import io
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+LEAF_TYPES = ["RECTANGLE", "TEXT", "VECTOR", "ELLIPSE"]
+CONTAINER_TYPES = ["GROUP", "INSTANCE", "COMPONENT"]
+TRANSITIONS = ["INSTANT_TRANSITION", "DISSOLVE", "SMART_ANIMATE", "SLIDE_IN"]
+
+
+def make_figma_file(
+    frames: int = 20,
+    depth: int = 4,
+    fanout: int = 4,
+    interaction_density: float = 0.05,
+    node_id: str = "0:1",
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    A GET /v1/files/:key/nodes response: one SECTION `node_id` holding
+    `frames` FRAMEs, each a tree `depth` levels deep with `fanout` children
+    per container. Roughly `interaction_density` of all nodes get a prototype
+    link to another frame.
+    """
+    rng = random.Random(seed)
+    frame_ids = [f"1:{i}" for i in range(frames)]
+    counter = [0]
+
+    def box(x: float, y: float, w: float, h: float) -> Dict[str, float]:
+        return {"x": x, "y": y, "width": w, "height": h}
+
+    def node(level: int, frame_index: int, x: float, y: float) -> Dict[str, Any]:
+        counter[0] += 1
+        nid = f"{frame_index + 2}:{counter[0]}"
+        is_leaf = level >= depth
+        n: Dict[str, Any] = {
+            "id": nid,
+            "name": f"{'Layer' if is_leaf else 'Group'} {counter[0]}",
+            "type": rng.choice(LEAF_TYPES if is_leaf else CONTAINER_TYPES),
+            "absoluteBoundingBox": box(x, y, rng.randint(8, 300), rng.randint(8, 120)),
+            "fills": [{"type": "SOLID", "color": {"r": rng.random(), "g": rng.random(), "b": rng.random(), "a": 1}}],
+        }
+        if n["type"] == "TEXT":
+            n["characters"] = " ".join(rng.choice(["Sign in", "Next", "Cancel", "Email", "Password", "Continue"]) for _ in range(3))
+        if frames > 1 and rng.random() < interaction_density:
+            target = rng.choice([f for i, f in enumerate(frame_ids) if i != frame_index])
+            n["transitionNodeID"] = target
+            n["transitionType"] = rng.choice(TRANSITIONS)
+        if not is_leaf:
+            n["children"] = [node(level + 1, frame_index, x + 4 * c, y + 4 * c) for c in range(fanout)]
+        return n
+
+    children = []
+    for i, fid in enumerate(frame_ids):
+        x, y = (i % 10) * 500.0, (i // 10) * 1000.0
+        children.append({
+            "id": fid,
+            "name": f"Screen {i + 1}",
+            "type": "FRAME",
+            "absoluteBoundingBox": box(x, y, 390, 844),
+            "children": [node(2, i, x, y) for _ in range(fanout)],
+        })
+
+    document = {"id": node_id, "name": "Synthetic flow", "type": "SECTION", "children": children}
+    return {"name": "Synthetic file", "nodes": {node_id: {"document": document}}}
+
+
+def make_clickup_task(
+    task_id: str = "bench1",
+    description_chars: int = 2000,
+    comments: int = 10,
+    attachments: int = 3,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """GET /task/:id and GET /task/:id/comment responses for a synthetic task."""
+    rng = random.Random(seed)
+    words = ["user", "login", "screen", "flow", "validate", "error", "button", "account", "profile", "payment"]
+
+    def text(chars: int) -> str:
+        out = []
+        while sum(len(w) + 1 for w in out) < chars:
+            out.append(rng.choice(words))
+        return " ".join(out)
+
+    half = max(0, description_chars // 2)
+    task = {
+        "id": task_id,
+        "name": f"Synthetic task {task_id}",
+        "description": f"{text(half)}\nBusiness Case\n{text(description_chars - half)}",
+        "assignees": [{"username": f"user{i}"} for i in range(rng.randint(1, 3))],
+        "custom_fields": [{"name": "Figma link", "value": "https://www.figma.com/file/SYNTHETIC"}],
+        "attachments": [
+            {"id": f"att{i}", "title": f"attachment_{i}.png", "extension": "png", "url": f"https://example.invalid/att{i}.png"}
+            for i in range(attachments)
+        ],
+    }
+    comment_list = [
+        {
+            "comment_text": f"@user{i % 3} {text(rng.randint(40, 400))}",
+            "user": {"username": f"user{i % 3}"},
+            "date": str(1700000000000 + i * 60000),
+        }
+        for i in range(comments)
+    ]
+    return {"task": task, "comments": {"comments": comment_list}}
+
+
+def png_bytes(key: str, width: int = 390, height: int = 844) -> bytes:
+    """A deterministic blocky PNG; different keys give perceptually different images."""
+    rng = random.Random(key)
+    small = Image.new("RGB", (8, 16))
+    small.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(8 * 16)])
+    out = io.BytesIO()
+    small.resize((width, height), Image.NEAREST).save(out, format="PNG")
+    return out.getvalue()
+
+
+def _truncate(node: Dict[str, Any], depth: Optional[int]) -> Dict[str, Any]:
+    """`node` with children only `depth` levels deep, like Figma's depth parameter."""
+    if depth is None or "children" not in node:
+        return node
+    if depth <= 0:
+        return {k: v for k, v in node.items() if k != "children"}
+    return {**node, "children": [_truncate(c, depth - 1) for c in node["children"]]}
+
+
+class _ImageServer:
+    """Local HTTP server answering GET /img/<key>.png with png_bytes(key)."""
+
+    def __init__(self, host: str = "127.0.0.1"):
+        cache: Dict[str, bytes] = {}
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                key = self.path.rsplit("/", 1)[-1].split(".")[0]
+                with lock:
+                    if key not in cache:
+                        cache[key] = png_bytes(key)
+                    body = cache[key]
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer((host, 0), Handler)
+        self.httpd.daemon_threads = True
+        host, port = self.httpd.server_address[:2]
+        self.base_url = f"http://{host}:{port}"
+
+
+class _SyntheticAdapter(HTTPAdapter):
+    def __init__(self, api: "SyntheticApi"):
+        super().__init__()
+        self.api = api
+
+    def send(self, request, **kwargs):
+        status, body = self.api.handle(request.url)
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        response._content = json.dumps(body).encode("utf-8")
+        response.encoding = "utf-8"
+        return response
+
+
+class SyntheticApi:
+    """
+    Serves synthetic Figma files and ClickUp tasks to a requests session.
+
+        with SyntheticApi() as api:
+            api.add_figma_file("KEY", make_figma_file(frames=50))
+            api.mount(http_client.get_session())
+    """
+
+    def __init__(self):
+        self.figma_files: Dict[str, Dict[str, Any]] = {}
+        self.clickup_tasks: Dict[str, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {"figma_nodes": 0, "figma_images": 0, "clickup": 0}
+        self._indexes: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._images = _ImageServer()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def add_figma_file(self, file_key: str, nodes_response: Dict[str, Any]):
+        self.figma_files[file_key] = nodes_response
+        self._indexes.pop(file_key, None)
+
+    def _node_index(self, file_key: str) -> Dict[str, Dict[str, Any]]:
+        """id -> node for every node in a file, built on first request."""
+        if file_key not in self._indexes:
+            index = {}
+            stack = [n["document"] for n in self.figma_files[file_key]["nodes"].values() if n]
+            while stack:
+                node = stack.pop()
+                index.setdefault(node["id"], node)
+                stack.extend(node.get("children", []))
+            self._indexes[file_key] = index
+        return self._indexes[file_key]
+
+    def add_clickup_task(self, task_id: str, payload: Dict[str, Any]):
+        self.clickup_tasks[task_id] = payload
+
+    def image_url(self, file_key: str, node_id: str) -> str:
+        return f"{self._images.base_url}/img/{file_key}-{node_id.replace(':', '_')}.png"
+
+    def mount(self, session: requests.Session):
+        adapter = _SyntheticAdapter(self)
+        session.mount("https://api.figma.com/", adapter)
+        session.mount("https://api.clickup.com/", adapter)
+
+    def handle(self, url: str):
+        parts = urlsplit(url)
+        segments = [s for s in parts.path.split("/") if s]
+        query = parse_qs(parts.query)
+        with self._lock:
+            if parts.netloc == "api.figma.com" and segments[1:2] == ["files"] and segments[-1] == "nodes":
+                self.calls["figma_nodes"] += 1
+                data = self.figma_files.get(segments[2])
+                if not data:
+                    return 404, {"status": 404, "err": "Not found"}
+                # Like Figma: only the requested ids (any node in the file), null for unknown ids
+                ids = ",".join(query.get("ids", [""])).split(",")
+                depth = int(query["depth"][0]) if "depth" in query else None
+                index = self._node_index(segments[2])
+                return 200, {**data, "nodes": {
+                    i: ({"document": _truncate(index[i], depth)} if i in index else None) for i in ids if i
+                }}
+            if parts.netloc == "api.figma.com" and segments[1:2] == ["images"]:
+                self.calls["figma_images"] += 1
+                ids = ",".join(query.get("ids", [""])).split(",")
+                return 200, {"err": None, "images": {i: self.image_url(segments[2], i) for i in ids if i}}
+            if parts.netloc == "api.clickup.com" and "task" in segments:
+                self.calls["clickup"] += 1
+                task_id = segments[segments.index("task") + 1]
+                payload = self.clickup_tasks.get(task_id)
+                if not payload:
+                    return 404, {"err": "Task not found"}
+                return 200, payload["comments"] if segments[-1] == "comment" else payload["task"]
+        return 404, {"err": f"Unknown synthetic endpoint {url}"}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._images.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._images.httpd.shutdown()
+        self._images.httpd.server_close()
+
+
+def frame_count(nodes_response: Dict[str, Any]) -> int:
+    return sum(len(n["document"].get("children", [])) for n in nodes_response.get("nodes", {}).values())
+
+
+def node_count(nodes_response: Dict[str, Any]) -> int:
+    def count(n) -> int:
+        return 1 + sum(count(c) for c in n.get("children", []))
+    return sum(count(n["document"]) for n in nodes_response.get("nodes", {}).values())
+
+
+def interactive_nodes(nodes_response: Dict[str, Any]) -> List[str]:
+    found = []
+
+    def walk(n):
+        if n.get("transitionNodeID"):
+            found.append(n["id"])
+        for c in n.get("children", []):
+            walk(c)
+
+    for n in nodes_response.get("nodes", {}).values():
+        walk(n["document"])
+    return found
@@ -0,0 +1,139 @@
+# checkpoints.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking of checkpoint directories
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+
+
+class CheckpointJournal:
+    """
+    Append-only JSONL key/value log used for fine-grained progress inside a
+    stage (one line per summarized URL or generated screen).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partially written last line from a crash
+                    self._data[entry["key"]] = entry["value"]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def __setitem__(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = value
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n")
+
+
+class CheckpointStore:
+    """
+    Persists each pipeline stage's output so a failed run can resume from the
+    last completed stage. Checkpoints are keyed by the run inputs
+    (ClickUp task id, Figma file key, node id) and expire together once the
+    oldest is more than `max_age` seconds old.
+
+    The store holds an exclusive lock on its inputs until close(), so a second
+    run with the same inputs waits instead of sharing (and clearing) the
+    directory underneath the first. Use it as a context manager.
+    """
+
+    def __init__(
+        self,
+        clickup_task_id: str,
+        figma_file_key: str,
+        figma_node_id: str,
+        base_dir: str = DEFAULT_CHECKPOINT_DIR,
+        max_age: float = 24 * 3600,
+    ):
+        key = json.dumps([clickup_task_id, figma_file_key, figma_node_id])
+        self.run_key = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(base_dir, self.run_key)
+        self.max_age = max_age
+        os.makedirs(base_dir, exist_ok=True)
+        self._lock_file = self._acquire(os.path.join(base_dir, f"{self.run_key}.lock"))
+        os.makedirs(self.dir, exist_ok=True)
+        self._expire_stale()
+
+    def _acquire(self, lock_path: str):
+        lock_file = open(lock_path, "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                log.info(f"Waiting for another run with the same inputs ({self.run_key}) to finish")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def close(self):
+        if self._lock_file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def __enter__(self) -> "CheckpointStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _expire_stale(self):
+        # All or nothing, so a resumed run never mixes stages from different attempts
+        mtimes = [os.path.getmtime(self._path(name)) for name in os.listdir(self.dir)]
+        if mtimes and time.time() - min(mtimes) > self.max_age:
+            log.info(f"Discarding expired checkpoints {self.run_key}")
+            shutil.rmtree(self.dir, ignore_errors=True)
+            os.makedirs(self.dir, exist_ok=True)
+
+    def load(self, stage: str) -> Optional[Any]:
+        path = self._path(f"{stage}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        log.info(f"Resuming from checkpoint: {stage}")
+        return data
+
+    def save(self, stage: str, data: Any):
+        path = self._path(f"{stage}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def journal(self, name: str) -> CheckpointJournal:
+        return CheckpointJournal(self._path(f"{name}.jsonl"))
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
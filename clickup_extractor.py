@@ -1,17 +1,22 @@
 import re
 import os
 import json
-import requests
 from datetime import datetime
-from dotenv import load_dotenv
-import streamlit as st
+from configg import get_secret
+from http_client import get_session
+from singleflight import SingleFlight
+from tracing import KIND_CLIENT, record_response, span
+
+# Concurrent requests for the same task share one fetch
+_task_flight = SingleFlight("clickup-task")
+
 
 class ClickUpTaskExtractor:
 
     BASE_URL = "https://api.clickup.com/api/v2"
 
     def __init__(self, clickup_token: str):
-        self.clickup_token = clickup_token or st.secrets.get("CLICKUP_API_TOKEN") or os.getenv("CLICKUP_API_TOKEN")
+        self.clickup_token = clickup_token or get_secret("CLICKUP_API_TOKEN", "")
         if not self.clickup_token:
             raise ValueError("ClickUp API token not found. Please configure CLICKUP_API_TOKEN in secrets.")
     
@@ -22,6 +27,9 @@ class ClickUpTaskExtractor:
 
     def fetch_task_enhanced(self, task_id: str) -> dict | None:
         """Fetch ClickUp task details, attachments, assignees, Figma link, and cleaned comments."""
+        return _task_flight.do(task_id, lambda: self._fetch_task_enhanced(task_id))
+
+    def _fetch_task_enhanced(self, task_id: str) -> dict | None:
         task_data = self._get_task(task_id)
         if not task_data:
             return None
@@ -76,7 +84,9 @@ class ClickUpTaskExtractor:
     def _get_task(self, task_id: str) -> dict | None:
         url = f"{self.BASE_URL}/task/{task_id}"
         params = {"include_comments": "true", "attachments": "true"}
-        response = requests.get(url, headers=self.headers, params=params, timeout=20)
+        with span("http.get", kind=KIND_CLIENT, **{"http.url": url, "url.type": "clickup_task"}) as s:
+            response = get_session().get(url, headers=self.headers, params=params, timeout=20)
+            record_response(s, response)
         if response.status_code != 200:
             return None
         return response.json()
@@ -118,7 +128,9 @@ class ClickUpTaskExtractor:
 
         while True:
             params = {"page": next_page} if next_page else {}
-            response = requests.get(comments_url, headers=self.headers, params=params, timeout=20)
+            with span("http.get", kind=KIND_CLIENT, **{"http.url": comments_url, "url.type": "clickup_comments"}) as s:
+                response = get_session().get(comments_url, headers=self.headers, params=params, timeout=20)
+                record_response(s, response)
             if response.status_code != 200:
                 break
             data = response.json()
@@ -152,8 +164,7 @@ class ClickUpTaskExtractor:
 
 # Optional standalone usage
 if __name__ == "__main__":
-    load_dotenv()
-    token = os.getenv("CLICKUP_API_TOKEN")
+    token = get_secret("CLICKUP_API_TOKEN")
     extractor = ClickUpTaskExtractor(token)
     task_id = input("Enter ClickUp Task ID: ").strip()
     result = extractor.fetch_task_enhanced(task_id)
@@ -0,0 +1,137 @@
+# clients.py
+"""
+Process-wide registry of configured API clients.
+
+Worker processes are long-lived, so caching the AzureOpenAI clients (and with
+them their HTTP connection pools) here lets every job after the first reuse
+warm connections. Settings are read from get_secret once per process.
+"""
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from configg import get_secret
+from http_client import get_session
+
+log = logging.getLogger(__name__)
+
+# Hosts whose connections are opened ahead of the first job
+WARM_URLS = ("https://api.figma.com/v1/", "https://api.clickup.com/api/v2/")
+
+
+@dataclass(frozen=True)
+class AzureSettings:
+    endpoint: str
+    api_key: str
+    api_version: str
+    vision_model: str
+    story_model: str
+
+
+@lru_cache(maxsize=1)
+def azure_settings() -> AzureSettings:
+    """Azure OpenAI settings, read once per process."""
+    return AzureSettings(
+        endpoint=get_secret("AZURE_OPENAI_ENDPOINT"),
+        api_key=get_secret("AZURE_OPENAI_API_KEY"),
+        api_version=get_secret("AZURE_OPENAI_API_VERSION", "2024-12-01-preview"),
+        vision_model=get_secret("AZURE_OPENAI_MODEL_NAME", "gpt-4o"),
+        story_model=get_secret("AZURE_OPENAI_MODEL", "gpt-4o"),
+    )
+
+
+_clients: Dict[Tuple[str, str, str, int], object] = {}
+_hedgers: Dict[Tuple[float, float], object] = {}
+_lock = threading.Lock()
+
+
+def get_azure_openai(endpoint: str, api_key: str, api_version: str, max_retries: int = 2):
+    """
+    Shared AzureOpenAI client for these settings. Deployments are chosen per
+    call, so clients for different deployments on the same resource are the same
+    client.
+    """
+    key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    cache_key = (endpoint.rstrip("/"), api_version, key_id, max_retries)
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            # Imported on first use: the SDK is the slowest import in the app
+            from openai import AzureOpenAI
+
+            client = AzureOpenAI(
+                api_key=api_key,
+                azure_endpoint=endpoint,
+                api_version=api_version,
+                max_retries=max_retries,
+            )
+            _clients[cache_key] = client
+            log.info(f"Created Azure OpenAI client for {cache_key[0]} ({api_version})")
+        return client
+
+
+def get_hedger(percentile: float, max_hedge_ratio: float):
+    """
+    Shared summarizer.hedging.Hedger for these settings. One per process, so
+    its latency histogram builds up across jobs and its threads are reused.
+    """
+    cache_key = (percentile, max_hedge_ratio)
+    with _lock:
+        hedger = _hedgers.get(cache_key)
+        if hedger is None:
+            from summarizer.hedging import Hedger
+
+            hedger = _hedgers[cache_key] = Hedger(percentile=percentile, max_hedge_ratio=max_hedge_ratio)
+        return hedger
+
+
+def clear():
+    """Drop all cached clients and hedgers (e.g. after rotating keys)."""
+    with _lock:
+        _clients.clear()
+        hedgers = list(_hedgers.values())
+        _hedgers.clear()
+    for hedger in hedgers:
+        hedger.close()
+    azure_settings.cache_clear()
+
+
+def prewarm(timeout: float = 5.0) -> Dict[str, float]:
+    """
+    Build the default clients and open connections to Azure, Figma and ClickUp
+    so the first job doesn't pay for TLS setup. Failures are logged and
+    ignored. Returns seconds spent per target.
+    """
+    timings: Dict[str, float] = {}
+    try:
+        settings = azure_settings()
+    except ValueError as e:
+        log.warning(f"Skipping Azure pre-warm: {e}")
+        settings = None
+
+    if settings:
+        for max_retries in (0, 2):
+            start = time.perf_counter()
+            client = get_azure_openai(settings.endpoint, settings.api_key, settings.api_version, max_retries)
+            try:
+                # Any authenticated round trip leaves a live connection in the client's pool
+                client.with_options(timeout=timeout, max_retries=0).models.list()
+            except Exception as e:
+                log.debug(f"Azure pre-warm request failed: {e}")
+            timings[f"azure(max_retries={max_retries})"] = round(time.perf_counter() - start, 3)
+
+    session = get_session()
+    for url in WARM_URLS:
+        start = time.perf_counter()
+        try:
+            session.head(url, timeout=timeout)
+        except Exception as e:
+            log.debug(f"Pre-warm of {url} failed: {e}")
+        timings[url] = round(time.perf_counter() - start, 3)
+
+    log.info(f"Pre-warmed connections: {timings}")
+    return timings
@@ -1,10 +1,36 @@
 # config.py
-import streamlit as st
 import os
+import sys
 from typing import Any, Optional
-from dotenv import load_dotenv
 
-load_dotenv()
+SECRETS_FILES = (
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+)
+
+_dotenv_loaded = False
+
+
+def _load_dotenv_once():
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _dotenv_loaded = True
+
+
+def _streamlit_secrets():
+    """
+    st.secrets, or {} when Streamlit isn't loaded and there is no secrets
+    file, so CLI runs and workers don't pay for importing Streamlit.
+    """
+    if "streamlit" not in sys.modules and not any(os.path.exists(p) for p in SECRETS_FILES):
+        return {}
+    import streamlit as st
+
+    return st.secrets
+
 
 def get_secret(key: str, default: Optional[Any] = None) -> Any:
     """
@@ -21,9 +47,10 @@ def get_secret(key: str, default: Optional[Any] = None) -> Any:
     Raises:
         ValueError: If key not found and no default provided
     """
+    _load_dotenv_once()
     try:
         # Try Streamlit secrets first (for cloud deployment)
-        return st.secrets[key]
+        return _streamlit_secrets()[key]
     except (KeyError, FileNotFoundError, RuntimeError, AttributeError):
         # Fall back to environment variables (for local dev)
         value = os.getenv(key, default)
@@ -32,4 +59,4 @@ def get_secret(key: str, default: Optional[Any] = None) -> Any:
                 f"Missing required configuration: {key}\n"
                 f"Please set it in .env file (local) or Streamlit secrets (cloud)"
             )
-        return value
\ No newline at end of file
+        return value
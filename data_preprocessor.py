@@ -1,10 +1,10 @@
 import os
 import json
+import hashlib
 import logging
 from datetime import datetime
 from typing import Dict, Any, List
 
-logging.basicConfig(level=logging.INFO, format="%(message)s")
 log = logging.getLogger(__name__)
 
 
@@ -33,28 +33,61 @@ class Preprocessor:
             log.warning(" No Figma interactions found.")
             return {}
 
+        # Keyed by frame node id: frame image URLs are signed and expire, node ids are stable
         frame_map: Dict[str, Dict[str, Any]] = {}
+        frame_hashes = {f.get("node_id"): f.get("content_hash") for f in self.figma_data.get("frames", [])}
+        seen = set()
+        duplicates = 0
 
         for inter in interactions:
-            from_frame = inter.get("from_frame_url")
-            if not from_frame:
+            frame_id = inter.get("from_frame_id")
+            if not frame_id:
                 continue
 
-            if from_frame not in frame_map:
-                frame_map[from_frame] = {"elements": []}
+            # The same link shows up once per prototype starting point / variant that shares it
+            key = (frame_id, inter.get("from_id"), inter.get("to_id"), inter.get("animation", "Instant"))
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+
+            frame = frame_map.get(frame_id)
+            if frame is None:
+                frame = frame_map[frame_id] = {"frame_id": frame_id, "frame_url": inter.get("from_frame_url"), "elements": []}
+            elif not frame["frame_url"]:
+                frame["frame_url"] = inter.get("from_frame_url")
 
-            frame_map[from_frame]["elements"].append({
+            frame["elements"].append({
+                "from_id": inter.get("from_id"),
+                "to_id": inter.get("to_id"),
                 "from_name": inter.get("from_name"),
                 "to_name": inter.get("to_name"),
                 "from_url": inter.get("from_url"),
                 "to_url": inter.get("to_url"),
                 "animation": inter.get("animation", "Instant"),
+                "to_frame_hash": frame_hashes.get(inter.get("to_frame_id")),
             })
 
+        for frame in frame_map.values():
+            frame["signature"] = self._frame_signature(frame_hashes.get(frame["frame_id"]), frame["elements"])
+
         self.frame_registry = frame_map
-        log.info(f"✓ Processed {len(frame_map)} unique Figma frames.")
+        log.info(f"✓ Processed {len(frame_map)} unique Figma frames ({duplicates} duplicate interactions dropped).")
         return frame_map
 
+    def _frame_signature(self, frame_hash: str, elements: List[Dict[str, Any]]) -> str:
+        """
+        Identity of a screen's summarization inputs: its own content hash plus
+        every interaction and the content hash of each destination frame.
+        None when the frame's content hash is unknown.
+        """
+        if not frame_hash:
+            return None
+        payload = [frame_hash] + [
+            [el["from_id"], el["to_id"], el["animation"], el["to_frame_hash"]] for el in elements
+        ]
+        return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
     def preprocess_clickup_data(self) -> Dict[str, Any]:
         """
         Extracts and cleans ClickUp context: title, description,
@@ -1,161 +1,434 @@
 # modules/figma_extractor.py
-import requests
-import logging ,time 
+import sys
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+from http_client import get_session
+from resilience import RetryPolicy, call_with_retry, classify_error
+from singleflight import SingleFlight
+from tracing import KIND_CLIENT, bind, record_response, span
 
-logging.basicConfig(level=logging.INFO, format="%(message)s")
 log = logging.getLogger(__name__)
 
+FIGMA_ENDPOINT = "api.figma.com"
+FIGMA_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0)
+
+# Ids per /nodes request; each id brings a whole subtree, so these stay small
+NODES_CHUNK_SIZE = 10
+# /images takes long id lists and is rate-limited, so renders are packed into as few
+# requests as fit under this URL length (well inside what Figma accepts)
+MAX_URL_LENGTH = 4000
+MAX_CONCURRENT_REQUESTS = 4
+
+FRAME_TYPES = ("FRAME", "SECTION")
+
+# Concurrent runs asking for the same node tree / renders share one request
+_nodes_flight = SingleFlight("figma-nodes")
+_images_flight = SingleFlight("figma-images")
+
+# Node fields that change without the design changing; ignored by frame content hashes
+VOLATILE_KEYS = {"pluginData", "sharedPluginData", "lastModified", "thumbnailUrl", "version"}
+# Canvas-absolute boxes are rebased onto the frame origin so moving a frame doesn't change its hash
+ABSOLUTE_BOX_KEYS = ("absoluteBoundingBox", "absoluteRenderBounds")
+
+
+def frame_content_hash(frame: dict) -> str:
+    """Stable hash of a frame subtree, ignoring volatile fields and the frame's canvas position."""
+    origin = frame.get("absoluteBoundingBox") or {}
+    ox, oy = origin.get("x", 0), origin.get("y", 0)
+
+    def canonical(node):
+        if isinstance(node, list):
+            return [canonical(n) for n in node]
+        if not isinstance(node, dict):
+            return node
+        out = {}
+        for key, value in node.items():
+            if key in VOLATILE_KEYS:
+                continue
+            if key in ABSOLUTE_BOX_KEYS and isinstance(value, dict):
+                value = {**value, "x": value.get("x", 0) - ox, "y": value.get("y", 0) - oy}
+            out[key] = canonical(value)
+        return out
+
+    payload = json.dumps(canonical(frame), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_node_ids(node_ids: Union[str, List[str]]) -> List[str]:
+    """Node ids from a list or a comma-separated string, de-duplicated in order."""
+    if isinstance(node_ids, str):
+        node_ids = node_ids.split(",")
+    return list(dict.fromkeys(n.strip() for n in node_ids if n and n.strip()))
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _chunks_by_length(items: List[str], budget: int) -> List[List[str]]:
+    """Split `items` so each chunk, comma-joined, is at most `budget` characters (one item always fits)."""
+    chunks, current, length = [], [], 0
+    for item in items:
+        if current and length + 1 + len(item) > budget:
+            chunks.append(current)
+            current, length = [], 0
+        length += len(item) + (1 if current else 0)
+        current.append(item)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass(slots=True)
+class NodeRef:
+    """Name and enclosing top-level frame of a node an interaction can refer to."""
+    name: str
+    frame_id: Optional[str]
+
+
+@dataclass(slots=True)
+class RawInteraction:
+    """A prototype link found while walking the tree, before destination filtering."""
+    from_id: str
+    from_name: str
+    to_id: str
+    animation: str
+
+
+class ExtractionCancelled(Exception):
+    """Raised by run_extraction once its `cancelled` event is set."""
+
 
 class FigmaPrototypeAnalyzer:
 
 
-    def __init__(self, token: str, file_key: str, node_id: str):
+    def __init__(
+        self,
+        token: str,
+        file_key: str,
+        node_id: Union[str, List[str]],
+        two_phase: bool = False,
+        on_frames: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        """
+        `node_id` is one node id, several comma-separated, or a list; their
+        frames are merged into one result.
+
+        With `two_phase`, the requested nodes are first fetched one level deep
+        to list their frames, then every top-level subtree is fetched in
+        small concurrent chunks. That transfers the same bytes as one request
+        but in many more calls, in exchange for a much lower peak memory and
+        an early frame list. `on_frames` is called with the frame list
+        (screen_name, url, node_id; no content hash yet) as soon as it is
+        known, which in two-phase mode is before the subtrees are downloaded.
+        """
         self.token = token
         self.file_key = file_key
-        self.node_id = node_id
+        self.node_ids = parse_node_ids(node_id)
+        if not self.node_ids:
+            raise ValueError("At least one Figma node id is required.")
+        self.node_id = ",".join(self.node_ids)
+        self.two_phase = two_phase
+        self.on_frames = on_frames
         self.headers = {"X-Figma-Token": self.token}
-        self.node_name_map = {}
-        self.node_parent_map = {}
+        # Only FRAME/SECTION nodes and interaction sources, not every node in the tree
+        self.nodes: Dict[str, NodeRef] = {}
         self.valid_destination_nodes = set()
         self.frame_data = []
+        # Parsed /nodes response; released once extraction is done
         self.raw_node_data = None
+        # Two-phase mode walks each subtree as it arrives and keeps only these
+        self._raw_interactions: Optional[List[RawInteraction]] = None
 
 
     def fetch_all_frames(self) -> list[dict]:
         """Fetch all frame-level data (screens) from parent node with retry handling."""
-        api_url = f"https://api.figma.com/v1/files/{self.file_key}/nodes?ids={self.node_id}"
-        max_retries = 3
-        delay = 5  # seconds
-
-        for attempt in range(max_retries):
+        if self.two_phase:
             try:
-                response = requests.get(api_url, headers=self.headers, timeout=120)
-                response.raise_for_status()
-                data = response.json()
-                break  
-
-            except requests.exceptions.ChunkedEncodingError:
-                logging.warning(f" Figma API connection dropped (attempt {attempt+1}/{max_retries}). Retrying in {delay}s...")
-                time.sleep(delay)
-
-            except requests.exceptions.RequestException as e:
-                logging.error(f" Request failed (attempt {attempt+1}/{max_retries}): {e}")
-                time.sleep(delay)
-        else:
-            # If loop finishes without break
-            raise RuntimeError("Failed to fetch Figma frames after multiple attempts.")
-
-       
+                self.frame_data = self._fetch_two_phase()
+            except RuntimeError:
+                raise
+            except Exception as e:
+                raise RuntimeError(f"Failed to fetch Figma frames ({classify_error(e)} error): {e}") from e
+            return self.frame_data
+
+        try:
+            data = self._fetch_nodes()
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch Figma frames ({classify_error(e)} error): {e}") from e
+
         self.raw_node_data = data
-        children = data["nodes"][self.node_id]["document"].get("children", [])
+        roots = self._documents(data, warn=True)
+        if not roots:
+            raise RuntimeError(f"Figma node(s) {self.node_id} not found in file {self.file_key}")
+
+        children = [c for root in roots for c in root.get("children", []) if c["type"] in FRAME_TYPES]
+        self._notify_frames(children)
 
         results = []
         for child in children:
-            if child["type"] in ["FRAME", "SECTION"]:
-                node_id = child["id"]
-                results.append(
-                    {
-                        "screen_name": child.get("name", "Unnamed"),
-                        "url": f"https://www.figma.com/file/{self.file_key}/?type=design&node-id={node_id}",
-                        "node_id": node_id,
-                    }
-                )
+            results.append({**self._frame_entry(child), "content_hash": frame_content_hash(child)})
 
         self.frame_data = results
         return results
 
+    def _frame_entry(self, child: dict) -> dict:
+        node_id = sys.intern(child["id"])
+        return {
+            "screen_name": child.get("name", "Unnamed"),
+            "url": f"https://www.figma.com/file/{self.file_key}/?type=design&node-id={node_id}",
+            "node_id": node_id,
+        }
+
+    def _notify_frames(self, children: List[dict]):
+        if self.on_frames:
+            try:
+                self.on_frames([self._frame_entry(c) for c in children])
+            except Exception as e:
+                log.warning(f"Frame list callback failed: {e}")
+
+    def _fetch_two_phase(self) -> List[dict]:
+        """
+        Phase one lists each requested node's direct children (depth=1), so
+        the frame list is known early; phase two fetches every child's
+        subtree, a few per request and concurrently. Non-frame children
+        (GROUP, INSTANCE, COMPONENT...) are fetched too, since they can hold
+        prototype links or link targets.
+
+        Each chunk is hashed and walked by the thread that fetched it and its
+        parsed tree dropped straight away, so peak memory is a few chunks
+        rather than the whole document. The results are merged in document
+        order, giving the same frames and interactions as single-phase mode.
+        """
+        outline = self._fetch_nodes(depth=1)
+        roots = self._documents(outline, warn=True)
+        if not roots:
+            raise RuntimeError(f"Figma node(s) {self.node_id} not found in file {self.file_key}")
+        self._notify_frames([c for root in roots for c in root.get("children", []) if c.get("type") in FRAME_TYPES])
+
+        raw_interactions: List[RawInteraction] = []
+        child_ids = []
+        for root in roots:
+            # The roots themselves, without their (depth-limited) children
+            raw_interactions.extend(self._walk({**root, "children": []}, 0, self.nodes, self.valid_destination_nodes))
+            child_ids.extend(c["id"] for c in root.get("children", []))
+
+        frames = []
+        summaries = self._map_chunks(self._summarize_subtrees, _chunks(child_ids, NODES_CHUNK_SIZE))
+        found = {node_id: summary for chunk in summaries for node_id, summary in chunk.items()}
+        for node_id in child_ids:
+            summary = found.get(node_id)
+            if summary is None:
+                log.warning(f"Figma node {node_id} disappeared between the outline and subtree fetches")
+                continue
+            frame, nodes, destinations, interactions = summary
+            if frame:
+                frames.append(frame)
+            self.nodes.update(nodes)
+            self.valid_destination_nodes.update(destinations)
+            raw_interactions.extend(interactions)
+
+        self._raw_interactions = raw_interactions
+        return frames
+
+    def _summarize_subtrees(self, node_ids: List[str]) -> Dict[str, tuple]:
+        """
+        Fetch one chunk of top-level subtrees and reduce each to (frame entry
+        or None, node refs, destination ids, raw interactions). Runs on a pool
+        thread, so it fills local containers rather than the analyzer's.
+        """
+        data = self._fetch_nodes_chunk(node_ids)
+        out = {}
+        for node_id in node_ids:
+            entry = (data.get("nodes") or {}).get(node_id)
+            if not entry or not entry.get("document"):
+                continue
+            child = entry["document"]
+            frame = {**self._frame_entry(child), "content_hash": frame_content_hash(child)} if child.get("type") in FRAME_TYPES else None
+            nodes: Dict[str, NodeRef] = {}
+            destinations = set()
+            interactions = self._walk(child, 1, nodes, destinations)
+            out[node_id] = (frame, nodes, destinations, interactions)
+        return out
+
+    def _documents(self, data: dict, warn: bool = False) -> List[dict]:
+        """Document trees of the requested nodes, in request order; missing nodes are skipped."""
+        nodes = data.get("nodes") or {}
+        roots = []
+        for node_id in self.node_ids:
+            entry = nodes.get(node_id)
+            if entry and entry.get("document"):
+                roots.append(entry["document"])
+            elif warn:
+                log.warning(f"Figma node {node_id} not found in file {self.file_key}")
+        return roots
+
+    def _map_chunks(self, fn, chunks: list) -> list:
+        if not chunks:
+            return []
+        if len(chunks) == 1:
+            return [fn(chunks[0])]
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_REQUESTS, len(chunks))) as pool:
+            return list(pool.map(bind(fn), chunks))
+
+    def _fetch_nodes(self, node_ids: Optional[List[str]] = None, depth: Optional[int] = None) -> dict:
+        """
+        GET /nodes for `node_ids` (default: this analyzer's node ids), a few ids
+        per request with the requests run concurrently, merged into one
+        response. `depth` limits how far below each node the tree goes. Each
+        chunk is coalesced with identical in-flight requests.
+        """
+        ids = self.node_ids if node_ids is None else node_ids
+        merged = {"nodes": {}}
+        for data in self._map_chunks(lambda chunk: self._fetch_nodes_chunk(chunk, depth), _chunks(ids, NODES_CHUNK_SIZE)):
+            merged["nodes"].update(data.get("nodes") or {})
+        return merged
+
+    def _fetch_nodes_chunk(self, node_ids: List[str], depth: Optional[int] = None) -> dict:
+        ids_param = ",".join(node_ids)
+        api_url = f"https://api.figma.com/v1/files/{self.file_key}/nodes?ids={ids_param}"
+        if depth is not None:
+            api_url += f"&depth={depth}"
+
+        def fetch():
+            with span("http.get", kind=KIND_CLIENT, **{"http.url": api_url, "url.type": "figma_nodes", "figma.node_count": len(node_ids)}) as s:
+                response = get_session().get(api_url, headers=self.headers, timeout=120)
+                record_response(s, response)
+            response.raise_for_status()
+            # Parse straight from the bytes: response.json() would first decode a full str copy of the body
+            return json.loads(response.content)
+
+        return _nodes_flight.do(
+            f"{self.file_key}:{ids_param}:{depth}",
+            lambda: call_with_retry(fetch, FIGMA_ENDPOINT, FIGMA_RETRY_POLICY, "Figma frames fetch"),
+        )
 
     def get_node_images(self, node_ids: list[str]) -> dict:
-        """Fetch image URLs for given node IDs."""
+        """Fetch image URLs for given node IDs, in concurrent chunks. Failed chunks are logged and left out."""
         if not node_ids:
             return {}
-        clean_ids = [self._clean_node_id(n) for n in node_ids]
+        clean_ids = sorted({self._clean_node_id(n) for n in node_ids})
+        images = {}
+        budget = MAX_URL_LENGTH - len(self._render_url(""))
+        for chunk_images in self._map_chunks(self._render_chunk, _chunks_by_length(clean_ids, budget)):
+            images.update(chunk_images)
+        return images
+
+    def _render_url(self, ids_param: str) -> str:
+        return f"https://api.figma.com/v1/images/{self.file_key}?ids={ids_param}&format=png"
+
+    def _render_chunk(self, clean_ids: List[str]) -> dict:
         ids_param = ",".join(clean_ids)
-        url = f"https://api.figma.com/v1/images/{self.file_key}?ids={ids_param}&format=png"
-        response = requests.get(url, headers=self.headers, timeout=120)
-        if response.status_code == 200:
+        url = self._render_url(ids_param)
+
+        def fetch():
+            with span("http.get", kind=KIND_CLIENT, **{"http.url": url, "url.type": "figma_images", "figma.render_count": len(clean_ids)}) as s:
+                response = get_session().get(url, headers=self.headers, timeout=120)
+                record_response(s, response)
+            response.raise_for_status()
             return response.json().get("images", {})
-        return {}
+
+        try:
+            return _images_flight.do(
+                f"{self.file_key}:{ids_param}",
+                lambda: call_with_retry(fetch, FIGMA_ENDPOINT, FIGMA_RETRY_POLICY, "Figma image render"),
+            ) or {}
+        except Exception as e:
+            log.error(f"Figma image render failed for {len(clean_ids)} nodes: {e}")
+            return {}
 
     def _clean_node_id(self, node_id: str) -> str:
         return node_id.split(";")[0] if ";" in node_id else node_id
 
     def _find_parent_frame(self, node_id: str) -> str:
         """Find parent frame of a given node."""
-        if any(f["node_id"] == node_id for f in self.frame_data):
-            return node_id
-
-        visited = set()
-        current_id = node_id
-        while current_id and current_id not in visited:
-            visited.add(current_id)
-            parent_id = self.node_parent_map.get(current_id)
-            if not parent_id:
-                break
-            if any(f["node_id"] == parent_id for f in self.frame_data):
-                return parent_id
-            current_id = parent_id
-        return node_id
-
-    def _traverse_collect(self, node, parent_id=None, raw_interactions=None):
-        """Traverse nodes to collect metadata and prototype links."""
-        if raw_interactions is None:
-            raw_interactions = []
-
-        node_id = node.get("id")
-        clean_id = self._clean_node_id(node_id)
-        self.node_name_map[clean_id] = node.get("name", "Unnamed")
-        self.node_parent_map[clean_id] = parent_id
-
-        if node.get("type") in ["FRAME", "SECTION"]:
-            self.valid_destination_nodes.add(clean_id)
-
-        transition_node_id = node.get("transitionNodeID")
-        if transition_node_id:
-            raw_interactions.append(
-                {
-                    "from_id": clean_id,
-                    "from_name": node.get("name", "Unnamed"),
-                    "to_id": self._clean_node_id(transition_node_id),
-                    "animation": node.get("transitionType", "Instant"),
-                }
-            )
-
-        for child in node.get("children", []):
-            self._traverse_collect(child, clean_id, raw_interactions)
+        ref = self.nodes.get(node_id)
+        return ref.frame_id if ref and ref.frame_id else node_id
+
+    def _traverse_collect(self, root: dict) -> List[RawInteraction]:
+        """
+        Walk the tree collecting prototype links and the nodes they refer to.
+        Iterative, so very deep files can't hit the recursion limit. Each node's
+        top-level frame (a FRAME/SECTION child of the root, as in
+        fetch_all_frames) is carried down the walk instead of keeping a parent
+        map of the whole tree.
+        """
+        return self._walk(root, 0, self.nodes, self.valid_destination_nodes)
+
+    def _walk(self, root: dict, root_depth: int, nodes: Dict[str, NodeRef], destinations: set) -> List[RawInteraction]:
+        """_traverse_collect into the given containers, starting at `root_depth` (1 for a top-level child)."""
+        raw_interactions: List[RawInteraction] = []
+        stack = [(root, None, root_depth)]
+        while stack:
+            node, frame_id, depth = stack.pop()
+            is_frame = node.get("type") in FRAME_TYPES
+            transition_node_id = node.get("transitionNodeID")
+            if is_frame or transition_node_id:
+                node_id = sys.intern(self._clean_node_id(node.get("id")))
+                name = sys.intern(node.get("name", "Unnamed"))
+                if is_frame and depth == 1:
+                    frame_id = node_id
+                nodes[node_id] = NodeRef(name=name, frame_id=frame_id)
+            if is_frame:
+                destinations.add(node_id)
+            if transition_node_id:
+                raw_interactions.append(RawInteraction(
+                    from_id=node_id,
+                    from_name=name,
+                    to_id=sys.intern(self._clean_node_id(transition_node_id)),
+                    animation=sys.intern(node.get("transitionType", "Instant")),
+                ))
+
+            children = node.get("children")
+            if children:
+                # Reversed so children are visited in document order
+                stack.extend((child, frame_id, depth + 1) for child in reversed(children))
 
         return raw_interactions
 
-    def extract_interactions(self) -> list[dict]:
-        """Extract prototype interactions (with image URLs)."""
-        data = self.raw_node_data
-        if not data:
-            url = f"https://api.figma.com/v1/files/{self.file_key}/nodes?ids={self.node_id}"
-            response = requests.get(url, headers=self.headers, timeout=300)
-            if response.status_code != 200:
-                return []
-            data = response.json()
-
-        nodes = data.get("nodes", {})
-        if self.node_id not in nodes:
-            return []
-
-        document = nodes[self.node_id]["document"]
-        raw_interactions = self._traverse_collect(document)
+    def _collect_interactions(self) -> list[dict]:
+        """Prototype interactions between valid destination frames, across all requested nodes (no image URLs yet)."""
+        raw_interactions = self._raw_interactions
+        if raw_interactions is None:
+            data = self.raw_node_data
+            if not data:
+                try:
+                    data = self._fetch_nodes()
+                except Exception as e:
+                    log.error(f"Figma node fetch failed: {e}")
+                    return []
+
+            # Every tree is walked before filtering so links between the requested nodes are kept
+            raw_interactions = []
+            for document in self._documents(data):
+                raw_interactions.extend(self._traverse_collect(document))
 
         # Filter interactions to valid destination frames
-        valid_interactions = [
+        return [
             {
-                "from_id": r["from_id"],
-                "from_name": r["from_name"],
-                "to_id": r["to_id"],
-                "to_name": self.node_name_map.get(r["to_id"], "Unknown"),
-                "animation": r["animation"],
+                "from_id": r.from_id,
+                "from_name": r.from_name,
+                "to_id": r.to_id,
+                "to_name": self.nodes[r.to_id].name,
+                "animation": r.animation,
             }
             for r in raw_interactions
-            if r["to_id"] in self.valid_destination_nodes
+            if r.to_id in self.valid_destination_nodes
         ]
 
+    def _attach_element_urls(self, interactions: list[dict], node_images: dict):
+        for inter in interactions:
+            inter["from_url"] = node_images.get(inter["from_id"], "")
+            inter["to_url"] = node_images.get(inter["to_id"], "")
+
+    def extract_interactions(self) -> list[dict]:
+        """Extract prototype interactions (with image URLs)."""
+        valid_interactions = self._collect_interactions()
         if not valid_interactions:
             return []
 
@@ -164,31 +437,50 @@ class FigmaPrototypeAnalyzer:
         for i in valid_interactions:
             all_nodes.add(i["from_id"])
             all_nodes.add(i["to_id"])
-        node_images = self.get_node_images(list(all_nodes))
-
-        for inter in valid_interactions:
-            inter["from_url"] = node_images.get(inter["from_id"], "")
-            inter["to_url"] = node_images.get(inter["to_id"], "")
-
+        self._attach_element_urls(valid_interactions, self.get_node_images(list(all_nodes)))
         return valid_interactions
 
-    def enrich_with_frame_urls(self, interactions: list[dict]) -> list[dict]:
-        """Attach frame image URLs."""
-        all_frame_ids = [f["node_id"] for f in self.frame_data]
-        frame_images = self.get_node_images(all_frame_ids)
+    def enrich_with_frame_urls(self, interactions: list[dict], frame_images: Optional[dict] = None) -> list[dict]:
+        """Attach frame image URLs, rendering the frames unless `frame_images` is given."""
+        if frame_images is None:
+            frame_images = self.get_node_images([f["node_id"] for f in self.frame_data])
 
         for inter in interactions:
             from_frame = self._find_parent_frame(inter["from_id"])
             to_frame = self._find_parent_frame(inter["to_id"])
+            inter["from_frame_id"] = from_frame
+            inter["to_frame_id"] = to_frame
             inter["from_frame_url"] = frame_images.get(from_frame, inter.get("from_url", ""))
             inter["to_frame_url"] = frame_images.get(to_frame, inter.get("to_url", ""))
         return interactions
 
-    def run_extraction(self) -> dict:
-       
+    def _check_cancelled(self, cancelled: Optional[threading.Event]):
+        if cancelled is not None and cancelled.is_set():
+            raise ExtractionCancelled(f"Figma extraction of {self.file_key}/{self.node_id} was cancelled")
+
+    def run_extraction(self, cancelled: Optional[threading.Event] = None) -> dict:
+        """
+        Frames and enriched interactions of the requested nodes. If `cancelled`
+        is set while this runs, ExtractionCancelled is raised at the next stage
+        boundary, so an abandoned run skips the remaining fetches and renders.
+        """
         frames = self.fetch_all_frames()
-        interactions = self.extract_interactions()
-        enriched = self.enrich_with_frame_urls(interactions) if interactions else []
+        self._check_cancelled(cancelled)
+        interactions = self._collect_interactions()
+        # The parsed tree is by far the largest object here and nothing needs it past this point
+        self.raw_node_data = None
+        self._raw_interactions = None
+        self._check_cancelled(cancelled)
+
+        enriched = []
+        if interactions:
+            # One render stage for element, destination and frame images
+            render_ids = {f["node_id"] for f in frames}
+            for inter in interactions:
+                render_ids.update((inter["from_id"], inter["to_id"]))
+            images = self.get_node_images(list(render_ids))
+            self._attach_element_urls(interactions, images)
+            enriched = self.enrich_with_frame_urls(interactions, images)
 
 
         for inter in enriched:
@@ -0,0 +1,208 @@
+# http_client.py
+"""
+Shared pooled HTTP sessions for the ClickUp, Figma and image downloads, with
+an optional record/replay transport for reproducible offline runs.
+
+    HTTP_CASSETTE_MODE=record  HTTP_CASSETTE_DIR=cassettes/demo  python run_batch.py ...
+    HTTP_CASSETTE_MODE=replay  HTTP_CASSETTE_DIR=cassettes/demo  python run_batch.py ...
+
+In replay mode no request leaves the machine. HTTP_CASSETTE_LATENCY_MS adds
+an exponentially distributed delay with that mean to each replayed response.
+HTTP_CASSETTE_FAILURE_RATE turns that fraction of responses into
+HTTP_CASSETTE_FAILURE_STATUS (default 503) errors. HTTP_CASSETTE_SEED makes
+both reproducible.
+"""
+import os
+import json
+import random
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_DIR = os.path.join("data", "cassettes")
+
+# Response headers never written to a cassette
+SKIPPED_HEADERS = {"set-cookie", "content-encoding", "transfer-encoding", "connection"}
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def _normalized_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None) -> str:
+    """Cassette key for a request: method, URL with sorted query, and body. Headers (tokens) are ignored."""
+    digest = hashlib.sha256(f"{method.upper()} {_normalized_url(url)}\n".encode("utf-8"))
+    if body:
+        digest.update(body if isinstance(body, bytes) else str(body).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class CassetteAdapter(HTTPAdapter):
+    """
+    Transport adapter that records real responses (status, headers, raw body
+    bytes) to `cassette_dir`, or replays them from there without network
+    access, optionally with injected latency and failures.
+    """
+
+    def __init__(
+        self,
+        cassette_dir: str,
+        mode: str = "replay",
+        latency_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_status: int = 503,
+        seed: Optional[int] = None,
+        **kwargs,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        super().__init__(**kwargs)
+        self.cassette_dir = cassette_dir
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        os.makedirs(cassette_dir, exist_ok=True)
+
+    def _paths(self, key: str):
+        return os.path.join(self.cassette_dir, f"{key}.json"), os.path.join(self.cassette_dir, f"{key}.body")
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        if self.mode == "record":
+            response = super().send(request, **kwargs)
+            self._save(key, request, response)
+            return response
+        return self._replay(key, request)
+
+    def _save(self, key: str, request, response):
+        meta_path, body_path = self._paths(key)
+        meta = {
+            "method": request.method,
+            "url": _normalized_url(request.url),
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+            "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+        }
+        with open(body_path, "wb") as f:
+            f.write(response.content)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    def _replay(self, key: str, request) -> requests.Response:
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            raise CassetteMiss(f"No recorded response for {request.method} {request.url} in {self.cassette_dir}", request=request)
+
+        with self._lock:
+            delay = self._random.expovariate(1000.0 / self.latency_ms) if self.latency_ms > 0 else 0.0
+            failed = self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.connection = self
+        if failed:
+            response.status_code = self.failure_status
+            response.reason = "Injected failure"
+            response.headers = CaseInsensitiveDict({"Content-Type": "text/plain"})
+            response._content = b"Injected failure"
+        else:
+            response.status_code = meta["status_code"]
+            response.reason = meta.get("reason")
+            response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+            response._content = body
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
+
+
+def _cassette_settings() -> Optional[dict]:
+    mode = os.getenv("HTTP_CASSETTE_MODE", "").lower()
+    if mode in ("", "off"):
+        return None
+    seed = os.getenv("HTTP_CASSETTE_SEED")
+    return {
+        "cassette_dir": os.getenv("HTTP_CASSETTE_DIR", DEFAULT_CASSETTE_DIR),
+        "mode": mode,
+        "latency_ms": float(os.getenv("HTTP_CASSETTE_LATENCY_MS", 0)),
+        "failure_rate": float(os.getenv("HTTP_CASSETTE_FAILURE_RATE", 0)),
+        "failure_status": int(os.getenv("HTTP_CASSETTE_FAILURE_STATUS", 503)),
+        "seed": int(seed) if seed else None,
+    }
+
+
+# Set by reset_session(); overrides the environment for sessions created afterwards
+_configured: Optional[dict] = None
+
+
+def new_session(pool_maxsize: int = 10, cassette: Optional[dict] = None) -> requests.Session:
+    """
+    A pooled session. `cassette` holds CassetteAdapter arguments ({} for
+    none); by default they come from reset_session() or the HTTP_CASSETTE_*
+    environment variables (off when unset).
+    """
+    settings = next(c for c in (cassette, _configured, _cassette_settings(), {}) if c is not None)
+    if settings:
+        adapter = CassetteAdapter(pool_connections=4, pool_maxsize=pool_maxsize, **settings)
+        log.info(f"HTTP cassette {settings['mode']} mode: {settings['cassette_dir']}")
+    else:
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_sessions: Dict[str, requests.Session] = {}
+_session_lock = threading.Lock()
+
+
+def get_session(name: str = "api", pool_maxsize: int = 10) -> requests.Session:
+    """
+    Process-wide session for `name`, created on first use. The API clients
+    share "api"; image downloads use their own, wider pool.
+    """
+    with _session_lock:
+        if name not in _sessions:
+            _sessions[name] = new_session(pool_maxsize=pool_maxsize)
+        return _sessions[name]
+
+
+def reset_session(cassette: Optional[dict] = None) -> requests.Session:
+    """
+    Replace the shared session and the default for new sessions, e.g. to
+    switch cassettes between benchmark runs. None goes back to the environment.
+    """
+    global _configured
+    with _session_lock:
+        _configured = cassette
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _sessions["api"] = new_session()
+        return _sessions["api"]
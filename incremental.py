@@ -0,0 +1,106 @@
+# incremental.py
+import os
+import json
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_INCREMENTAL_DIR = os.path.join("data", "incremental")
+
+
+class RowCache:
+    """
+    Dict-like cache of generated headings / business rules for DocxSections.
+
+    Reads fall through from the current run's `journal` (checkpoint resume) to
+    the previous successful run's rows; writes go to the journal. Every key
+    read or written is remembered so only rows still in use are carried
+    forward to the next run.
+    """
+
+    def __init__(self, previous: Dict[str, Any], journal=None):
+        self.previous = previous or {}
+        self.journal = journal
+        self.used: Dict[str, Any] = {}
+        self.hits = 0
+
+    def __contains__(self, key: str) -> bool:
+        return (self.journal is not None and key in self.journal) or key in self.previous
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self.journal is not None and key in self.journal:
+            value = self.journal.get(key)
+        elif key in self.previous:
+            value = self.previous[key]
+        else:
+            return default
+        self.hits += 1
+        self.used[key] = value
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self.used[key] = value
+        if self.journal is not None:
+            self.journal[key] = value
+
+
+def _is_complete(screen: Dict[str, Any]) -> bool:
+    """False if any of the screen's summaries came back empty (e.g. a failed vision call)."""
+    if not screen.get("frame_summary"):
+        return False
+    return all(
+        inter.get("from_summary") and (inter.get("to_summary") or not inter.get("to_url"))
+        for inter in screen.get("interactions", [])
+    )
+
+
+class IncrementalStore:
+    """
+    State of the last successful run for one Figma file/node: per-frame
+    screen summaries keyed by frame signature (see Preprocessor._frame_signature)
+    and the generated document rows. Used to skip re-summarizing and
+    regenerating frames that haven't changed.
+    """
+
+    def __init__(self, figma_file_key: str, figma_node_id: str, base_dir: str = DEFAULT_INCREMENTAL_DIR):
+        key = json.dumps([figma_file_key, figma_node_id])
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        os.makedirs(base_dir, exist_ok=True)
+        self.path = os.path.join(base_dir, f"{digest}.json")
+        self.state = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {"screens": {}, "rows": {}}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable incremental state {self.path}: {e}")
+            return {"screens": {}, "rows": {}}
+
+    def previous_screens(self) -> Dict[str, Dict[str, Any]]:
+        # Incomplete screens are summarized again rather than reused
+        return {sig: screen for sig, screen in self.state.get("screens", {}).items() if _is_complete(screen)}
+
+    def row_cache(self, journal=None) -> RowCache:
+        return RowCache(self.state.get("rows", {}), journal)
+
+    def save(self, summarized_figma: Dict[str, Any], rows: Optional[RowCache] = None):
+        """
+        Replace the stored state with this run's complete screens and the rows
+        it used. Without `rows` (no document was generated) the stored rows are kept.
+        """
+        screens = {
+            screen["signature"]: screen
+            for screen in summarized_figma.get("screens", [])
+            if screen.get("signature") and _is_complete(screen)
+        }
+        state = {"screens": screens, "rows": rows.used if rows is not None else self.state.get("rows", {})}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.state = state
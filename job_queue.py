@@ -0,0 +1,235 @@
+# job_queue.py
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join("data", "jobs", "jobs.db")
+
+# A job whose worker has died this many times is failed instead of requeued again
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    stage TEXT,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job_seq ON job_events (job_id, seq);
+"""
+
+
+class JobQueue:
+    """
+    Persistent FIFO job queue in a local SQLite file, shared by the Streamlit
+    app (producer) and worker processes (consumers).
+
+    Job status moves queued -> running -> done | failed, or to cancelled
+    from queued or running. Workers append partial results to a job as
+    events (see add_event) so the app can show them before the job finishes;
+    they are deleted once it does.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "attempts" not in columns:
+                # Queue files created before attempts were counted
+                conn.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            # Events left by finished jobs in queue files from before they were dropped on finish
+            conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT id FROM jobs WHERE status = 'running')")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(params), time.time()),
+            )
+        log.info(f"Queued job {job_id}")
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued job, or None if the queue is empty."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (worker, time.time(), row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def set_stage(self, job_id: str, stage: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ? WHERE id = ?", (stage, job_id))
+
+    def complete(self, job_id: str, result: Any):
+        # Only a running job can finish; a cancelled one stays cancelled
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', stage = 'done', result = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (json.dumps(result), time.time(), job_id),
+            )
+            self._drop_events(conn, job_id)
+
+    def fail(self, job_id: str, error: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                (error, time.time(), job_id),
+            )
+            self._drop_events(conn, job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it had already finished."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            )
+            self._drop_events(conn, job_id)
+        if cur.rowcount:
+            log.info(f"Cancelled job {job_id}")
+        return cur.rowcount > 0
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row["status"] == "cancelled"
+
+    def add_event(self, job_id: str, kind: str, payload: Dict[str, Any]):
+        """Record a partial result (e.g. one summarized screen) for the app to show while the job runs."""
+        # Skipped once the job has finished, so nothing is left behind after _drop_events
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, kind, payload, created_at) "
+                "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM jobs WHERE id = ? AND status = 'running')",
+                (job_id, kind, json.dumps(payload), time.time(), job_id),
+            )
+
+    @staticmethod
+    def _drop_events(conn, job_id: str):
+        # Events only feed the live view of a running job; the finished job's result replaces them
+        conn.execute("DELETE FROM job_events WHERE job_id = ?", (job_id,))
+
+    def events(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """A job's events in the order they were added, starting after sequence number `after`."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, kind, payload FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after),
+            ).fetchall()
+        return [{"seq": row["seq"], "kind": row["kind"], "payload": json.loads(row["payload"])} for row in rows]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def position(self, job_id: str) -> int:
+        """Number of queued jobs ahead of `job_id`."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+                "AND created_at < (SELECT created_at FROM jobs WHERE id = ?)",
+                (job_id,),
+            ).fetchone()
+        return row[0]
+
+    def requeue_orphans(self) -> int:
+        """
+        Put back jobs left 'running' by worker processes on this host that no
+        longer exist. A job that has already taken down MAX_ATTEMPTS workers
+        (e.g. OOM or a crash in a native library) is failed instead.
+        """
+        host = socket.gethostname()
+        requeued = 0
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker, attempts FROM jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                worker_host, _, pid = (row["worker"] or "").rpartition(":")
+                if worker_host != host or not pid.isdigit() or _pid_alive(int(pid)):
+                    continue
+                if row["attempts"] >= MAX_ATTEMPTS:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                        (f"Worker process died {row['attempts']} times while running this job", time.time(), row["id"]),
+                    )
+                    log.error(f"Job {row['id']} killed {row['attempts']} workers; marking it failed")
+                    self._drop_events(conn, row["id"])
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, stage = NULL WHERE id = ?",
+                    (row["id"],),
+                )
+                # The rerun reports its progress again from scratch
+                self._drop_events(conn, row["id"])
+                requeued += 1
+        if requeued:
+            log.warning(f"Requeued {requeued} jobs orphaned by dead workers")
+        return requeued
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
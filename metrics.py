@@ -0,0 +1,384 @@
+# metrics.py
+"""
+Long-running performance metrics in Prometheus text format.
+
+Every process (Streamlit, queue workers, batch jobs) keeps its own counters
+and histograms, mostly fed from finished tracing spans, and flushes a JSON
+snapshot to data/metrics/ after each pipeline run. Snapshots of processes
+that have exited are folded into one aggregate file on the next flush. The
+exporter sums all of them:
+
+    python metrics.py serve --port 9464       # scrape http://localhost:9464/metrics
+    python metrics.py write story_generator.prom   # node_exporter textfile collector
+"""
+import os
+import json
+import socket
+import logging
+import argparse
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: dead processes' snapshots are not compacted
+    fcntl = None
+
+import resilience
+from tracing import STATUS_ERROR, on_span_end
+
+log = logging.getLogger(__name__)
+
+DEFAULT_METRICS_DIR = os.path.join("data", "metrics")
+AGGREGATE_FILE = "aggregate.json"
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.kind = "counter"
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"kind": self.kind, "help": self.help, "series": [[list(k), v] for k, v in self.values.items()]}
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.kind = "histogram"
+        self.buckets = list(buckets)
+        self.values: Dict[LabelKey, dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.values.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            idx = bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                series["buckets"][idx] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "help": self.help,
+                "bounds": self.buckets,
+                "series": [[list(k), dict(v, buckets=list(v["buckets"]))] for k, v in self.values.items()],
+            }
+
+
+class Registry:
+    """Named metrics of one process, plus collectors polled at snapshot time."""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: List[Callable[[], Dict[str, dict]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = SECONDS_BUCKETS) -> Histogram:
+        with self._lock:
+            return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def snapshot(self) -> Dict[str, dict]:
+        out = {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+        for collect in self.collectors:
+            try:
+                out.update(collect())
+            except Exception as e:
+                log.debug(f"Metrics collector failed: {e}")
+        return out
+
+
+REGISTRY = Registry()
+
+pipeline_runs = REGISTRY.counter("story_pipeline_runs_total", "Pipeline runs by outcome.")
+pipeline_seconds = REGISTRY.histogram("story_pipeline_duration_seconds", "End-to-end pipeline run time.")
+stage_seconds = REGISTRY.histogram("story_stage_duration_seconds", "Pipeline stage run time.")
+stage_cache = REGISTRY.counter("story_stage_cache_total", "Stage checkpoint lookups by result (hit/miss).")
+http_requests = REGISTRY.counter("story_http_requests_total", "Outbound HTTP requests by URL type and status code.")
+http_bytes = REGISTRY.counter("story_http_response_bytes_total", "Bytes downloaded by URL type.")
+http_seconds = REGISTRY.histogram("story_http_request_duration_seconds", "Outbound HTTP request latency.")
+figma_renders = REGISTRY.counter("story_figma_renders_total", "Node images requested from the Figma render API.")
+llm_calls = REGISTRY.counter("story_llm_calls_total", "Azure OpenAI chat completions by purpose and status.")
+llm_tokens = REGISTRY.counter("story_llm_tokens_total", "Azure OpenAI tokens by purpose and kind (prompt/completion).")
+llm_seconds = REGISTRY.histogram("story_llm_call_duration_seconds", "Azure OpenAI chat completion latency.")
+summaries = REGISTRY.counter("story_image_summaries_total", "Images sent for summarization by URL type and mode (single/batch).")
+dedupe_saved = REGISTRY.counter("story_dedupe_saved_calls_total", "Summarization calls skipped by near-duplicate image clustering.")
+frames = REGISTRY.counter("story_frames_total", "Summarized screens by result (reused/summarized).")
+row_cache_hits = REGISTRY.counter("story_row_cache_hits_total", "Generated document rows reused from cache.")
+
+
+def _retry_collector() -> Dict[str, dict]:
+    series = [
+        [[["decision", decision], ["endpoint", endpoint]], count]
+        for (endpoint, decision), count in resilience.retry_stats().items()
+    ]
+    return {
+        "story_retry_decisions_total": {
+            "kind": "counter",
+            "help": "Retry decisions by endpoint (success, retry, give_up_*, circuit_open).",
+            "series": series,
+        }
+    }
+
+
+REGISTRY.collectors.append(_retry_collector)
+
+
+def _record_span(s):
+    seconds = s.duration_seconds
+    attrs = s.attributes
+    failed = s.status == STATUS_ERROR
+
+    if s.name == "story_pipeline":
+        pipeline_runs.inc(status="failed" if failed else "ok")
+        pipeline_seconds.observe(seconds)
+    elif s.name.startswith("stage."):
+        stage = s.name[len("stage."):]
+        stage_seconds.observe(seconds, stage=stage)
+        if "cache_hit" in attrs:
+            stage_cache.inc(stage=stage, result="hit" if attrs["cache_hit"] else "miss")
+        if stage == "summarize" and "screens" in attrs:
+            reused = attrs.get("reused_frames", 0)
+            frames.inc(reused, result="reused")
+            frames.inc(attrs["screens"] - reused, result="summarized")
+        if "row_cache_hits" in attrs:
+            row_cache_hits.inc(attrs["row_cache_hits"])
+    elif s.name in ("http.get", "http.post", "http.put"):
+        url_type = attrs.get("url.type", "other")
+        http_requests.inc(url_type=url_type, status=attrs.get("http.status_code", "error"))
+        http_bytes.inc(attrs.get("http.response.bytes", 0), url_type=url_type)
+        http_seconds.observe(seconds, url_type=url_type)
+        if "figma.render_count" in attrs:
+            figma_renders.inc(attrs["figma.render_count"])
+    elif s.name == "llm.chat":
+        purpose = attrs.get("llm.purpose", "other")
+        llm_calls.inc(purpose=purpose, status="error" if failed else "ok")
+        llm_seconds.observe(seconds, purpose=purpose)
+        llm_tokens.inc(attrs.get("llm.prompt_tokens", 0), purpose=purpose, kind="prompt")
+        llm_tokens.inc(attrs.get("llm.completion_tokens", 0), purpose=purpose, kind="completion")
+    elif s.name in ("summarize.image", "summarize.batch"):
+        summaries.inc(
+            attrs.get("llm.images", 1),
+            url_type=attrs.get("url.type", "other"),
+            mode="batch" if s.name == "summarize.batch" else "single",
+        )
+    elif s.name == "summarize.dedupe":
+        dedupe_saved.inc(attrs.get("dedupe.saved_calls", 0))
+
+
+on_span_end(_record_span)
+
+
+def flush(metrics_dir: str = DEFAULT_METRICS_DIR) -> str:
+    """Write this process's cumulative snapshot to `metrics_dir` (one file per live process), then compact."""
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, f"{socket.gethostname()}-{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(REGISTRY.snapshot(), f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning(f"Could not write metrics snapshot {path}: {e}")
+    _compact(metrics_dir)
+    return path
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _dead_snapshots(metrics_dir: str) -> List[str]:
+    """Snapshot files written on this host by processes that are no longer running."""
+    prefix = f"{socket.gethostname()}-"
+    dead = []
+    for name in os.listdir(metrics_dir):
+        if not (name.startswith(prefix) and name.endswith(".json")):
+            continue
+        pid = name[len(prefix):-len(".json")]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            dead.append(name)
+    return sorted(dead)
+
+
+def _compact(metrics_dir: str):
+    """
+    Fold the snapshots of exited processes on this host into AGGREGATE_FILE
+    and delete them, so the directory doesn't grow by one file per batch job.
+    Other hosts' files are left alone since their pids can't be checked here.
+    """
+    if fcntl is None:
+        return
+    try:
+        with open(os.path.join(metrics_dir, ".compact.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            dead = _dead_snapshots(metrics_dir)
+            if not dead:
+                return
+            names = [AGGREGATE_FILE] + dead
+            path = os.path.join(metrics_dir, AGGREGATE_FILE)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_to_snapshot(_merge(_read_snapshots(metrics_dir, names))), f)
+            # A crash before the removals below counts those processes twice until they are retried
+            os.replace(tmp, path)
+            for name in dead:
+                os.remove(os.path.join(metrics_dir, name))
+            log.debug(f"Merged {len(dead)} exited processes' metrics into {AGGREGATE_FILE}")
+    except OSError as e:
+        log.warning(f"Could not compact metrics snapshots in {metrics_dir}: {e}")
+
+
+def _to_snapshot(merged: Dict[str, dict]) -> Dict[str, dict]:
+    """_merge output back in the per-process snapshot format."""
+    out = {}
+    for name, metric in merged.items():
+        out[name] = {"kind": metric["kind"], "help": metric["help"], "series": [[list(map(list, k)), v] for k, v in metric["series"].items()]}
+        if metric["bounds"] is not None:
+            out[name]["bounds"] = metric["bounds"]
+    return out
+
+
+def _merge(snapshots: Iterable[Dict[str, dict]]) -> Dict[str, dict]:
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {"kind": metric["kind"], "help": metric["help"], "bounds": metric.get("bounds"), "series": {}})
+            for labels, value in metric["series"]:
+                key = tuple(tuple(pair) for pair in labels)
+                if metric["kind"] == "counter":
+                    target["series"][key] = target["series"].get(key, 0) + value
+                    continue
+                current = target["series"].setdefault(key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0})
+                current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                current["sum"] += value["sum"]
+                current["count"] += value["count"]
+    return merged
+
+
+def load_snapshots(metrics_dir: str = DEFAULT_METRICS_DIR) -> List[Dict[str, dict]]:
+    if not os.path.isdir(metrics_dir):
+        return []
+    return _read_snapshots(metrics_dir, sorted(n for n in os.listdir(metrics_dir) if n.endswith(".json")))
+
+
+def _read_snapshots(metrics_dir: str, names: Iterable[str]) -> List[Dict[str, dict]]:
+    snapshots = []
+    for name in names:
+        if not os.path.exists(os.path.join(metrics_dir, name)):
+            continue
+        try:
+            with open(os.path.join(metrics_dir, name), encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            log.warning(f"Skipping unreadable metrics snapshot {name}: {e}")
+    return snapshots
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]], extra: Tuple[str, str] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus(snapshots: Iterable[Dict[str, dict]]) -> str:
+    """Prometheus text exposition (v0.0.4) of the summed snapshots."""
+    lines = []
+    for name, metric in sorted(_merge(snapshots).items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labels, value in sorted(metric["series"].items()):
+            if metric["kind"] == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["bounds"], value["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int = 9464, metrics_dir: str = DEFAULT_METRICS_DIR):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(load_snapshots(metrics_dir)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            log.debug(fmt % args)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    log.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metrics-dir", default=DEFAULT_METRICS_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_cmd = sub.add_parser("serve", help="Expose /metrics over HTTP")
+    serve_cmd.add_argument("--port", type=int, default=9464)
+    write_cmd = sub.add_parser("write", help="Write a .prom text file")
+    write_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "serve":
+        serve(args.port, args.metrics_dir)
+    else:
+        text = render_prometheus(load_snapshots(args.metrics_dir))
+        tmp = f"{args.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, args.path)
+        log.info(f"Wrote {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# pipeline.py
+import os
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from configg import get_secret
+from clients import azure_settings
+from artifacts import DEFAULT_ARTIFACT_DIR, ArtifactStore, artifact_key
+from checkpoints import CheckpointStore
+from incremental import IncrementalStore
+from prefetch import load_prefetched
+from clickup_extractor import ClickUpTaskExtractor
+from figma_extractor import FigmaPrototypeAnalyzer, parse_node_ids
+from data_preprocessor import Preprocessor
+from summarizer.run_summarizer import run_summarizer
+from story_generator.run_story_generator import publish_story, render_story
+import metrics
+from tracing import discard, export_otlp_json, span, trace
+
+log = logging.getLogger(__name__)
+
+STAGES = ["fetching", "preprocessing", "summarizing", "generating"]
+
+# Where the story goes: a DOCX in the artifact store, or a Confluence page (see confluence_storage.py)
+OUTPUT_BACKENDS = ("docx", "confluence")
+
+# Part of every artifact key; bump when the document layout changes so old documents aren't reused
+DOCUMENT_VERSION = 1
+
+
+def output_backend(value: Optional[str] = None) -> str:
+    """`value`, or the OUTPUT_BACKEND setting (default "docx"), checked against OUTPUT_BACKENDS."""
+    backend = (value or str(get_secret("OUTPUT_BACKEND", "docx"))).strip().lower()
+    if backend not in OUTPUT_BACKENDS:
+        raise ValueError(f"Unknown output backend {backend!r}; expected one of {', '.join(OUTPUT_BACKENDS)}")
+    return backend
+
+
+def _artifact_store(base_path: str = None) -> ArtifactStore:
+    return ArtifactStore(
+        os.path.join(base_path, "data", "artifacts") if base_path else DEFAULT_ARTIFACT_DIR,
+        max_bytes=int(get_secret("ARTIFACT_MAX_MB", 500)) * 2**20,
+        max_age=float(get_secret("ARTIFACT_MAX_AGE_DAYS", 30)) * 24 * 3600,
+    )
+
+
+def run_pipeline(
+    clickup_task_id: str,
+    figma_file_key: str,
+    figma_node_id: str,
+    progress: Optional[Callable[[str], None]] = None,
+    base_path: str = None,
+    trace_path: str = None,
+    on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    prefetched: Optional[Dict[str, str]] = None,
+    backend: Optional[str] = None,
+) -> str:
+    """
+    Run the full ClickUp + Figma -> DOCX story pipeline and return the path of
+    the document in the artifact store (under `base_path` if given). With
+    `backend` (or the OUTPUT_BACKEND setting) "confluence", the story is
+    published as a Confluence page instead and its URL is returned.
+
+    `progress` is called with each stage name from STAGES as it starts, and
+    `on_event(kind, payload)` with partial results as soon as they are ready:
+    "frames" (the frame list), "screen" (one summarized screen) and "row"
+    (one screen's heading and business rules), the last two with done/total
+    counts. An exception from `progress` or from a "screen" or "row" event
+    aborts the run, which is how a worker cancels a job. Every
+    stage's output is checkpointed, so rerunning the same inputs after a
+    failure resumes from the last completed stage. Checkpoints are cleared
+    once the document has been saved. A second run with the same inputs waits
+    for the first to finish instead of sharing its checkpoints.
+
+    Frames unchanged since the last successful run for the same Figma node
+    (same content hash and interactions) reuse their previous summaries and
+    generated rows instead of being re-summarized and regenerated.
+
+    Documents are stored by a hash of everything that goes into them; when
+    the processed ClickUp task and summarized screens match a stored document,
+    it is returned without generating again (disable with ARTIFACT_REUSE=false).
+
+    `prefetched` maps "clickup" and/or "figma" to files the app fetched in the
+    background while the form was being filled in (see prefetch.py); fresh
+    ones are used instead of fetching again.
+
+    The run is traced (see tracing.py); with `trace_path` set, the spans are
+    written there as OTLP/JSON, even when the run fails.
+    """
+    # One canonical form ("a,b") for checkpoint, incremental and trace keys, however the ids were typed
+    figma_node_id = ",".join(parse_node_ids(figma_node_id))
+    backend = output_backend(backend)
+    root = None
+    try:
+        with trace(
+            "story_pipeline",
+            **{"clickup.task_id": clickup_task_id, "figma.file_key": figma_file_key, "figma.node_id": figma_node_id},
+        ) as root:
+            with CheckpointStore(clickup_task_id, figma_file_key, figma_node_id) as checkpoints:
+                return _run_stages(
+                    clickup_task_id, figma_file_key, figma_node_id, checkpoints,
+                    progress, base_path, on_event, prefetched or {}, backend,
+                )
+    finally:
+        if root is not None:
+            if trace_path:
+                export_otlp_json(root.trace_id, trace_path)
+            else:
+                discard(root.trace_id)
+        metrics.flush()
+
+
+def _frames_listed(frames, emit):
+    log.info(f"Figma lists {len(frames)} frames")
+    emit("frames", {"frames": [{"node_id": f.get("node_id"), "screen_name": f.get("screen_name")} for f in frames]})
+
+
+def _screen_event(screen, done, total):
+    return {
+        "frame_id": screen.get("frame_id"),
+        "frame_url": screen.get("frame_url"),
+        "frame_summary": screen.get("frame_summary", ""),
+        "done": done,
+        "total": total,
+    }
+
+
+def _screen_fingerprint(screen):
+    """A screen's content for the artifact key, without the signed render URLs, which change on every fetch."""
+    return {
+        "frame_id": screen.get("frame_id"),
+        "signature": screen.get("signature"),
+        "frame_summary": screen.get("frame_summary", ""),
+        "interactions": [
+            {k: v for k, v in inter.items() if k not in ("to_url", "from_url")}
+            for inter in screen.get("interactions", [])
+        ],
+    }
+
+
+def _run_stages(clickup_task_id, figma_file_key, figma_node_id, checkpoints, progress, base_path, on_event, prefetched, backend) -> str:
+    report = progress or (lambda stage: None)
+    emit = on_event or (lambda kind, payload: None)
+    incremental = IncrementalStore(figma_file_key, figma_node_id)
+
+    report("fetching")
+    with span("stage.clickup_fetch") as s:
+        clickup_data = checkpoints.load("clickup")
+        s.set("cache_hit", clickup_data is not None)
+        if clickup_data is None:
+            clickup_data = load_prefetched(prefetched.get("clickup"))
+            s.set("prefetched", clickup_data is not None)
+            if clickup_data is not None:
+                checkpoints.save("clickup", clickup_data)
+        if clickup_data is None:
+            clickup_extractor = ClickUpTaskExtractor(get_secret("CLICKUP_API_TOKEN"))
+            clickup_data = clickup_extractor.fetch_task_enhanced(clickup_task_id)
+            if clickup_data:
+                checkpoints.save("clickup", clickup_data)
+
+    with span("stage.figma_extract") as s:
+        figma_data = checkpoints.load("figma")
+        s.set("cache_hit", figma_data is not None)
+        if figma_data is None:
+            figma_data = load_prefetched(prefetched.get("figma"))
+            s.set("prefetched", figma_data is not None)
+            if figma_data is not None:
+                checkpoints.save("figma", figma_data)
+        if figma_data is None:
+            figma_extractor = FigmaPrototypeAnalyzer(
+                get_secret("FIGMA_TOKEN"),
+                figma_file_key,
+                figma_node_id,
+                two_phase=str(get_secret("FIGMA_TWO_PHASE", "false")).lower() in ("1", "true", "yes"),
+                on_frames=lambda frames: _frames_listed(frames, emit),
+            )
+            figma_data = figma_extractor.run_extraction()
+            checkpoints.save("figma", figma_data)
+        else:
+            _frames_listed(figma_data.get("frames", []), emit)
+        s.set("figma.frames", figma_data.get("total_frames"))
+        s.set("figma.interactions", figma_data.get("total_interactions"))
+
+    report("preprocessing")
+    with span("stage.preprocess") as s:
+        processed_data = checkpoints.load("preprocessed")
+        s.set("cache_hit", processed_data is not None)
+        if processed_data is None:
+            preprocessor = Preprocessor(clickup_data, figma_data, save_clickup=False)
+            processed_data = preprocessor.run_all()
+            checkpoints.save("preprocessed", processed_data)
+
+    report("summarizing")
+    with span("stage.summarize") as s:
+        summarized_figma_data = checkpoints.load("summarized")
+        s.set("cache_hit", summarized_figma_data is not None)
+        if summarized_figma_data is None:
+            summarized_figma_data = run_summarizer(
+                processed_data["figma_processed"],
+                summary_cache=checkpoints.journal("summaries"),
+                previous_screens=incremental.previous_screens(),
+                on_screen=lambda screen, done, total: emit("screen", _screen_event(screen, done, total)),
+            )
+            checkpoints.save("summarized", summarized_figma_data)
+        else:
+            screens = summarized_figma_data.get("screens", [])
+            for done, screen in enumerate(screens, 1):
+                emit("screen", _screen_event(screen, done, len(screens)))
+        metadata = summarized_figma_data["metadata"]
+        s.set("screens", metadata.get("total_screens", 0))
+        s.set("reused_frames", metadata.get("reused_frames", 0))
+    log.info(
+        f"Reused {metadata.get('reused_frames', 0)}/{metadata.get('total_screens', 0)} frames from the previous run"
+    )
+
+    report("generating")
+
+    def on_row(index, total, row):
+        emit("row", dict(row, index=index, done=index + 1, total=total))
+
+    if backend == "confluence":
+        with span("stage.publish_confluence") as s:
+            rows = incremental.row_cache(journal=checkpoints.journal("business_rules"))
+            page_url = publish_story(
+                processed_data["clickup_processed"],
+                summarized_figma_data,
+                rules_cache=rows,
+                on_row=on_row,
+            )
+            s.set("row_cache_hits", rows.hits)
+        incremental.save(summarized_figma_data, rows)
+        checkpoints.clear()
+        log.info(f"Pipeline finished for task {clickup_task_id}: {page_url}")
+        return page_url
+
+    with span("stage.generate_document") as s:
+        artifacts = _artifact_store(base_path)
+        key = artifact_key(
+            DOCUMENT_VERSION,
+            azure_settings().story_model,
+            processed_data["clickup_processed"],
+            [_screen_fingerprint(screen) for screen in summarized_figma_data.get("screens", [])],
+        )
+        reuse = str(get_secret("ARTIFACT_REUSE", "true")).lower() in ("1", "true", "yes")
+        output_file = artifacts.get(key) if reuse else None
+        s.set("cache_hit", output_file is not None)
+        rows = None
+        if output_file:
+            log.info(f"Identical inputs already generated {output_file}; reusing it")
+        else:
+            rows = incremental.row_cache(journal=checkpoints.journal("business_rules"))
+            document = render_story(
+                processed_data["clickup_processed"],
+                summarized_figma_data,
+                rules_cache=rows,
+                on_row=on_row,
+            )
+            output_file = artifacts.put(key, document)
+            s.set("row_cache_hits", rows.hits)
+            s.set("docx.bytes", len(document))
+
+    incremental.save(summarized_figma_data, rows)
+    checkpoints.clear()
+    log.info(f"Pipeline finished for task {clickup_task_id}: {output_file}")
+    return output_file
@@ -0,0 +1,193 @@
+# prefetch.py
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from artifacts import artifact_key
+from configg import get_secret
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_DIR = os.path.join("data", "prefetch")
+# Older prefetches are refetched by the pipeline, so edits made meanwhile aren't missed
+PREFETCH_MAX_AGE = 600.0
+
+CLICKUP_TASK_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{2,63}$")
+FIGMA_FILE_KEY = re.compile(r"^[A-Za-z0-9]{10,128}$")
+FIGMA_NODE_ID = re.compile(r"^\d+[:-]\d+$")
+
+
+def valid_clickup_task_id(task_id: str) -> bool:
+    return bool(task_id and CLICKUP_TASK_ID.match(task_id.strip()))
+
+
+def valid_figma_target(file_key: str, node_id: str) -> bool:
+    if not (file_key and node_id and FIGMA_FILE_KEY.match(file_key.strip())):
+        return False
+    node_ids = [n.strip() for n in node_id.split(",") if n.strip()]
+    return bool(node_ids) and all(FIGMA_NODE_ID.match(n) for n in node_ids)
+
+
+def load_prefetched(path: Optional[str], max_age: float = PREFETCH_MAX_AGE) -> Optional[Any]:
+    """Data prefetched to `path`, or None if there is none or it is older than `max_age` seconds."""
+    if not path:
+        return None
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _succeeded(future: Future) -> bool:
+    return not future.cancelled() and future.exception() is None and future.result() is not None
+
+
+class _Fetch:
+    def __init__(self, key: str, future: Future, cancelled: threading.Event):
+        self.key = key
+        self.future = future
+        self.cancelled = cancelled
+
+
+class Prefetcher:
+    """
+    Background fetches for one app session, started while the user is still
+    filling in the form: the ClickUp task with its comments, and the Figma
+    extraction (node documents and frame render URLs).
+
+    Each kind has at most one fetch; asking for other inputs cancels the
+    previous one. A fetch that hasn't started is dropped; one already in
+    flight stops at its next stage boundary (the Figma fetch checks before
+    collecting interactions and before rendering images), and whatever it
+    returns is discarded. Results are written as JSON under `base_dir`, and
+    take() hands their paths to the job so the worker's pipeline can skip
+    those fetches (see load_prefetched).
+    """
+
+    def __init__(self, clickup_token: str, figma_token: str, base_dir: str = DEFAULT_PREFETCH_DIR, max_age: float = PREFETCH_MAX_AGE):
+        self.clickup_token = clickup_token
+        self.figma_token = figma_token
+        self.base_dir = base_dir
+        self.max_age = max_age
+        self._fetches: Dict[str, _Fetch] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+        os.makedirs(base_dir, exist_ok=True)
+        self._expire_stale()
+
+    def update(self, clickup_task_id: str, figma_file_key: str, figma_node_id: str):
+        """Start, keep or cancel each prefetch to match the current form inputs."""
+        if valid_clickup_task_id(clickup_task_id):
+            task_id = clickup_task_id.strip()
+            self._start("clickup", task_id, lambda cancelled: self._fetch_clickup(task_id))
+        else:
+            self.cancel("clickup")
+
+        if valid_figma_target(figma_file_key, figma_node_id):
+            file_key, node_id = figma_file_key.strip(), figma_node_id.strip()
+            self._start("figma", f"{file_key}/{node_id}", lambda cancelled: self._fetch_figma(file_key, node_id, cancelled))
+        else:
+            self.cancel("figma")
+
+    def status(self, kind: str) -> Optional[str]:
+        """Whether the current fetch of `kind` is "running", "ready" or "failed"; None if there is none."""
+        fetch = self._fetches.get(kind)
+        if fetch is None:
+            return None
+        if not fetch.future.done():
+            return "running"
+        return "ready" if _succeeded(fetch.future) else "failed"
+
+    def take(self) -> Dict[str, str]:
+        """
+        Paths of the finished prefetches, for the job's params. Fetches still
+        in flight are cancelled (the job fetches for itself), and everything
+        is forgotten so the next update() fetches fresh data for the next run.
+        """
+        ready = {}
+        with self._lock:
+            fetches, self._fetches = self._fetches, {}
+        for kind, fetch in fetches.items():
+            if fetch.future.done() and _succeeded(fetch.future):
+                ready[kind] = fetch.future.result()
+            else:
+                self._cancel(fetch)
+        return ready
+
+    def cancel(self, kind: str = None):
+        with self._lock:
+            kinds = [kind] if kind else list(self._fetches)
+            fetches = [self._fetches.pop(k) for k in kinds if k in self._fetches]
+        for fetch in fetches:
+            self._cancel(fetch)
+
+    def _cancel(self, fetch: _Fetch):
+        fetch.cancelled.set()
+        if fetch.future.cancel():
+            log.info(f"Cancelled prefetch {fetch.key}")
+
+    def _start(self, kind: str, key: str, fn: Callable[[threading.Event], Any]):
+        with self._lock:
+            current = self._fetches.get(kind)
+            if current is not None and current.key == key:
+                return
+            cancelled = threading.Event()
+            future = self._executor.submit(self._run, kind, key, fn, cancelled)
+            self._fetches[kind] = _Fetch(key, future, cancelled)
+        if current is not None:
+            self._cancel(current)
+        log.info(f"Prefetching {kind} {key}")
+
+    def _run(self, kind: str, key: str, fn: Callable[[threading.Event], Any], cancelled: threading.Event) -> Optional[str]:
+        if cancelled.is_set():
+            return None
+        data = fn(cancelled)
+        if cancelled.is_set():
+            log.info(f"Discarding cancelled prefetch {kind} {key}")
+            return None
+        if data is None:
+            raise RuntimeError(f"Prefetch of {kind} {key} returned no data")
+        self._expire_stale()
+        path = os.path.join(self.base_dir, f"{kind}_{artifact_key(kind, key)[:24]}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return path
+
+    def _fetch_clickup(self, task_id: str) -> Optional[dict]:
+        # Imported here so the app's first paint doesn't wait on the extractors
+        from clickup_extractor import ClickUpTaskExtractor
+
+        return ClickUpTaskExtractor(self.clickup_token).fetch_task_enhanced(task_id)
+
+    def _fetch_figma(self, file_key: str, node_id: str, cancelled: threading.Event) -> Optional[dict]:
+        from figma_extractor import ExtractionCancelled, FigmaPrototypeAnalyzer
+
+        analyzer = FigmaPrototypeAnalyzer(
+            self.figma_token,
+            file_key,
+            node_id,
+            two_phase=str(get_secret("FIGMA_TWO_PHASE", "false")).lower() in ("1", "true", "yes"),
+        )
+        try:
+            return analyzer.run_extraction(cancelled)
+        except ExtractionCancelled:
+            return None
+
+    def _expire_stale(self):
+        for name in os.listdir(self.base_dir):
+            path = os.path.join(self.base_dir, name)
+            try:
+                if time.time() - os.path.getmtime(path) > self.max_age:
+                    os.remove(path)
+            except OSError:
+                continue
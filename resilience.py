@@ -0,0 +1,208 @@
+# resilience.py
+import time
+import random
+import logging
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+log = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying; every other 4xx is treated as a caller error.
+TRANSIENT_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Exception class names (requests, urllib3, httpx, openai) that signal a network-level hiccup.
+TRANSIENT_ERROR_NAMES = (
+    "Timeout",
+    "ConnectionError",
+    "ChunkedEncodingError",
+    "ProtocolError",
+    "RemoteDisconnected",
+    "APIConnectionError",
+    "APITimeoutError",
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(exc: BaseException) -> str:
+    """Return "transient" for errors worth retrying, "permanent" otherwise."""
+    if isinstance(exc, CircuitOpenError):
+        return "permanent"
+
+    status = _status_code(exc)
+    if status is not None:
+        return "transient" if status in TRANSIENT_STATUS or status >= 500 else "permanent"
+
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return "transient"
+    names = [cls.__name__ for cls in type(exc).__mro__]
+    if any(marker in name for name in names for marker in TRANSIENT_ERROR_NAMES):
+        return "transient"
+    return "permanent"
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-provided backoff hint (Retry-After / retry-after-ms), if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def endpoint_key(url: str) -> str:
+    """Circuit breakers are kept per host."""
+    return urlparse(url).netloc or url
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Rolling-window breaker: opens once at least `min_calls` of the last
+    `window` calls were made and the failure ratio reaches `failure_ratio`.
+    After `cooldown` seconds a single trial call is let through (half-open).
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 5, failure_ratio: float = 0.5, cooldown: float = 30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._outcomes.append(True)
+            if self.state == "half_open":
+                self.state = "closed"
+                self._outcomes.clear()
+
+    def record_failure(self):
+        with self._lock:
+            self._outcomes.append(False)
+            if self.state == "half_open":
+                self._open()
+                return
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_ratio:
+                self._open()
+
+    def _open(self):
+        if self.state != "open":
+            log.warning(f"Circuit opened after {self._outcomes.count(False)}/{len(self._outcomes)} failures")
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    with _lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker()
+        return _breakers[endpoint]
+
+
+def _count(endpoint: str, decision: str):
+    with _lock:
+        _counters[(endpoint, decision)] += 1
+
+
+def retry_stats() -> Dict[Tuple[str, str], int]:
+    """Counts of every retry decision, keyed by (endpoint, decision)."""
+    with _lock:
+        return dict(_counters)
+
+
+def call_with_retry(
+    fn: Callable[[], Any],
+    endpoint: str,
+    policy: RetryPolicy = None,
+    description: str = "request",
+) -> Any:
+    """
+    Call `fn`, retrying transient failures with jittered exponential backoff.
+
+    Permanent errors are raised immediately. While the endpoint's circuit is
+    open, CircuitOpenError is raised without calling `fn`. Decisions counted:
+    success, retry, give_up_permanent, give_up_exhausted, circuit_open.
+    """
+    policy = policy or RetryPolicy()
+    breaker = get_breaker(endpoint)
+
+    for attempt in range(1, policy.max_attempts + 1):
+        if not breaker.allow():
+            _count(endpoint, "circuit_open")
+            raise CircuitOpenError(f"Circuit open for {endpoint}, skipping {description}")
+
+        try:
+            result = fn()
+        except Exception as exc:
+            kind = classify_error(exc)
+            if kind == "permanent":
+                # The endpoint answered, so it counts as healthy for the breaker
+                breaker.record_success()
+                _count(endpoint, "give_up_permanent")
+                log.error(f"{description} failed with non-retryable error: {exc}")
+                raise
+
+            breaker.record_failure()
+            if attempt >= policy.max_attempts:
+                _count(endpoint, "give_up_exhausted")
+                log.error(f"{description} failed after {attempt} attempts: {exc}")
+                raise
+
+            delay = min(policy.max_delay, retry_after_seconds(exc) or policy.backoff(attempt))
+            _count(endpoint, "retry")
+            log.warning(f"{description} attempt {attempt}/{policy.max_attempts} failed: {exc}. Retrying in {delay:.1f}s")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            _count(endpoint, "success")
+            return result
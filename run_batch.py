@@ -0,0 +1,192 @@
+# run_batch.py
+"""
+Headless batch runner: generate stories for every (ClickUp task, Figma file,
+node) triple in a CSV or JSONL manifest across a pool of worker processes.
+
+    python run_batch.py manifest.csv --workers 4 --timeout 1800 --output-dir release_42
+
+Manifest columns / keys: clickup_task_id, figma_file_key, figma_node_id
+(task_id, file_key and node_id are accepted as aliases).
+"""
+import os
+import re
+import csv
+import json
+import time
+import shutil
+import logging
+import argparse
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+from datetime import datetime, timezone
+from typing import Dict, List
+
+log = logging.getLogger(__name__)
+
+FIELD_ALIASES = {
+    "clickup_task_id": ("clickup_task_id", "task_id"),
+    "figma_file_key": ("figma_file_key", "file_key"),
+    "figma_node_id": ("figma_node_id", "node_id"),
+}
+
+
+def load_manifest(path: str) -> List[Dict[str, str]]:
+    """Read manifest rows from a .csv or .jsonl file."""
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for line_no, row in enumerate(rows, start=1):
+        job = {}
+        for field, aliases in FIELD_ALIASES.items():
+            value = next((str(row[a]).strip() for a in aliases if row.get(a)), "")
+            if not value:
+                raise ValueError(f"Manifest entry {line_no} is missing {field}")
+            job[field] = value
+        jobs.append(job)
+    return jobs
+
+
+def _output_name(index: int, job: Dict[str, str]) -> str:
+    # The row index keeps names unique: rows can repeat, and sanitising maps e.g. 1:2 and 1-2 alike
+    raw = f"story_{index:03d}_{job['clickup_task_id']}_{job['figma_file_key']}_{job['figma_node_id']}.docx"
+    return re.sub(r"[^\w.\-]", "-", raw)
+
+
+def _run_job(index: int, job: Dict[str, str], output_dir: str, conn, backend: str = None):
+    """Child process: run one pipeline and report stage starts and the outcome on its own pipe `conn`."""
+    logging.basicConfig(level=logging.INFO, format=f"[job {index}] %(message)s")
+    try:
+        from pipeline import output_backend, run_pipeline
+
+        output_file = run_pipeline(
+            job["clickup_task_id"],
+            job["figma_file_key"],
+            job["figma_node_id"],
+            progress=lambda stage: conn.send(("stage", stage, time.time())),
+            backend=backend,
+        )
+        if output_backend(backend) == "confluence":
+            conn.send(("done", {"status": "ok", "page_url": output_file}, time.time()))
+            return
+        # Copied, not moved: the artifact store keeps its copy for identical reruns
+        final_path = os.path.join(output_dir, _output_name(index, job))
+        shutil.copyfile(output_file, final_path)
+        conn.send(("done", {"status": "ok", "output_file": final_path}, time.time()))
+    except Exception as e:
+        conn.send(("done", {"status": "failed", "error": f"{e}", "traceback": traceback.format_exc()}, time.time()))
+
+
+def _stage_timings(stages: List[tuple], end: float) -> Dict[str, float]:
+    timings = {}
+    for (name, started), nxt in zip(stages, stages[1:] + [(None, end)]):
+        timings[name] = round(nxt[1] - started, 3)
+    return timings
+
+
+def run_batch(jobs: List[Dict[str, str]], workers: int = 2, timeout: float = 1800, output_dir: str = "batch_output", backend: str = None) -> dict:
+    """
+    Run all jobs with at most `workers` processes, killing any job that exceeds
+    `timeout` seconds. `backend` overrides the OUTPUT_BACKEND setting.
+
+    Each job reports over its own pipe, so killing a job mid-write can only
+    garble that job's messages, never another job's.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ctx = multiprocessing.get_context("spawn")
+
+    pending = list(enumerate(jobs))
+    running: Dict[int, tuple] = {}  # index -> (process, pipe, start time)
+    stages: Dict[int, List[tuple]] = {i: [] for i in range(len(jobs))}
+    results: Dict[int, dict] = {}
+    batch_started = datetime.now(timezone.utc)
+
+    def finish(index: int, outcome: dict, end: float):
+        proc, conn, started = running.pop(index)
+        proc.join(timeout=5)
+        conn.close()
+        results[index] = {
+            "index": index,
+            **jobs[index],
+            **outcome,
+            "total_seconds": round(end - started, 3),
+            "stage_timings": _stage_timings(stages[index], end),
+        }
+        log.info(f"Job {index} ({jobs[index]['clickup_task_id']}): {outcome['status']}")
+
+    while pending or running:
+        while pending and len(running) < workers:
+            index, job = pending.pop(0)
+            recv_end, send_end = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_run_job, args=(index, job, output_dir, send_end, backend), daemon=True)
+            proc.start()
+            # Only the child holds the write end now, so the pipe hits EOF when it exits
+            send_end.close()
+            running[index] = (proc, recv_end, time.time())
+
+        by_conn = {conn: index for index, (_, conn, _) in running.items()}
+        for conn in wait(list(by_conn), timeout=1.0):
+            index = by_conn[conn]
+            if index not in running:
+                continue
+            try:
+                kind, payload, at = conn.recv()
+            except EOFError:
+                proc = running[index][0]
+                proc.join(timeout=5)
+                finish(index, {"status": "failed", "error": f"Worker exited with code {proc.exitcode}"}, time.time())
+                continue
+            if kind == "stage":
+                stages[index].append((payload, at))
+            else:
+                finish(index, payload, at)
+
+        now = time.time()
+        for index, (proc, _, started) in list(running.items()):
+            if now - started > timeout:
+                proc.terminate()
+                finish(index, {"status": "timeout", "error": f"Exceeded {timeout}s"}, now)
+
+    ordered = [results[i] for i in sorted(results)]
+    return {
+        "started_at": batch_started.isoformat(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "workers": workers,
+        "timeout_seconds": timeout,
+        "summary": {
+            status: sum(1 for r in ordered if r["status"] == status)
+            for status in ("ok", "failed", "timeout")
+        },
+        "jobs": ordered,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="CSV or JSONL manifest of jobs")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--timeout", type=float, default=1800, help="Per-job timeout in seconds")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--report", default=None, help="Run report path (default: <output-dir>/run_report.json)")
+    parser.add_argument("--backend", choices=["docx", "confluence"], default=None, help="Output backend (default: OUTPUT_BACKEND setting, else docx)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    jobs = load_manifest(args.manifest)
+    log.info(f"Running {len(jobs)} jobs with {args.workers} workers")
+
+    report = run_batch(jobs, workers=args.workers, timeout=args.timeout, output_dir=args.output_dir, backend=args.backend)
+    report_path = args.report or os.path.join(args.output_dir, "run_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    log.info(f"Done: {report['summary']}. Report written to {report_path}")
+    raise SystemExit(0 if report["summary"]["ok"] == len(jobs) else 1)
+
+
+if __name__ == "__main__":
+    main()
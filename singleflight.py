@@ -0,0 +1,181 @@
+# singleflight.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coalescing only
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LOCK_DIR = os.path.join("data", "singleflight")
+# How often a long-lived process sweeps the lock directory for leftovers
+PRUNE_INTERVAL = 600.0
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key so the work runs once.
+
+    Within a process, threads asking for a key that is already in flight wait
+    for the leader's result. Across processes, the leader holds an exclusive
+    lock file while it works and removes it when done. Processes that find
+    the lock taken leave a marker file while they wait, and only then does
+    the leader publish a JSON result, valid for `result_ttl` seconds, for
+    them to pick up instead of redoing the work. Only JSON-serialisable, non-None results are shared
+    across processes. Errors are never shared; the next caller retries.
+    """
+
+    def __init__(self, name: str, cross_process: bool = True, result_ttl: float = 15.0, lock_dir: str = DEFAULT_LOCK_DIR):
+        self.name = name
+        self.cross_process = cross_process and fcntl is not None
+        self.result_ttl = result_ttl
+        self.lock_dir = lock_dir
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self._pruned_at = float("-inf")
+        self.stats = {"leaders": 0, "coalesced": 0, "cross_process_hits": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_leader(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run_leader(self, key: str, fn: Callable[[], Any]) -> Any:
+        if not self.cross_process:
+            return fn()
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+            self._prune()
+        digest = hashlib.sha256(f"{self.name}:{key}".encode("utf-8")).hexdigest()[:32]
+        lock_path = os.path.join(self.lock_dir, f"{digest}.lock")
+        wait_path = os.path.join(self.lock_dir, f"{digest}.wait")
+        result_path = os.path.join(self.lock_dir, f"{digest}.json")
+
+        lock_file, waited = self._acquire(lock_path, wait_path)
+        try:
+            shared = self._read_fresh(result_path) if waited else None
+            if shared is not None:
+                with self._lock:
+                    self.stats["cross_process_hits"] += 1
+                log.info(f"Reused in-flight {self.name} result from another process")
+                return shared
+
+            result = fn()
+            if os.path.exists(wait_path):
+                self._publish(result_path, result)
+                _remove(wait_path)
+            return result
+        finally:
+            # Removed while still locked, so lock files only exist while a key is in flight;
+            # a process blocked on this one sees it is gone in _acquire and takes a fresh one
+            _remove(lock_path)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _acquire(self, lock_path: str, wait_path: str):
+        """Lock `lock_path`, returning the open file and whether another process held it first."""
+        waited = False
+        while True:
+            lock_file = open(lock_path, "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process has it in flight: tell it someone wants the result, then wait
+                open(wait_path, "a").close()
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                waited = True
+            try:
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    return lock_file, waited
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    def _prune(self):
+        """Drop expired results and markers, and lock files left by killed processes."""
+        self._pruned_at = time.monotonic()
+        cutoff = time.time() - max(self.result_ttl * 10, 3600)
+        for name in os.listdir(self.lock_dir):
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if name.endswith(".lock"):
+                    self._prune_lock(path)
+                elif os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _prune_lock(self, path: str):
+        with open(path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            if os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino:
+                os.remove(path)
+
+    def _read_fresh(self, path: str) -> Any:
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _publish(self, path: str, result: Any):
+        if result is None:
+            return
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp, path)
+        except (TypeError, ValueError, OSError) as e:
+            log.debug(f"Not sharing {self.name} result across processes: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
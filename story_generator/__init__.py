@@ -1,11 +1,32 @@
-from .config import StoryConfig
-from .generator_core import ConfluenceStoryGenerator
-from .confluence_agent import ConfluenceAgent
-from .run_story_generator import run_story_generation
+import importlib
 
 __all__ = [
     "StoryConfig",
     "ConfluenceStoryGenerator",
     "ConfluenceAgent",
     "run_story_generation",
+    "render_story",
+    "publish_story",
+    "ConfluenceStorageExporter",
+    "ConfluencePublisher",
 ]
+
+# Submodules (and openai / python-docx with them) load on first attribute access
+_EXPORTS = {
+    "StoryConfig": ".config",
+    "ConfluenceStoryGenerator": ".generator_core",
+    "ConfluenceAgent": ".confluence_agent",
+    "run_story_generation": ".run_story_generator",
+    "render_story": ".run_story_generator",
+    "publish_story": ".run_story_generator",
+    "ConfluenceStorageExporter": ".confluence_storage",
+    "ConfluencePublisher": ".confluence_storage",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -1,19 +1,42 @@
 # modules/story_generator/confluence_agent.py
+import io
 import os
+import uuid
+import logging
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Dict, List, Tuple
 from docx import Document
 
 from .docx_helper import _make_cell_bold
 from story_generator.docx_section import DocxSections
+from tracing import span
+
+log = logging.getLogger(__name__)
+
+
+# Page properties whose values are shown in bold
+BOLD_PROPERTIES = ("Responsible", "Requirement status")
+
+
+def page_properties(clickup_data: Dict[str, Any]) -> List[Tuple[str, str]]:
+    assignees = clickup_data.get("assignees", "")
+    responsible_text = f"{assignees}" if assignees else "@... MENTION RESPONSIBLE PERSON HERE"
+    return [
+        ("User Story", "ADD LINK TO STORY IN AZURE DEVOPS HERE"),
+        ("Epic/Feature", "ADD LINK TO RELATED EPIC IN AZURE DEVOPS HERE"),
+        ("Requirement status", ""),
+        ("Responsible", responsible_text),
+        ("Tracking", "Changes for the current version are marked in Green"),
+        ("Current Version", "Editable version TBD in expander"),
+    ]
 
 
 class ConfluenceAgent:
-    def __init__(self, story_generator, base_path: str = None):
+    def __init__(self, story_generator, base_path: str = None, rules_cache=None, on_row=None):
         self.story_generator = story_generator
         self.base_path = base_path or os.getcwd()
-        self.docx_sections = DocxSections(self.story_generator)
+        self.docx_sections = DocxSections(self.story_generator, rules_cache=rules_cache, on_row=on_row)
 
     def generate_complete_story(
         self,
@@ -27,7 +50,8 @@ class ConfluenceAgent:
             raise ValueError("Missing in-memory data for ClickUp or Figma summaries.")
 
         data = {"clickup": clickup_data, "figma": figma_data}
-        return self._generate_word_document(data)
+        with span("docx.render", screens=len(figma_data.get("screens", []))):
+            return self._generate_word_document(data)
 
     def _generate_word_document(self, data: Dict[str, Any]) -> Document:
         """Generate structured Word story document."""
@@ -66,22 +90,10 @@ class ConfluenceAgent:
         table = doc.add_table(rows=6, cols=2)
         table.style = "Table Grid"
 
-        assignees = clickup_data.get("assignees", "")
-        responsible_text = f"{assignees}" if assignees else "@... MENTION RESPONSIBLE PERSON HERE"
-
-        properties = [
-            ("User Story", "ADD LINK TO STORY IN AZURE DEVOPS HERE"),
-            ("Epic/Feature", "ADD LINK TO RELATED EPIC IN AZURE DEVOPS HERE"),
-            ("Requirement status", ""),
-            ("Responsible", responsible_text),
-            ("Tracking", "Changes for the current version are marked in Green"),
-            ("Current Version", "Editable version TBD in expander"),
-        ]
-
-        for i, (key, value) in enumerate(properties):
+        for i, (key, value) in enumerate(page_properties(clickup_data)):
             table.cell(i, 0).text = key
             table.cell(i, 1).text = value
-            if key in ["Responsible", "Requirement status"]:
+            if key in BOLD_PROPERTIES:
                 _make_cell_bold(table.cell(i, 1))
 
     def _add_table_of_contents(self, doc: Document):
@@ -102,6 +114,13 @@ class ConfluenceAgent:
     # ------------------------------------------------------------------
     # Saving (Word only)
     # ------------------------------------------------------------------
+    def render_to_bytes(self, story_content: Document) -> bytes:
+        """Serialize the document in memory, for direct download or an ArtifactStore."""
+        buffer = io.BytesIO()
+        with span("docx.save"):
+            story_content.save(buffer)
+        return buffer.getvalue()
+
     def save_story_to_file(self, story_content: Document) -> str:
         """Save the generated Word document only."""
         output_dir = Path(self.base_path) / "data" / "outputs" / "stories"
@@ -109,11 +128,13 @@ class ConfluenceAgent:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
         try:
-            filename = f"confluence_story_{timestamp}.docx"
+            # The random suffix keeps documents saved in the same second apart
+            filename = f"confluence_story_{timestamp}_{uuid.uuid4().hex[:8]}.docx"
             path = output_dir / filename
-            story_content.save(path)
-            print(f" Saved Word document: {path}")
+            with span("docx.save"):
+                story_content.save(path)
+            log.info(f" Saved Word document: {path}")
             return str(path)
         except Exception as e:
-            print(f"Error saving file: {e}")
+            log.error(f"Error saving file: {e}")
             return ""
@@ -0,0 +1,319 @@
+# modules/story_generator/confluence_storage.py
+"""
+Confluence storage-format backend: renders the same sections as
+ConfluenceAgent's Word document as XHTML and publishes it through the
+Confluence REST API, so stories don't go through Confluence's DOCX import.
+
+Screenshots become page attachments referenced by filename. The page body is
+generated in full first (the GPT calls can take minutes), then saved in one
+retryable create-or-update keyed on the page title; the attachments are then
+downloaded and uploaded in parallel over one pooled session.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from http_client import get_session
+from resilience import RetryPolicy, call_with_retry, endpoint_key
+from tracing import KIND_CLIENT, bind, record_response, span
+from .confluence_agent import BOLD_PROPERTIES, page_properties
+from .docx_section import (
+    ACCEPTANCE_FOOTER_ROWS,
+    ACCEPTANCE_HEADER_ROWS,
+    BA_CROSS_CHECK_CONDITIONS,
+    BA_CROSS_CHECK_HEADERS,
+    PO_ACCEPTANCE_CONDITIONS,
+    PO_ACCEPTANCE_HEADERS,
+    DocxSections,
+    precondition_rows,
+    reference_requirement_lines,
+)
+
+log = logging.getLogger(__name__)
+
+ATTACHMENT_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=15.0)
+PAGE_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0)
+IMAGE_WIDTH = 200
+
+
+def _text(value: Any) -> str:
+    return escape(str(value or ""))
+
+
+def _cell(content: str = "", tag: str = "td", colspan: int = 1) -> str:
+    span_attr = f' colspan="{colspan}"' if colspan > 1 else ""
+    return f"<{tag}{span_attr}>{content}</{tag}>"
+
+
+def _row(cells: Iterable[str]) -> str:
+    return "<tr>" + "".join(cells) + "</tr>"
+
+
+def _table(rows: Iterable[str]) -> str:
+    return "<table><tbody>" + "".join(rows) + "</tbody></table>"
+
+
+def _image(filename: str) -> str:
+    return f'<ac:image ac:width="{IMAGE_WIDTH}"><ri:attachment ri:filename="{escape(filename)}" /></ac:image>'
+
+
+class ConfluenceStorageExporter:
+    """
+    Renders a story as Confluence storage-format XHTML. GPT-written content
+    (user story, step headings, business rules) comes from DocxSections, so
+    both backends produce the same text and share `rules_cache`.
+    """
+
+    def __init__(self, story_generator, rules_cache=None, on_row=None):
+        self.sections = DocxSections(story_generator, rules_cache=rules_cache, on_row=on_row)
+        # filename -> source image URL, filled in while the body is rendered
+        self.attachments: Dict[str, str] = {}
+        self._filenames: Dict[str, str] = {}
+
+    def _attach(self, url: str, name: str) -> str:
+        """Filename the page uses for the image at `url`; one attachment per distinct URL."""
+        if url not in self._filenames:
+            self._filenames[url] = name
+            self.attachments[name] = url
+        return self._filenames[url]
+
+    def iter_body(self, clickup_data: Dict[str, Any], figma_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield the page body section by section, generating content as it goes."""
+        if not clickup_data or not figma_data:
+            raise ValueError("Missing in-memory data for ClickUp or Figma summaries.")
+
+        yield self._page_properties(clickup_data)
+        yield '<h1>Table of Contents</h1><ac:structured-macro ac:name="toc" />'
+        yield self._user_story(clickup_data)
+        yield from self._acceptance_criteria(figma_data, clickup_data)
+        yield "<h1>Reference Requirements</h1>" + "".join(f"<p>{_text(line)}</p>" for line in reference_requirement_lines(clickup_data))
+        yield self._review_table("BA Cross-Check List", BA_CROSS_CHECK_HEADERS, BA_CROSS_CHECK_CONDITIONS, numbered=True)
+        yield self._review_table("Requirements Acceptance By Product Owner", PO_ACCEPTANCE_HEADERS, PO_ACCEPTANCE_CONDITIONS)
+
+    def render(self, clickup_data: Dict[str, Any], figma_data: Dict[str, Any]) -> str:
+        """The whole page body as one string."""
+        with span("confluence.render", screens=len(figma_data.get("screens", []))):
+            return "".join(self.iter_body(clickup_data, figma_data))
+
+    def _page_properties(self, clickup_data: Dict[str, Any]) -> str:
+        rows = []
+        for key, value in page_properties(clickup_data):
+            value_html = f"<strong>{_text(value)}</strong>" if key in BOLD_PROPERTIES and value else _text(value)
+            rows.append(_row([_cell(_text(key), "th"), _cell(value_html)]))
+        return "<h1>Page Properties</h1>" + _table(rows)
+
+    def _user_story(self, clickup_data: Dict[str, Any]) -> str:
+        user_story_text = self.sections._generate_concise_user_story(clickup_data)
+        parts = ["<h1>User Story</h1>"]
+        parts += [f"<p><strong>{_text(line.strip())}</strong></p>" for line in user_story_text.split("\n") if line.strip()]
+        parts.append("<hr />")
+
+        screen_name = clickup_data.get("title", "[SCREEN_NAME]")
+        parts.append("<h2>Preconditions</h2>")
+        parts.append(_table(_row([_cell(_text(num)), _cell(_text(text))]) for num, text in precondition_rows(screen_name)))
+
+        figma_link = clickup_data.get("figma_link", "ADD LINK TO ARTICLE DESCRIBING RELEVANT UI")
+        parts.append(f"<h2>Figma/Wireframe Link:</h2><p>{_text(figma_link)}</p>")
+        return "".join(parts)
+
+    def _acceptance_criteria(self, figma_data: Dict[str, Any], clickup_data: Dict[str, Any]) -> Iterator[str]:
+        yield "<h1>Acceptance Criteria</h1><table><tbody>"
+        for row_idx, headers in enumerate(ACCEPTANCE_HEADER_ROWS):
+            tag = "th" if row_idx == len(ACCEPTANCE_HEADER_ROWS) - 1 else "td"
+            yield _row(_cell(_text(h), tag) for h in headers)
+
+        screens = figma_data.get("screens", [])
+        for i, screen in enumerate(screens):
+            yield self._screen_row(i, len(screens), screen, clickup_data)
+
+        for label in ACCEPTANCE_FOOTER_ROWS:
+            yield _row([_cell(_text(label), colspan=len(ACCEPTANCE_HEADER_ROWS[-1]))])
+        yield "</tbody></table>"
+
+    def _screen_row(self, index: int, total: int, screen: Dict[str, Any], clickup_data: Dict[str, Any]) -> str:
+        step_heading = self.sections._step_heading(screen.get("frame_summary", ""))
+
+        frame_url = screen.get("frame_url", "")
+        screenshot = _image(self._attach(frame_url, f"screen_{index + 1}.png")) if frame_url else "(Image unavailable)"
+
+        business_rules = self.sections._generate_business_rules_from_screen(screen, clickup_data)
+        lines = [l.strip() for l in business_rules.split("\n") if l.strip()]
+        interactions = screen.get("interactions", [])
+        rules_html = []
+        for j, line in enumerate(lines):
+            rules_html.append(f"<p>{_text(line)}</p>")
+            # As in the Word document, each rule after the first shows its interaction's destination
+            if j > 0 and (j - 1) < len(interactions):
+                to_url = interactions[j - 1].get("to_url", "")
+                if to_url:
+                    rules_html.append(f"<p>{_image(self._attach(to_url, f'screen_{index + 1}_to_{j}.png'))}</p>")
+
+        self.sections._report_row(index, total, screen, step_heading, business_rules)
+        return _row([
+            _cell(_text(f"{index + 1} {step_heading}")),
+            _cell(),
+            _cell(f"<p>{screenshot}</p>"),
+            _cell("".join(rules_html)),
+            _cell(),
+        ])
+
+    def _review_table(self, title: str, headers: List[str], conditions: List[str], numbered: bool = False) -> str:
+        width = len(headers)
+        rows = [
+            _row([_cell("Reviewer")] + [_cell()] * (width - 1)),
+            _row([_cell("Review Date")] + [_cell()] * (width - 1)),
+            _row(_cell(_text(h), "th") for h in headers),
+        ]
+        for i, condition in enumerate(conditions):
+            lead = [_cell(str(i + 1))] if numbered else []
+            rows.append(_row(lead + [_cell(_text(condition))] + [_cell()] * (width - len(lead) - 1)))
+        return f"<h1>{_text(title)}</h1>" + _table(rows)
+
+
+class ConfluencePublisher:
+    """
+    Creates pages and uploads attachments through the Confluence REST API
+    (/rest/api/content). Requests share one pooled session sized for
+    `max_workers` concurrent uploads.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        user: str,
+        api_token: str,
+        space_key: str,
+        parent_id: Optional[str] = None,
+        max_workers: int = 6,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.auth = (user, api_token)
+        self.space_key = space_key
+        self.parent_id = parent_id
+        self.max_workers = max_workers
+        self.endpoint = endpoint_key(self.base_url)
+        self.session = get_session("confluence", pool_maxsize=max_workers)
+
+    def _page_request(self, title: str, body: str, version: Optional[int] = None) -> bytes:
+        payload = {
+            "type": "page",
+            "title": title,
+            "space": {"key": self.space_key},
+            "body": {"storage": {"representation": "storage", "value": body}},
+        }
+        if version is not None:
+            payload["version"] = {"number": version}
+        if self.parent_id:
+            payload["ancestors"] = [{"id": str(self.parent_id)}]
+        return json.dumps(payload).encode("utf-8")
+
+    def find_page(self, title: str) -> Optional[Dict[str, Any]]:
+        """The page titled `title` in this space (with its version), or None."""
+        url = f"{self.base_url}/rest/api/content"
+        params = {"spaceKey": self.space_key, "title": title, "expand": "version"}
+        with span("http.get", kind=KIND_CLIENT, **{"http.url": url, "url.type": "confluence_page"}) as s:
+            response = self.session.get(url, params=params, auth=self.auth, headers={"Accept": "application/json"}, timeout=30)
+            record_response(s, response)
+        response.raise_for_status()
+        results = response.json().get("results") or []
+        return results[0] if results else None
+
+    def save_page(self, title: str, body: str) -> Dict[str, Any]:
+        """
+        Create the page titled `title` with an already generated storage-format
+        body, or update it if it exists. Every attempt looks the title up
+        first, so publishing a task again updates its page, and a retry after
+        a create whose response was lost updates the page that was made
+        instead of failing on the duplicate title.
+        """
+        def attempt():
+            page = self.find_page(title)
+            if page is None:
+                return self._send_page("post", f"{self.base_url}/rest/api/content", self._page_request(title, body))
+            version = page.get("version", {}).get("number", 1) + 1
+            return self._send_page("put", f"{self.base_url}/rest/api/content/{page['id']}", self._page_request(title, body, version))
+
+        return call_with_retry(attempt, self.endpoint, PAGE_RETRY_POLICY, f"Confluence page save {title!r}")
+
+    def _send_page(self, method: str, url: str, data: bytes) -> Dict[str, Any]:
+        with span(f"http.{method}", kind=KIND_CLIENT, **{"http.url": url, "url.type": "confluence_page", "http.request.bytes": len(data)}) as s:
+            response = self.session.request(
+                method.upper(),
+                url,
+                data=data,
+                auth=self.auth,
+                headers={"Content-Type": "application/json", "Accept": "application/json"},
+                timeout=120,
+            )
+            record_response(s, response)
+        response.raise_for_status()
+        return response.json()
+
+    def _upload(self, page_id: str, filename: str, source_url: str) -> str:
+        def fetch():
+            with span("http.get", kind=KIND_CLIENT, **{"http.url": source_url, "url.type": "attachment_source"}) as s:
+                response = get_session().get(source_url, timeout=30)
+                record_response(s, response)
+            response.raise_for_status()
+            return response.content
+
+        content = call_with_retry(fetch, endpoint_key(source_url), ATTACHMENT_RETRY_POLICY, f"Attachment download {filename}")
+        url = f"{self.base_url}/rest/api/content/{page_id}/child/attachment"
+
+        def upload():
+            # PUT creates the attachment or adds a version to an existing one of the same name,
+            # so retries and republished pages don't fail on duplicate filenames
+            with span("http.put", kind=KIND_CLIENT, **{"http.url": url, "url.type": "confluence_attachment"}) as s:
+                response = self.session.put(
+                    url,
+                    files={"file": (filename, content, "image/png")},
+                    data={"minorEdit": "true"},
+                    auth=self.auth,
+                    # Confluence rejects attachment uploads without this XSRF opt-out
+                    headers={"X-Atlassian-Token": "no-check"},
+                    timeout=60,
+                )
+                record_response(s, response)
+            response.raise_for_status()
+            return filename
+
+        return call_with_retry(upload, self.endpoint, ATTACHMENT_RETRY_POLICY, f"Attachment upload {filename}")
+
+    def upload_attachments(self, page_id: str, attachments: Dict[str, str]) -> Dict[str, str]:
+        """Upload filename -> source URL pairs in parallel. Returns the filenames that failed, with their errors."""
+        def upload_one(item):
+            filename, source_url = item
+            try:
+                self._upload(page_id, filename, source_url)
+                return filename, None
+            except Exception as e:
+                log.warning(f"Attachment {filename} failed: {e}")
+                return filename, str(e)
+
+        if not attachments:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(attachments))) as pool:
+            results = list(pool.map(bind(upload_one), attachments.items()))
+        return {filename: error for filename, error in results if error}
+
+    def page_url(self, page: Dict[str, Any]) -> str:
+        links = page.get("_links", {})
+        base = links.get("base", self.base_url)
+        return f"{base}{links['webui']}" if links.get("webui") else f"{self.base_url}/pages/viewpage.action?pageId={page['id']}"
+
+    def publish(self, title: str, exporter: ConfluenceStorageExporter, clickup_data: Dict[str, Any], figma_data: Dict[str, Any]) -> str:
+        """Render the exporter's page body, create or update the page, upload its images, and return the page URL."""
+        with span("confluence.publish", screens=len(figma_data.get("screens", []))) as s:
+            # Generated before the request opens, so the POST isn't held open across GPT calls
+            body = exporter.render(clickup_data, figma_data)
+            page = self.save_page(title, body)
+            failed = self.upload_attachments(page["id"], exporter.attachments)
+            s.set("confluence.attachments", len(exporter.attachments))
+            s.set("confluence.attachments_failed", len(failed))
+        if failed:
+            log.warning(f"{len(failed)}/{len(exporter.attachments)} attachments failed for page {page['id']}")
+        url = self.page_url(page)
+        log.info(f"Published Confluence page: {url}")
+        return url
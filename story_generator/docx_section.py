@@ -1,5 +1,6 @@
 # modules/story_generator/docx_sections.py
-import requests
+import hashlib
+import logging
 from io import BytesIO
 from datetime import datetime
 from typing import Dict, List, Any
@@ -7,12 +8,100 @@ from docx import Document
 from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from .docx_helper import _make_cell_bold, _merge_cells
+from http_client import get_session
+from tracing import KIND_CLIENT, record_response, record_usage, span
+
+log = logging.getLogger(__name__)
+
+# Static section content, shared with the Confluence storage-format exporter
+ACCEPTANCE_HEADER_ROWS = [
+    ["ID", "", "", "", ""],
+    ["Name", "", "", "", ""],
+    ["Business Use Case", "", "", "", ""],
+    ["Module/Submodule/Feature", "Current Screen", "Figma Screenshot", "Business Rules", "Comments"]
+]
+
+ACCEPTANCE_FOOTER_ROWS = ["Permissions", "Dashboard Notifications"]
+
+BA_CROSS_CHECK_HEADERS = ["SL No.", "Condition", "Covered/Yes/No/NA", "Comments"]
+
+BA_CROSS_CHECK_CONDITIONS = [
+    "Are all flow with Business Rules covered?",
+    "Is Figma as per standard?",
+    "Are all attached Screenshots as per latest Figma?",
+    "Is permission section Covered",
+    "Is Dashboard Notification Covered?",
+    "Is Email Notification Covered? With respective email link navigation.",
+    "Is all other functionality impact covered?",
+    "Is history impact covered?",
+    "Mobile Scope is Defined?",
+    "Admin/Super Admin impact are covered?",
+    "Is Correct Figma Link attached in the story?",
+    "Is Story in Published Mode?",
+    "Is Published Story link attached in the Click up?"
+]
+
+PO_ACCEPTANCE_HEADERS = ["Condition", "Covered(Yes/No/NA)", "Comments"]
+
+PO_ACCEPTANCE_CONDITIONS = [
+    "Functional Flow and Dependencies Covered?",
+    "Figma covered for all the scenarios for Web and Mobile both?",
+    "UI Elements explained?",
+    "Validations covered?",
+    "Decisions covered for existing data / flow ? (if existing flow / data behavior is going to be impacted)",
+    "Admin / Super Admin touchpoints covered?",
+    "Roles / Rights / Permissions covered?",
+    "Email / Notification content covered?",
+    "Mobile Scope defined?"
+]
+
+
+def precondition_rows(screen_name: str) -> List[tuple]:
+    return [
+        ("", "Precondition"),
+        ("1", "User has logged in to the System as Tenant or Tenant User"),
+        ("2", "User's role has permissions associated with this screen"),
+        ("3", f"User has navigated to {screen_name}")
+    ]
+
+
+def reference_requirement_lines(clickup_data: Dict) -> List[str]:
+    data_section = clickup_data.get("data_requirements", "User data, System configuration")
+    mobile_section = clickup_data.get("mobile_scope", "Included in above requirements")
+    permissions_section = clickup_data.get("permissions_settings", "Standard permissions apply")
+    return [
+        f"1. Data: {data_section}",
+        f"2. Mobile: {mobile_section}",
+        f"3. Permissions/Notification Settings: {permissions_section}",
+    ]
+
 
 class DocxSections:
 
 
-    def __init__(self, story_generator):
+    def __init__(self, story_generator, rules_cache=None, on_row=None):
         self.story_generator = story_generator
+        # Optional on_row(index, total, row) callback, called as each screen's
+        # acceptance-criteria row (heading and business rules) is generated
+        self.on_row = on_row
+        # Optional dict-like store of generated step headings and business rules,
+        # keyed by a hash of their inputs, so resumed or incremental runs don't
+        # repeat GPT calls for screens whose summaries haven't changed
+        self.rules_cache = rules_cache
+
+    def _cache_key(self, kind: str, text: str) -> str:
+        return f"{kind}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _step_heading(self, frame_summary: str) -> str:
+        key = self._cache_key("heading", frame_summary)
+        if self.rules_cache is not None and key in self.rules_cache:
+            return self.rules_cache.get(key)
+
+        heading = self.story_generator.generate_step_heading(frame_summary)
+        # Don't persist the word-truncation fallback used when GPT fails
+        if self.rules_cache is not None and heading != " ".join(frame_summary.split()[:6]):
+            self.rules_cache[key] = heading
+        return heading
 
     def add_user_story_section(self, doc: Document, clickup_data: Dict):
         """Third Page - User Story with Preconditions (exact format)"""
@@ -38,13 +127,7 @@ class DocxSections:
         
         # Get screen name from ClickUp data
         screen_name = clickup_data.get("title", "[SCREEN_NAME]")
-        
-        preconditions_data = [
-            ("", "Precondition"),
-            ("1", "User has logged in to the System as Tenant or Tenant User"),
-            ("2", "User's role has permissions associated with this screen"), 
-            ("3", f"User has navigated to {screen_name}")
-        ]
+        preconditions_data = precondition_rows(screen_name)
         
         for i, (num, condition) in enumerate(preconditions_data):
             preconditions_table.cell(i, 0).text = str(num)
@@ -95,12 +178,14 @@ class DocxSections:
         """
 
             try:
-                response = self.story_generator.client.chat.completions.create(
-                    model=self.story_generator.config.deployment_name,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=350,
-                    temperature=0.4  # Lowered for more consistency
-                )
+                with span("llm.chat", kind=KIND_CLIENT, **{"llm.model": self.story_generator.config.deployment_name, "llm.purpose": "user_story"}) as s:
+                    response = self.story_generator.client.chat.completions.create(
+                        model=self.story_generator.config.deployment_name,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=350,
+                        temperature=0.4  # Lowered for more consistency
+                    )
+                    record_usage(s, response)
                 user_story = response.choices[0].message.content.strip()
 
                 # Clean up the response
@@ -122,7 +207,7 @@ class DocxSections:
                     return self._create_fallback_story(title, description, business_case)
 
             except Exception as e:
-                print(f"Error generating user story with OpenAI: {e}")
+                log.warning(f"Error generating user story with OpenAI: {e}")
                 return self._create_fallback_story(title, description, business_case)
     
    
@@ -140,12 +225,7 @@ class DocxSections:
             table.style = 'Table Grid'
             
             # Headers (exact format from your reference image)
-            headers_data = [
-                ["ID", "", "", "", ""],
-                ["Name", "", "", "", ""],
-                ["Business Use Case", "", "", "", ""],
-                ["Module/Submodule/Feature", "Current Screen", "Figma Screenshot", "Business Rules", "Comments"]
-            ]
+            headers_data = ACCEPTANCE_HEADER_ROWS
             
          
             for row_idx, headers in enumerate(headers_data):
@@ -165,14 +245,16 @@ class DocxSections:
                     break
                 
  
-                step_heading = self.story_generator.generate_step_heading(screen.get('frame_summary', ''))
+                step_heading = self._step_heading(screen.get('frame_summary', ''))
                 table.cell(row_idx, 0).text = f"{i + 1} {step_heading}"
 
           
                 frame_url = screen.get('frame_url', '')
                 cell_img = table.cell(row_idx, 2)
                 try:
-                    response = requests.get(frame_url, timeout=10)
+                    with span("http.get", kind=KIND_CLIENT, **{"http.url": frame_url, "url.type": "frame_image"}) as s:
+                        response = get_session().get(frame_url, timeout=10)
+                        record_response(s, response)
                     if response.status_code == 200:
                         image_bytes = BytesIO(response.content)
                         paragraph = cell_img.add_paragraph()
@@ -182,7 +264,7 @@ class DocxSections:
                     else:
                         cell_img.text = f"(Image unavailable: {response.status_code})"
                 except Exception as e:
-                    print(f" Error loading frame image: {e}")
+                    log.warning(f" Error loading frame image: {e}")
                     cell_img.text = "(Failed to load image)"
 
               
@@ -204,9 +286,11 @@ class DocxSections:
                     if j > 0 and (j - 1) < len(interactions):
                         to_url = interactions[j - 1].get("to_url", "")
                         if to_url:
-                            print(f" Adding to_url image: {to_url}")
+                            log.info(f" Adding to_url image: {to_url}")
                             try:
-                                response = requests.get(to_url, timeout=30)
+                                with span("http.get", kind=KIND_CLIENT, **{"http.url": to_url, "url.type": "destination_image"}) as s:
+                                    response = get_session().get(to_url, timeout=30)
+                                    record_response(s, response)
                                 if response.status_code == 200:
                                     image_bytes = BytesIO(response.content)
                                     img_para = cell.add_paragraph()
@@ -216,22 +300,28 @@ class DocxSections:
                                 else:
                                     cell.add_paragraph(f"(Image unavailable: {response.status_code})")
                             except Exception as e:
-                                print(f"⚠️ Error adding image from {to_url}: {e}")
+                                log.warning(f"⚠️ Error adding image from {to_url}: {e}")
                                 cell.add_paragraph(f"(Failed to load image: {to_url})")
 
                 cell.add_paragraph("")  # Add a small space at the end
                 table.cell(row_idx, 4).text = ""
+                self._report_row(i, len(screens), screen, step_heading, business_rules)
 
             last_content_row = 4 + len(screens)
-            if last_content_row < len(table.rows):
-                table.cell(last_content_row, 0).text = "Permissions"
-                _merge_cells(table, last_content_row, 0, last_content_row, 4)
-            
-            if last_content_row + 1 < len(table.rows):
-                table.cell(last_content_row + 1, 0).text = "Dashboard Notifications"
-                _merge_cells(table, last_content_row + 1, 0, last_content_row + 1, 4)
+            for offset, label in enumerate(ACCEPTANCE_FOOTER_ROWS):
+                if last_content_row + offset < len(table.rows):
+                    table.cell(last_content_row + offset, 0).text = label
+                    _merge_cells(table, last_content_row + offset, 0, last_content_row + offset, 4)
 
     
+    def _report_row(self, index: int, total: int, screen: Dict, heading: str, business_rules: str):
+        if self.on_row:
+            self.on_row(index, total, {
+                "frame_id": screen.get("frame_id"),
+                "heading": heading,
+                "business_rules": business_rules,
+            })
+
     def _generate_business_rules_from_screen(self, screen: Dict, clickup_data: Dict) -> str:
         """
         Generate rich business rules combining ClickUp narrative + Figma flow.
@@ -290,18 +380,26 @@ class DocxSections:
             Return ONLY the bullet points without any additional text.
             """
 
+        cache_key = self._cache_key("rules", prompt)
+        if self.rules_cache is not None and cache_key in self.rules_cache:
+            return self.rules_cache.get(cache_key)
+
         try:
-            response = self.story_generator.client.chat.completions.create(
-                model=self.story_generator.config.deployment_name,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=700,
-                temperature=0.35
-            )
+            with span("llm.chat", kind=KIND_CLIENT, **{"llm.model": self.story_generator.config.deployment_name, "llm.purpose": "business_rules"}) as s:
+                response = self.story_generator.client.chat.completions.create(
+                    model=self.story_generator.config.deployment_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=700,
+                    temperature=0.35
+                )
+                record_usage(s, response)
             business_rules = response.choices[0].message.content.strip()
+            if self.rules_cache is not None:
+                self.rules_cache[cache_key] = business_rules
             return business_rules
 
         except Exception as e:
-            print(f" GPT generation failed: {e}")
+            log.warning(f" GPT generation failed: {e}")
             return self._create_fallback_business_rules(frame_summary, interactions)
 
     def _create_fallback_business_rules(self, frame_summary: str, interactions: List[Dict]) -> str:
@@ -376,13 +474,8 @@ class DocxSections:
         doc.add_heading('Reference Requirements', 1)
         
         # Get data from ClickUp
-        data_section = clickup_data.get("data_requirements", "User data, System configuration")
-        mobile_section = clickup_data.get("mobile_scope", "Included in above requirements")
-        permissions_section = clickup_data.get("permissions_settings", "Standard permissions apply")
-        
-        doc.add_paragraph(f"1. Data: {data_section}")
-        doc.add_paragraph(f"2. Mobile: {mobile_section}")
-        doc.add_paragraph(f"3. Permissions/Notification Settings: {permissions_section}")
+        for line in reference_requirement_lines(clickup_data):
+            doc.add_paragraph(line)
 
     def add_ba_cross_check(self, doc: Document):
         """Sixth Page - BA Cross-Check List (exact format)"""
@@ -396,29 +489,12 @@ class DocxSections:
         table.cell(1, 0).text = "Review Date"
         
         # Sub-headers
-        sub_headers = ["SL No.", "Condition", "Covered/Yes/No/NA", "Comments"]
-        for i, header in enumerate(sub_headers):
+        for i, header in enumerate(BA_CROSS_CHECK_HEADERS):
             table.cell(2, i).text = header
             _make_cell_bold(table.cell(2, i))
         
         # Conditions (exact list from reference)
-        conditions = [
-            "Are all flow with Business Rules covered?",
-            "Is Figma as per standard?",
-            "Are all attached Screenshots as per latest Figma?",
-            "Is permission section Covered",
-            "Is Dashboard Notification Covered?",
-            "Is Email Notification Covered? With respective email link navigation.",
-            "Is all other functionality impact covered?",
-            "Is history impact covered?",
-            "Mobile Scope is Defined?",
-            "Admin/Super Admin impact are covered?",
-            "Is Correct Figma Link attached in the story?",
-            "Is Story in Published Mode?",
-            "Is Published Story link attached in the Click up?"
-        ]
-        
-        for i, condition in enumerate(conditions):
+        for i, condition in enumerate(BA_CROSS_CHECK_CONDITIONS):
             row_idx = i + 3
             if row_idx < len(table.rows):
                 table.cell(row_idx, 0).text = str(i + 1)
@@ -434,24 +510,11 @@ class DocxSections:
         table.cell(0, 0).text = "Reviewer"
         table.cell(1, 0).text = "Review Date"
         
-        sub_headers = ["Condition", "Covered(Yes/No/NA)", "Comments"]
-        for i, header in enumerate(sub_headers):
+        for i, header in enumerate(PO_ACCEPTANCE_HEADERS):
             table.cell(2, i).text = header
             _make_cell_bold(table.cell(2, i))
         
-        conditions = [
-            "Functional Flow and Dependencies Covered?",
-            "Figma covered for all the scenarios for Web and Mobile both?",
-            "UI Elements explained?",
-            "Validations covered?",
-            "Decisions covered for existing data / flow ? (if existing flow / data behavior is going to be impacted)",
-            "Admin / Super Admin touchpoints covered?",
-            "Roles / Rights / Permissions covered?",
-            "Email / Notification content covered?",
-            "Mobile Scope defined?"
-        ]
-        
-        for i, condition in enumerate(conditions):
+        for i, condition in enumerate(PO_ACCEPTANCE_CONDITIONS):
             row_idx = i + 3
             if row_idx < len(table.rows):
                 table.cell(row_idx, 0).text = condition
@@ -1,6 +1,7 @@
 # modules/story_generator/gpt_backend.py
-from openai import AzureOpenAI
+from clients import get_azure_openai
 from .config import StoryConfig
+from tracing import KIND_CLIENT, record_usage, span
 
 
 class ConfluenceStoryGenerator:
@@ -11,10 +12,11 @@ class ConfluenceStoryGenerator:
 
     def __init__(self, config: StoryConfig):
         self.config = config
-        self.client = AzureOpenAI(
-            api_key=config.azure_openai_key,
-            api_version=config.azure_api_version,
-            azure_endpoint=config.azure_openai_endpoint
+        # Shared per process, so the connection pool outlives this generator
+        self.client = get_azure_openai(
+            config.azure_openai_endpoint,
+            config.azure_openai_key,
+            config.azure_api_version,
         )
 
     def generate_step_heading(self, frame_summary: str) -> str:
@@ -27,12 +29,14 @@ class ConfluenceStoryGenerator:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.config.deployment_name,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=30,
-                temperature=0.3
-            )
+            with span("llm.chat", kind=KIND_CLIENT, **{"llm.model": self.config.deployment_name, "llm.purpose": "step_heading"}) as s:
+                response = self.client.chat.completions.create(
+                    model=self.config.deployment_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=30,
+                    temperature=0.3
+                )
+                record_usage(s, response)
             heading = response.choices[0].message.content.strip()
             return " ".join(heading.split()[:6])
         except Exception:
@@ -1,5 +1,6 @@
 # modules/story_generator/run_story_generator.py
 import logging
+from clients import azure_settings
 from configg import get_secret
 
 from .config import StoryConfig
@@ -7,24 +8,63 @@ from .confluence_agent import ConfluenceAgent
 from .generator_core import ConfluenceStoryGenerator
 
 log = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 
-def run_story_generation(clickup_processed, summarized_figma, base_path=None):
-    """Generate story using Azure OpenAI (works for local and cloud)"""
-    
+def _build_agent(base_path=None, rules_cache=None, on_row=None) -> ConfluenceAgent:
+    settings = azure_settings()
     config = StoryConfig(
-        azure_openai_key=get_secret("AZURE_OPENAI_API_KEY"),
-        azure_openai_endpoint=get_secret("AZURE_OPENAI_ENDPOINT"),
-        deployment_name=get_secret("AZURE_OPENAI_MODEL", "gpt-4o")
+        azure_openai_key=settings.api_key,
+        azure_openai_endpoint=settings.endpoint,
+        deployment_name=settings.story_model
     )
 
     story_generator = ConfluenceStoryGenerator(config)
-    agent = ConfluenceAgent(story_generator, base_path=base_path)
+    return ConfluenceAgent(story_generator, base_path=base_path, rules_cache=rules_cache, on_row=on_row)
+
+
+def render_story(clickup_processed, summarized_figma, rules_cache=None, on_row=None) -> bytes:
+    """
+    Generate the story and return the DOCX bytes without touching disk.
+    `on_row(index, total, row)` reports each screen's heading and business rules as they are generated.
+    """
+    agent = _build_agent(rules_cache=rules_cache, on_row=on_row)
+    doc = agent.generate_complete_story(
+        clickup_data=clickup_processed,
+        figma_data=summarized_figma
+    )
+    return agent.render_to_bytes(doc)
+
+
+def run_story_generation(clickup_processed, summarized_figma, base_path=None, rules_cache=None):
+    """Generate story using Azure OpenAI (works for local and cloud)"""
+    agent = _build_agent(base_path=base_path, rules_cache=rules_cache)
 
     doc = agent.generate_complete_story(
         clickup_data=clickup_processed,
         figma_data=summarized_figma
     )
 
-    return agent.save_story_to_file(doc)
\ No newline at end of file
+    return agent.save_story_to_file(doc)
+
+
+def publish_story(clickup_processed, summarized_figma, rules_cache=None, title=None, on_row=None) -> str:
+    """
+    Generate the story straight into a Confluence page (storage format, with
+    screenshots as attachments) and return the page URL. Uses the
+    CONFLUENCE_BASE_URL / _USER / _API_TOKEN / _SPACE_KEY (and optional
+    _PARENT_ID) settings.
+    """
+    # Imported here so the DOCX path doesn't load the Confluence backend
+    from .confluence_storage import ConfluencePublisher, ConfluenceStorageExporter
+
+    agent = _build_agent(rules_cache=rules_cache)
+    exporter = ConfluenceStorageExporter(agent.story_generator, rules_cache=rules_cache, on_row=on_row)
+    publisher = ConfluencePublisher(
+        base_url=get_secret("CONFLUENCE_BASE_URL"),
+        user=get_secret("CONFLUENCE_USER"),
+        api_token=get_secret("CONFLUENCE_API_TOKEN"),
+        space_key=get_secret("CONFLUENCE_SPACE_KEY"),
+        parent_id=get_secret("CONFLUENCE_PARENT_ID", "") or None,
+    )
+    title = title or clickup_processed.get("title") or "User Story"
+    return publisher.publish(title, exporter, clickup_processed, summarized_figma)
@@ -1,2 +1,20 @@
 # summarizer/__init__.py
+import importlib
+
 __all__ = ["run_summarizer", "SummarizerCore", "AzureVisionClient", "InteractionManager"]
+
+# Submodules load on first attribute access so importing the package stays cheap
+_EXPORTS = {
+    "run_summarizer": ".run_summarizer",
+    "SummarizerCore": ".summarizer_core",
+    "AzureVisionClient": ".azure_client",
+    "InteractionManager": ".interaction_manager",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
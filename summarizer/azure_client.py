@@ -1,38 +1,81 @@
 # summarizer/azure_client.py
-import time
+import json
 import logging
-from typing import Optional
-from openai import AzureOpenAI
+from typing import Dict, List, Optional
+from clients import get_azure_openai
 from configg import get_secret
+from resilience import CircuitOpenError, RetryPolicy, call_with_retry, classify_error, endpoint_key
+from singleflight import SingleFlight
+from tracing import KIND_CLIENT, record_usage, span
 
 log = logging.getLogger(__name__)
 
+# Identical summaries requested concurrently (same image, prompts and model) run once
+_summary_flight = SingleFlight("azure-summary")
+
+BATCH_INSTRUCTIONS = (
+    "You will receive {count} images, each preceded by a label 'Image <index>' (indexes start at 0). "
+    "Analyze every image independently using the instructions above. "
+    "Return ONLY a JSON object that maps each image index, as a string, to its analysis text, "
+    'e.g. {{"0": "...", "1": "..."}}.'
+)
+
 
 class AzureVisionClient:
-    
-    def __init__(self, model_name: str = None, api_key: str = None, azure_endpoint: str = None, api_version: str = None):
+
+    def __init__(
+        self,
+        model_name: str = None,
+        api_key: str = None,
+        azure_endpoint: str = None,
+        api_version: str = None,
+        image_fetcher=None,
+        inline_images: bool = False,
+        image_detail: str = "auto",
+        hedger=None
+    ):
         # Try parameters first, then fall back to config (works for local and cloud)
         self.api_key = api_key or get_secret("AZURE_OPENAI_API_KEY")
         self.azure_endpoint = azure_endpoint or get_secret("AZURE_OPENAI_ENDPOINT")
         self.api_version = api_version or get_secret("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
         self.model_name = model_name or get_secret("AZURE_OPENAI_MODEL_NAME")
-        
+
         if not (self.api_key and self.azure_endpoint and self.model_name):
             raise ValueError("Azure credentials and model must be provided")
-        
-        self.client = AzureOpenAI(
-            api_key=self.api_key,
-            azure_endpoint=self.azure_endpoint,
-            api_version=self.api_version
-        )
+
+        # Retries are handled by resilience.call_with_retry, not the SDK
+        self.client = get_azure_openai(self.azure_endpoint, self.api_key, self.api_version, max_retries=0)
+        self.endpoint = endpoint_key(self.azure_endpoint)
         self.log = logging.getLogger(__name__)
 
+        # When inline_images is set, images are fetched through our own pooled
+        # client and sent as downscaled base64 data URLs instead of remote URLs.
+        self.image_fetcher = image_fetcher
+        self.inline_images = inline_images and image_fetcher is not None
+        self.image_detail = image_detail
+
+        # Optional summarizer.hedging.Hedger that duplicates slow calls
+        self.hedger = hedger
+
+    def _send(self, call):
+        return self.hedger.call(call) if self.hedger else call()
+
+    def _image_part(self, url: str) -> dict:
+        image_url = {"url": url, "detail": self.image_detail}
+        if self.inline_images:
+            data_url = self.image_fetcher.fetch_data_url(url, self.image_detail)
+            if data_url:
+                image_url["url"] = data_url
+            else:
+                self.log.info("Sending remote URL for %s, inline fetch failed", url)
+        return {"type": "image_url", "image_url": image_url}
+
     def summarize(self, url: str, system_prompt: str, user_prompt: str, max_retries: int = 3, timeout: int = 300) -> Optional[str]:
         if not url:
             return None
 
-        for attempt in range(1, max_retries + 1):
-            try:
+        def call():
+            with span("llm.chat", kind=KIND_CLIENT, **{"llm.model": self.model_name, "llm.purpose": "image_summary", "llm.images": 1, "http.url": url}) as s:
                 response = self.client.chat.completions.create(
                     model=self.model_name,
                     messages=[
@@ -41,7 +84,7 @@ class AzureVisionClient:
                             "role": "user",
                             "content": [
                                 {"type": "text", "text": user_prompt},
-                                {"type": "image_url", "image_url": {"url": url}},
+                                self._image_part(url),
                             ],
                         },
                     ],
@@ -49,26 +92,126 @@ class AzureVisionClient:
                     max_tokens=4096,
                     timeout=timeout
                 )
-                # best-effort extraction
-                choice = getattr(response, "choices", None)
-                if choice:
-                    try:
-                        return response.choices[0].message.content.strip()
-                    except Exception:
-                        pass
-                # fallback: try JSON structure
-                data = getattr(response, "to_dict", lambda: {})()
-                text = None
-                try:
-                    text = data.get("choices", [])[0].get("message", {}).get("content", "").strip()
-                except Exception:
-                    text = None
-                return text or None
+                record_usage(s, response)
+                return response
+
+        def run():
+            try:
+                response = call_with_retry(lambda: self._send(call), self.endpoint, RetryPolicy(max_attempts=max_retries), f"Azure summarize for {url}")
+            except Exception as exc:
+                self.log.error("Azure summarize gave up for %s (%s): %s", url, classify_error(exc), exc)
+                return None
+            return self._extract_text(response)
+
+        return _summary_flight.do(self._flight_key(url, system_prompt, user_prompt), run)
+
+    def _flight_key(self, *parts: str) -> str:
+        return "\x1f".join([self.azure_endpoint, self.model_name, self.image_detail, *parts])
+
+    def summarize_batch(self, urls: List[str], system_prompt: str, user_prompt: str, max_retries: int = 3, timeout: int = 300) -> Dict[str, Optional[str]]:
+        """
+        Summarize several images of the same class in one chat completion.
+
+        The model is asked for a JSON object keyed by image index; any image
+        missing from the response is summarized with a single-image call.
+        """
+        urls = [u for u in dict.fromkeys(urls) if u]
+        if not urls:
+            return {}
+        if len(urls) == 1:
+            return {urls[0]: self.summarize(urls[0], system_prompt, user_prompt, max_retries, timeout)}
+
+        content = [{"type": "text", "text": f"{user_prompt}\n\n{BATCH_INSTRUCTIONS.format(count=len(urls))}"}]
+        for idx, url in enumerate(urls):
+            content.append({"type": "text", "text": f"Image {idx}:"})
+            content.append(self._image_part(url))
+
+        def call():
+            with span("llm.chat", kind=KIND_CLIENT, **{"llm.model": self.model_name, "llm.purpose": "image_summary_batch", "llm.images": len(urls)}) as s:
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": content},
+                    ],
+                    temperature=0.4,
+                    max_tokens=4096,
+                    response_format={"type": "json_object"},
+                    timeout=timeout
+                )
+                record_usage(s, response)
+                return response
 
+        def run() -> List[Optional[str]]:
+            # Summaries by position (a list, so it survives the cross-process JSON round trip)
+            parsed: Dict[int, str] = {}
+            try:
+                response = call_with_retry(lambda: self._send(call), self.endpoint, RetryPolicy(max_attempts=max_retries), f"Azure batch summarize for {len(urls)} images")
+                parsed = self._parse_batch_response(self._extract_text(response), len(urls))
+            except CircuitOpenError:
+                raise
             except Exception as exc:
-                self.log.warning("Azure summarize attempt %s/%s failed for %s: %s", attempt, max_retries, url, exc)
-                if attempt < max_retries:
-                    time.sleep(1.5 * attempt)
-                else:
-                    self.log.error("Azure summarize final failure for %s: %s", url, exc)
-                    return None
\ No newline at end of file
+                self.log.error("Azure batch summarize gave up for %s images (%s): %s", len(urls), classify_error(exc), exc)
+            return [parsed.get(idx) for idx in range(len(urls))]
+
+        try:
+            # The same batch requested concurrently (same images, prompts and model) is sent once
+            summaries = _summary_flight.do(self._flight_key("batch", *urls, system_prompt, user_prompt), run)
+        except CircuitOpenError as exc:
+            self.log.error("Azure batch summarize skipped: %s", exc)
+            return {url: None for url in urls}
+
+        results: Dict[str, Optional[str]] = {}
+        for idx, url in enumerate(urls):
+            summary = summaries[idx]
+            if not summary:
+                self.log.info("Batch response missing image %s, falling back to single call for %s", idx, url)
+                summary = self.summarize(url, system_prompt, user_prompt, max_retries, timeout)
+            results[url] = summary
+        return results
+
+    def _extract_text(self, response) -> Optional[str]:
+        # best-effort extraction
+        choice = getattr(response, "choices", None)
+        if choice:
+            try:
+                return response.choices[0].message.content.strip()
+            except Exception:
+                pass
+        # fallback: try JSON structure
+        data = getattr(response, "to_dict", lambda: {})()
+        text = None
+        try:
+            text = data.get("choices", [])[0].get("message", {}).get("content", "").strip()
+        except Exception:
+            text = None
+        return text or None
+
+    def _parse_batch_response(self, text: Optional[str], count: int) -> Dict[int, str]:
+        """Map image index -> summary from the model's JSON answer, ignoring malformed entries."""
+        if not text:
+            return {}
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            self.log.warning("Azure batch response was not valid JSON")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+
+        # Tolerate a single wrapper key such as {"images": {...}}
+        if len(data) == 1:
+            key, inner = next(iter(data.items()))
+            if isinstance(inner, dict) and not any(ch.isdigit() for ch in str(key)):
+                data = inner
+
+        parsed = {}
+        for key, value in data.items():
+            digits = "".join(ch for ch in str(key) if ch.isdigit())
+            if not digits or int(digits) >= count:
+                continue
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False)
+            if isinstance(value, str) and value.strip():
+                parsed[int(digits)] = value.strip()
+        return parsed
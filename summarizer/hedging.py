@@ -0,0 +1,109 @@
+# summarizer/hedging.py
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from tracing import bind
+
+log = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Rolling window of recent call latencies (seconds)."""
+
+    def __init__(self, size: int = 500):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[idx]
+
+
+class Hedger:
+    """
+    Runs a call and, if it is still pending after the `percentile`-th recent
+    latency, fires one duplicate and returns whichever succeeds first.
+
+    At most `max_hedge_ratio` of all calls are hedged, and nothing is hedged
+    until `min_samples` latencies have been observed.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        max_hedge_ratio: float = 0.1,
+        min_samples: int = 20,
+        min_delay: float = 0.5,
+        max_workers: int = 16,
+    ):
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.histogram = LatencyHistogram()
+        self.stats: Dict[str, int] = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if len(self.histogram) < self.min_samples:
+            return None
+        return max(self.min_delay, self.histogram.percentile(self.percentile))
+
+    def _reserve_hedge(self) -> bool:
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.max_hedge_ratio * self.stats["calls"]:
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def close(self):
+        """Stop the worker threads once in-flight calls have finished."""
+        self._pool.shutdown(wait=False)
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.stats["calls"] += 1
+
+        start = time.monotonic()
+        fn = bind(fn)
+        primary = self._pool.submit(fn)
+        delay = self._hedge_delay()
+
+        if delay is None or wait([primary], timeout=delay).done or not self._reserve_hedge():
+            result = primary.result()
+            self.histogram.record(time.monotonic() - start)
+            return result
+
+        log.info(f"Hedging request still pending after {delay:.2f}s")
+        hedge = self._pool.submit(fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self.stats["hedge_wins"] += 1
+                # The loser keeps running in the background; its result is dropped
+                self.histogram.record(time.monotonic() - start)
+                return future.result()
+        raise error
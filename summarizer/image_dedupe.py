@@ -0,0 +1,125 @@
+# summarizer/image_dedupe.py
+import io
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .image_fetcher import ImageFetcher
+
+log = logging.getLogger(__name__)
+
+
+def dhash(image_bytes: bytes, hash_size: int = 16) -> Tuple[int, Tuple[int, int]]:
+    """
+    Difference hash of an image plus its pixel size.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale grid and
+    each bit records whether a pixel is brighter than its right neighbour.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        size = img.size
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value, size
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ImageDeduplicator:
+    """
+    Clusters visually identical images so only one per cluster is summarized.
+
+    Two images are considered duplicates when their dHash distance
+    (`hash_size` x `hash_size` bits) is at most `threshold` bits and their
+    pixel sizes differ by no more than `size_tolerance`. The defaults are
+    strict on purpose: a coarser hash or looser threshold merges same-sized
+    controls with different labels ("Next" vs "Cancel"), and the wrong
+    summary is then reused silently.
+    """
+
+    def __init__(self, fetcher: ImageFetcher = None, threshold: int = 2, size_tolerance: float = 0.1, hash_size: int = 16):
+        self.fetcher = fetcher or ImageFetcher()
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.size_tolerance = size_tolerance
+        self.stats = {"images": 0, "hashed": 0, "clusters": 0, "saved_calls": 0}
+
+    def _hash(self, url: str, image_bytes: Optional[bytes]):
+        if not image_bytes:
+            return None
+        try:
+            return dhash(image_bytes, self.hash_size)
+        except Exception as e:
+            log.warning(f"Could not hash image {url}: {e}")
+            return None
+
+    def _similar_size(self, a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+        return all(
+            abs(x - y) <= self.size_tolerance * max(x, y, 1)
+            for x, y in zip(a, b)
+        )
+
+    def cluster(self, urls_by_class: Dict[str, List[str]]) -> Dict[str, str]:
+        """
+        Return a map of url -> representative url.
+
+        Images are only clustered within the same class (frame, element, ...)
+        because each class is summarized with a different prompt. Images that
+        fail to download or decode are their own representative.
+        """
+        all_urls = [u for urls in urls_by_class.values() for u in urls]
+        images = self.fetcher.fetch_many(all_urls)
+
+        representative: Dict[str, str] = {}
+        clusters = 0
+        hashed = 0
+
+        for urls in urls_by_class.values():
+            leaders: List[Tuple[str, int, Tuple[int, int]]] = []
+            for url in dict.fromkeys(urls):
+                if url in representative:
+                    continue
+                fingerprint = self._hash(url, images.get(url))
+                if fingerprint is None:
+                    representative[url] = url
+                    clusters += 1
+                    continue
+
+                hashed += 1
+                value, size = fingerprint
+                match = next(
+                    (
+                        leader for leader, leader_value, leader_size in leaders
+                        if hamming(value, leader_value) <= self.threshold
+                        and self._similar_size(size, leader_size)
+                    ),
+                    None,
+                )
+                if match:
+                    representative[url] = match
+                else:
+                    leaders.append((url, value, size))
+                    representative[url] = url
+                    clusters += 1
+
+        self.stats = {
+            "images": len(representative),
+            "hashed": hashed,
+            "clusters": clusters,
+            "saved_calls": len(representative) - clusters,
+        }
+        log.info(
+            f"Image dedupe: {self.stats['images']} images in {clusters} clusters, "
+            f"{self.stats['saved_calls']} vision calls saved."
+        )
+        return representative
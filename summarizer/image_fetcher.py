@@ -0,0 +1,103 @@
+# summarizer/image_fetcher.py
+import io
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from http_client import get_session
+from tracing import KIND_CLIENT, bind, record_response, span
+
+log = logging.getLogger(__name__)
+
+# Largest useful image size per vision `detail` level: (longest side, shortest side).
+# Azure resizes anything bigger before tokenizing, so sending more pixels only costs bandwidth.
+DETAIL_LIMITS: Dict[str, Tuple[int, int]] = {
+    "low": (512, 512),
+    "high": (2048, 768),
+    "auto": (2048, 768),
+}
+
+
+class ImageFetcher:
+    """
+    Downloads rendered Figma images over one pooled HTTP session and keeps
+    the bytes in memory for the rest of the run.
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: int = 30):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = get_session("images", pool_maxsize=max_workers)
+        self._cache: Dict[str, Optional[bytes]] = {}
+        self._data_urls: Dict[Tuple[str, str], Optional[str]] = {}
+
+    def fetch(self, url: str) -> Optional[bytes]:
+        """Return the image bytes for `url`, or None if it can't be downloaded."""
+        if url in self._cache:
+            return self._cache[url]
+
+        content = None
+        try:
+            with span("http.get", kind=KIND_CLIENT, **{"http.url": url, "url.type": "image"}) as s:
+                response = self.session.get(url, timeout=self.timeout)
+                record_response(s, response)
+            if response.status_code == 200:
+                content = response.content
+            else:
+                log.warning(f"Image download returned {response.status_code} for {url}")
+        except requests.exceptions.RequestException as e:
+            log.warning(f"Image download failed for {url}: {e}")
+
+        self._cache[url] = content
+        return content
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict[str, Optional[bytes]]:
+        """Download several images concurrently."""
+        pending = [u for u in dict.fromkeys(urls) if u and u not in self._cache]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(bind(self.fetch), pending))
+        return {u: self._cache.get(u) for u in urls if u}
+
+    def fetch_data_url(self, url: str, detail: str = "auto") -> Optional[str]:
+        """
+        Return the image as a base64 PNG data URL, downscaled to the largest
+        resolution the model uses at `detail`. None if it can't be fetched.
+        """
+        key = (url, detail)
+        if key in self._data_urls:
+            return self._data_urls[key]
+
+        data_url = None
+        image_bytes = self.fetch(url)
+        if image_bytes:
+            try:
+                data_url = "data:image/png;base64," + base64.b64encode(
+                    downscale(image_bytes, detail)
+                ).decode("ascii")
+            except Exception as e:
+                log.warning(f"Could not encode image {url}: {e}")
+
+        self._data_urls[key] = data_url
+        return data_url
+
+
+def downscale(image_bytes: bytes, detail: str = "auto") -> bytes:
+    """Shrink an image to fit the model's resolution limits for `detail` and re-encode as PNG."""
+    from PIL import Image
+
+    max_long, max_short = DETAIL_LIMITS.get(detail, DETAIL_LIMITS["auto"])
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        width, height = img.size
+        scale = min(1.0, max_long / max(width, height), max_short / max(min(width, height), 1))
+        if scale < 1.0:
+            img = img.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+        elif img.format == "PNG":
+            return image_bytes
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+        out = io.BytesIO()
+        img.save(out, format="PNG", optimize=False)
+        return out.getvalue()
@@ -1,6 +1,8 @@
 import logging
 import time
-from typing import Dict, List, Callable, Tuple
+from typing import Dict, List, Callable, Optional, Tuple
+
+from tracing import span
 
 log = logging.getLogger(__name__)
 
@@ -13,35 +15,47 @@ class InteractionManager:
         azure_client,
         prompt_selector: Callable[[str], Tuple[str, str]],
         batch_size: int = 6,
-        inter_batch_sleep: float = 1.2
+        inter_batch_sleep: float = 1.2,
+        batch_images: bool = False,
+        deduplicator=None,
+        summary_cache=None
     ):
         self.data = data or {}
         self.azure = azure_client
         self.prompt_selector = prompt_selector
         self.batch_size = batch_size
         self.inter_batch_sleep = inter_batch_sleep
+        self.batch_images = batch_images
+        self.deduplicator = deduplicator
+        self.dedupe_stats: Dict[str, int] = {}
+        # Optional dict-like store (e.g. a CheckpointJournal) of url -> summary.
+        # Cached URLs are not re-summarized and every new summary is written through.
+        self.summary_cache = summary_cache
+        self._url_classes = self._index_urls()
 
     def _is_valid_url(self, url: str) -> bool:
         return isinstance(url, str) and url.startswith(("http://", "https://"))
 
-    def _classify_url(self, url: str) -> str:
-        if url in self.data:
-            return "frame"
-
+    def _index_urls(self) -> Dict[str, str]:
+        """url -> "frame" / "element" / "destination"; frame URLs win, then the first element that uses the URL."""
+        classes = {}
         for frame_val in self.data.values():
             for el in frame_val.get("elements", []):
-                if el.get("from_url") == url:
-                    return "element"
-                if el.get("to_url") == url:
-                    return "destination"
+                classes.setdefault(el.get("from_url"), "element")
+                classes.setdefault(el.get("to_url"), "destination")
+        for frame_val in self.data.values():
+            if frame_val.get("frame_url"):
+                classes[frame_val["frame_url"]] = "frame"
+        return classes
 
-        return "general"
+    def _classify_url(self, url: str) -> str:
+        return self._url_classes.get(url, "general")
 
     def collect_interaction_groups(self) -> List[Dict]:
         groups = []
 
-        for frame_url, frame_data in self.data.items():
-
+        for frame_id, frame_data in self.data.items():
+            frame_url = frame_data.get("frame_url")
             urlset = {frame_url} if self._is_valid_url(frame_url) else set()
 
             for element in frame_data.get("elements", []):
@@ -51,6 +65,7 @@ class InteractionManager:
                     urlset.add(element["to_url"])
 
             groups.append({
+                "frame_id": frame_id,
                 "frame_url": frame_url,
                 "urls": list(urlset),
                 "element_count": len(frame_data.get("elements", []))
@@ -59,11 +74,81 @@ class InteractionManager:
         groups.sort(key=lambda x: x["element_count"])
         return groups
 
-    def process_groups(self, groups: List[Dict]):
-        """ ALWAYS summarize fresh. No caching. """
-        summary_map = {}
+    def process_groups(self, groups: List[Dict], on_group: Optional[Callable[[int, Dict[str, str]], None]] = None):
+        """
+        ALWAYS summarize fresh, apart from URLs already saved in summary_cache.
+
+        `on_group(index, summaries)` is called as soon as each group's URLs are
+        all summarized, with url -> summary for that group, so callers can show
+        results before the whole run finishes.
+        """
+        original = groups
+        cached = {}
+        if self.summary_cache is not None:
+            cached = {
+                url: self.summary_cache.get(url)
+                for group in groups for url in group["urls"]
+                if self.summary_cache.get(url)
+            }
+            if cached:
+                log.info(f"Reusing {len(cached)} saved summaries.")
+                groups = [{**g, "urls": [u for u in g["urls"] if u not in cached]} for g in groups]
+
+        def notify(index: int, summary_map: Dict[str, str], representative: Dict[str, str] = None):
+            if on_group is None:
+                return
+            representative = representative or {}
+            on_group(index, {
+                url: cached.get(url) or summary_map.get(representative.get(url, url), "")
+                for url in original[index]["urls"]
+            })
+
+        return {**cached, **self._process_uncached(groups, notify)}
+
+    def _process_uncached(self, groups: List[Dict], notify: Callable):
+        if not self.deduplicator:
+            return self._summarize_groups(groups, notify)
 
+        # Summarize one representative per cluster of near-identical images
+        urls_by_class: Dict[str, List[str]] = {}
         for group in groups:
+            for url in group["urls"]:
+                urls_by_class.setdefault(self._classify_url(url), []).append(url)
+        with span("summarize.dedupe") as s:
+            representative = self.deduplicator.cluster(urls_by_class)
+            s.set("dedupe.clusters", self.deduplicator.stats.get("clusters"))
+            s.set("dedupe.saved_calls", self.deduplicator.stats.get("saved_calls"))
+        self.dedupe_stats = dict(self.deduplicator.stats)
+
+        seen = set()
+        rep_groups = []
+        for group in groups:
+            rep_urls = []
+            for url in group["urls"]:
+                rep = representative.get(url, url)
+                if rep not in seen:
+                    seen.add(rep)
+                    rep_urls.append(rep)
+            rep_groups.append({**group, "urls": rep_urls})
+
+        # A representative is always in the same or an earlier group, so each group resolves once it's done
+        summary_map = self._summarize_groups(rep_groups, lambda index, done: notify(index, done, representative))
+        for url, rep in representative.items():
+            self._record(summary_map, url, summary_map.get(rep, ""))
+        return summary_map
+
+    def _record(self, summary_map: Dict[str, str], url: str, summary: str):
+        summary_map[url] = summary
+        if summary and self.summary_cache is not None:
+            self.summary_cache[url] = summary
+
+    def _summarize_groups(self, groups: List[Dict], on_group_done: Optional[Callable] = None):
+        if self.batch_images:
+            return self._process_groups_batched(groups, on_group_done)
+
+        summary_map = {}
+
+        for index, group in enumerate(groups):
             urls = group["urls"]
 
             for i in range(0, len(urls), self.batch_size):
@@ -72,10 +157,48 @@ class InteractionManager:
                 for url in batch:
                     url_type = self._classify_url(url)
                     system_prompt, user_prompt = self.prompt_selector(url_type)
-                    summary = self.azure.summarize(url, system_prompt, user_prompt)
-                    summary_map[url] = summary or ""
+                    with span("summarize.image", **{"url.type": url_type}):
+                        summary = self.azure.summarize(url, system_prompt, user_prompt)
+                    self._record(summary_map, url, summary or "")
 
                 if i + self.batch_size < len(urls):
                     time.sleep(self.inter_batch_sleep)
 
+            if on_group_done:
+                on_group_done(index, summary_map)
+
+        return summary_map
+
+    def _process_groups_batched(self, groups: List[Dict], on_group_done: Optional[Callable] = None):
+        """Pack up to `batch_size` images of the same class into one vision request."""
+        summary_map = {}
+        request_count = 0
+
+        for index, group in enumerate(groups):
+            by_type: Dict[str, List[str]] = {}
+            for url in group["urls"]:
+                by_type.setdefault(self._classify_url(url), []).append(url)
+
+            batches = [
+                (url_type, urls[i:i + self.batch_size])
+                for url_type, urls in by_type.items()
+                for i in range(0, len(urls), self.batch_size)
+            ]
+
+            for n, (url_type, batch) in enumerate(batches):
+                system_prompt, user_prompt = self.prompt_selector(url_type)
+                with span("summarize.batch", **{"url.type": url_type, "llm.images": len(batch)}):
+                    summaries = self.azure.summarize_batch(batch, system_prompt, user_prompt)
+                for url in batch:
+                    self._record(summary_map, url, summaries.get(url) or "")
+                request_count += 1
+
+                if n + 1 < len(batches):
+                    time.sleep(self.inter_batch_sleep)
+
+            if on_group_done:
+                on_group_done(index, summary_map)
+
+        total_urls = sum(len(g["urls"]) for g in groups)
+        log.info(f"Summarized {total_urls} images in {request_count} batched vision requests.")
         return summary_map
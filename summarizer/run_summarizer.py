@@ -1,9 +1,9 @@
 import logging
+from configg import get_secret
 from summarizer.summarizer_core import SummarizerCore
 
-def run_summarizer(figma_preprocessed_data: dict) -> dict:
-   
-    logging.basicConfig(level=logging.INFO, format="%(message)s")
+def run_summarizer(figma_preprocessed_data: dict, summary_cache=None, previous_screens=None, on_screen=None) -> dict:
+    """Summarize preprocessed Figma frames; `on_screen(screen, done, total)` reports each screen as it completes."""
     log = logging.getLogger(__name__)
 
     if not isinstance(figma_preprocessed_data, dict):
@@ -11,8 +11,16 @@ def run_summarizer(figma_preprocessed_data: dict) -> dict:
 
     log.info(" Running Figma summarizer...")
 
-    summarizer = SummarizerCore(figma_data=figma_preprocessed_data)
-    summarized_data = summarizer.run()
+    # Image dedupe is opt-in: set SUMMARY_DEDUPE_THRESHOLD (bits, e.g. 2) to enable it
+    dedupe_threshold = str(get_secret("SUMMARY_DEDUPE_THRESHOLD", "")).strip()
+
+    summarizer = SummarizerCore(
+        figma_data=figma_preprocessed_data,
+        dedupe_threshold=int(dedupe_threshold) if dedupe_threshold else None,
+        summary_cache=summary_cache,
+        previous_screens=previous_screens
+    )
+    summarized_data = summarizer.run(on_screen=on_screen)
 
     log.info(" Summarization completed successfully.")
     return summarized_data
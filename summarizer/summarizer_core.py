@@ -2,41 +2,71 @@
 import json
 import logging
 from datetime import datetime, timezone
-from typing import Dict, Any
-from configg import get_secret
+from typing import Any, Callable, Dict, Optional
+from clients import azure_settings, get_hedger
 from .azure_client import AzureVisionClient
 from .interaction_manager import InteractionManager
+from .image_dedupe import ImageDeduplicator
+from .image_fetcher import ImageFetcher
 
 log = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(message)s")
 
 
 class SummarizerCore:
 
-    def __init__(self, figma_data: Dict[str, Any]):
+    def __init__(
+        self,
+        figma_data: Dict[str, Any],
+        batch_images: bool = True,
+        # Opt-in: near-duplicate images share one summary (see ImageDeduplicator)
+        dedupe_threshold: Optional[int] = None,
+        inline_images: bool = False,
+        image_detail: str = "auto",
+        hedge_percentile: Optional[float] = None,
+        hedge_max_ratio: float = 0.1,
+        summary_cache=None,
+        previous_screens: Optional[Dict[str, Dict[str, Any]]] = None,
+        # Pause between request batches, to stay under Azure rate limits
+        inter_batch_sleep: float = 1.2
+    ):
         self.data = figma_data or {}
+        # signature -> screen output from the previous run, for incremental reuse
+        self.previous_screens = previous_screens or {}
 
-        # Get Azure credentials (works for both local and cloud)
-        api_key = get_secret("AZURE_OPENAI_API_KEY")
-        endpoint = get_secret("AZURE_OPENAI_ENDPOINT")
-        api_version = get_secret("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
-        model_name = get_secret("AZURE_OPENAI_MODEL_NAME", "gpt-4o")
-
-        if not api_key or not endpoint:
+        # Get Azure credentials (works for both local and cloud), read once per process
+        settings = azure_settings()
+        if not settings.api_key or not settings.endpoint:
             raise ValueError("Azure credentials missing.")
 
+        # One pooled fetcher so dedupe and inline payloads download each image once
+        self.image_fetcher = ImageFetcher()
+
         self.azure_client = AzureVisionClient(
-            model_name=model_name,
-            api_key=api_key,
-            azure_endpoint=endpoint,
-            api_version=api_version
+            model_name=settings.vision_model,
+            api_key=settings.api_key,
+            azure_endpoint=settings.endpoint,
+            api_version=settings.api_version,
+            image_fetcher=self.image_fetcher,
+            inline_images=inline_images,
+            image_detail=image_detail,
+            hedger=(
+                get_hedger(hedge_percentile, hedge_max_ratio)
+                if hedge_percentile is not None else None
+            )
         )
 
         # Interaction manager WITHOUT CACHE
         self.manager = InteractionManager(
             data=self.data,
             azure_client=self.azure_client,
-            prompt_selector=self._prompt_selector
+            prompt_selector=self._prompt_selector,
+            batch_images=batch_images,
+            inter_batch_sleep=inter_batch_sleep,
+            deduplicator=(
+                ImageDeduplicator(fetcher=self.image_fetcher, threshold=dedupe_threshold)
+                if dedupe_threshold is not None else None
+            ),
+            summary_cache=summary_cache
         )
 
     def _prompt_selector(self, url_type: str):
@@ -64,39 +94,81 @@ class SummarizerCore:
         )
 
     
-    def run(self) -> Dict[str, Any]:
+    def _screen_output(self, group: Dict[str, Any], url_summary_map: Dict[str, str], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        frame_id = group.get("frame_id")
+        frame_url = group.get("frame_url")
+        frame = self.data.get(frame_id, {})
+        elements = frame.get("elements", [])
+
+        interactions = []
+        for i, el in enumerate(elements):
+            if previous:
+                prev_inter = previous["interactions"][i]
+                from_summary, to_summary = prev_inter.get("from_summary", ""), prev_inter.get("to_summary", "")
+            else:
+                from_summary = url_summary_map.get(el.get("from_url"), "")
+                to_summary = url_summary_map.get(el.get("to_url"), "")
+            interactions.append({
+                "from_summary": from_summary,
+                "to_summary": to_summary,
+                "to_url": el.get("to_url")
+            })
+
+        return {
+            "frame_url": frame_url,
+            "frame_id": frame_id,
+            "signature": frame.get("signature"),
+            "frame_summary": previous.get("frame_summary", "") if previous else url_summary_map.get(frame_url, ""),
+            "interactions": interactions
+        }
+
+    def run(self, on_screen: Optional[Callable[[Dict[str, Any], int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Summarize every screen. `on_screen(screen, done, total)` is called with
+        each screen's output as soon as it is ready: unchanged (reused) screens
+        first, then the rest as their images are summarized.
+        """
         log.info("🔹 Starting summarization ...")
 
         # collect grouped URLs
         groups = self.manager.collect_interaction_groups()
 
-        # summarize all URLs fresh
-        url_summary_map = self.manager.process_groups(groups)
+        # frames whose content and interactions are unchanged since the last run
+        reused = {}
+        for group in groups:
+            frame = self.data.get(group["frame_id"], {})
+            previous = self.previous_screens.get(frame.get("signature"))
+            if previous and len(previous.get("interactions", [])) == len(frame.get("elements", [])):
+                reused[group["frame_id"]] = previous
+        if reused:
+            log.info(f"Reusing summaries for {len(reused)}/{len(groups)} unchanged frames.")
+
+        screens_by_frame: Dict[str, Dict[str, Any]] = {}
+
+        def emit(group: Dict[str, Any], summaries: Dict[str, str]):
+            screen = self._screen_output(group, summaries, reused.get(group["frame_id"]))
+            screens_by_frame[group["frame_id"]] = screen
+            if on_screen:
+                on_screen(screen, len(screens_by_frame), len(groups))
+
+        # reused screens are ready straight away
+        for group in groups:
+            if group["frame_id"] in reused:
+                emit(group, {})
 
-        screens_output = []
+        # summarize all other URLs fresh, one screen at a time
+        fresh = [g for g in groups if g["frame_id"] not in reused]
+        self.manager.process_groups(fresh, on_group=lambda index, summaries: emit(fresh[index], summaries))
 
-        for group in groups:
-            frame_url = group.get("frame_url")
-            elements = self.data.get(frame_url, {}).get("elements", [])
-
-            interactions = []
-            for el in elements:
-                interactions.append({
-                    "from_summary": url_summary_map.get(el.get("from_url"), ""),
-                    "to_summary": url_summary_map.get(el.get("to_url"), ""),
-                    "to_url": el.get("to_url")
-                })
-
-            screens_output.append({
-                "frame_url": frame_url,
-                "frame_summary": url_summary_map.get(frame_url, ""),
-                "interactions": interactions
-            })
+        screens_output = [screens_by_frame[g["frame_id"]] for g in groups]
 
         final_output = {
             "metadata": {
                 "processed_at": datetime.now(timezone.utc).isoformat(),
-                "total_screens": len(screens_output)
+                "total_screens": len(screens_output),
+                "dedupe_clusters": self.manager.dedupe_stats.get("clusters", 0),
+                "dedupe_saved_calls": self.manager.dedupe_stats.get("saved_calls", 0),
+                "reused_frames": len(reused)
             },
             "screens": screens_output
         }
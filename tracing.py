@@ -0,0 +1,257 @@
+# tracing.py
+import os
+import json
+import time
+import secrets
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+SERVICE_NAME = "confluence-story-generator"
+DEFAULT_TRACE_DIR = os.path.join("data", "traces")
+
+# OTLP span kinds / status codes
+KIND_INTERNAL, KIND_CLIENT = 1, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_finished: Dict[str, List["Span"]] = {}
+_open_traces = set()
+_lock = threading.Lock()
+_span_end_hooks: List[Callable[["Span"], None]] = []
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"], kind: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    def set(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+class _NoopSpan:
+    """Returned outside an active trace so instrumented code never has to check."""
+    def set(self, key: str, value: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def on_span_end(hook: Callable[[Span], None]):
+    """Register a callback run for every finished span (e.g. to feed metrics)."""
+    _span_end_hooks.append(hook)
+
+
+def _finish(span: Span, token):
+    span.end_ns = time.time_ns()
+    _current_span.reset(token)
+    with _lock:
+        # Spans finishing after their trace was exported (e.g. a hedged loser) are dropped
+        if span.trace_id in _open_traces:
+            _finished.setdefault(span.trace_id, []).append(span)
+    for hook in _span_end_hooks:
+        try:
+            hook(span)
+        except Exception as e:
+            log.debug(f"Span hook failed: {e}")
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Start a new trace with a root span. Spans opened inside it become its children."""
+    root = Span(name, secrets.token_hex(16), None, KIND_INTERNAL, attributes)
+    with _lock:
+        _open_traces.add(root.trace_id)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.status, root.status_message = STATUS_ERROR, str(e)
+        raise
+    finally:
+        _finish(root, token)
+
+
+@contextmanager
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """Child span of the current span; a no-op when no trace is active."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+
+    child = Span(name, parent.trace_id, parent, kind, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.status, child.status_message = STATUS_ERROR, str(e)
+        raise
+    finally:
+        _finish(child, token)
+
+
+def bind(fn: Callable) -> Callable:
+    """Carry the current trace context into `fn` when it runs on another thread."""
+    ctx = contextvars.copy_context()
+    # A Context can only be entered by one thread at a time, so each call runs in its own copy
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+def record_usage(current, response):
+    """Copy token counts from an OpenAI response's `usage` onto a span."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    current.set("llm.prompt_tokens", getattr(usage, "prompt_tokens", None))
+    current.set("llm.completion_tokens", getattr(usage, "completion_tokens", None))
+    current.set("llm.total_tokens", getattr(usage, "total_tokens", None))
+
+
+def record_response(current, response):
+    """Copy status code and body size from an HTTP response onto a span."""
+    current.set("http.status_code", getattr(response, "status_code", None))
+    content = getattr(response, "content", None)
+    if content is not None:
+        current.set("http.response.bytes", len(content))
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(s: Span) -> Dict[str, Any]:
+    out = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": s.kind,
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": s.status, "message": s.status_message},
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+def export_otlp_json(trace_id: str, path: str) -> str:
+    """Write (and forget) all finished spans of a trace as an OTLP/JSON file."""
+    with _lock:
+        _open_traces.discard(trace_id)
+        spans = _finished.pop(trace_id, [])
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "tracing"},
+                "spans": [_otlp_span(s) for s in sorted(spans, key=lambda s: s.start_ns)],
+            }],
+        }]
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    return path
+
+
+def evict_traces(trace_dir: str = DEFAULT_TRACE_DIR, max_age: float = 7 * 24 * 3600, max_files: int = 1000) -> int:
+    """Delete exported traces older than `max_age` seconds, then the oldest beyond `max_files`; returns the count removed."""
+    entries = []
+    try:
+        names = os.listdir(trace_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(trace_dir, name)
+        if not name.endswith(".json"):
+            continue
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+
+    now = time.time()
+    entries.sort(reverse=True)
+    removed = 0
+    for i, (mtime, path) in enumerate(entries):
+        if i < max_files and now - mtime <= max_age:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    if removed:
+        log.info(f"Evicted {removed} old traces from {trace_dir}")
+    return removed
+
+
+def discard(trace_id: str):
+    """Drop a trace's spans without exporting them."""
+    with _lock:
+        _open_traces.discard(trace_id)
+        _finished.pop(trace_id, None)
+
+
+def waterfall_rows(otlp: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten an OTLP/JSON trace into rows (ms offsets from trace start, nesting depth) for display."""
+    spans = [
+        s
+        for rs in otlp.get("resourceSpans", [])
+        for ss in rs.get("scopeSpans", [])
+        for s in ss.get("spans", [])
+    ]
+    if not spans:
+        return []
+
+    by_id = {s["spanId"]: s for s in spans}
+    t0 = min(int(s["startTimeUnixNano"]) for s in spans)
+
+    def depth(s):
+        d = 0
+        while s.get("parentSpanId") in by_id:
+            s = by_id[s["parentSpanId"]]
+            d += 1
+        return d
+
+    rows = []
+    for i, s in enumerate(sorted(spans, key=lambda s: int(s["startTimeUnixNano"]))):
+        start = (int(s["startTimeUnixNano"]) - t0) / 1e6
+        end = (int(s["endTimeUnixNano"]) - t0) / 1e6
+        rows.append({
+            "row": i,
+            "span": f"{'  ' * depth(s)}{s['name']}",
+            "start_ms": round(start, 1),
+            "end_ms": round(end, 1),
+            "duration_ms": round(end - start, 1),
+            "error": s.get("status", {}).get("code") == STATUS_ERROR,
+            "attributes": {a["key"]: next(iter(a["value"].values())) for a in s.get("attributes", [])},
+        })
+    return rows
@@ -0,0 +1,155 @@
+# worker_pool.py
+import os
+import time
+import logging
+import argparse
+import traceback
+import multiprocessing
+from typing import List
+
+from job_queue import DEFAULT_DB_PATH, JobQueue, worker_name
+from tracing import DEFAULT_TRACE_DIR, evict_traces
+
+log = logging.getLogger(__name__)
+
+# An idle worker re-opens its API connections this often so they don't go cold between jobs,
+# but only for PREWARM_WINDOW after its last job; a quiet queue sends no traffic
+PREWARM_INTERVAL = 240.0
+PREWARM_WINDOW = 900.0
+
+
+class JobCancelled(Exception):
+    """Raised from a running job's callbacks once the job has been cancelled."""
+
+
+def worker_loop(db_path: str = DEFAULT_DB_PATH, poll_interval: float = 1.0):
+    """Claim and run story-generation jobs until the process is terminated."""
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Imported here so the Streamlit process never loads the pipeline just to start workers
+    from pipeline import output_backend, run_pipeline
+    from clients import prewarm
+    from configg import get_secret
+
+    # Every job exports a trace file; keep a bounded history of them
+    trace_limits = {
+        "max_age": float(get_secret("TRACE_MAX_AGE_DAYS", 7)) * 24 * 3600,
+        "max_files": int(get_secret("TRACE_MAX_FILES", 1000)),
+    }
+
+    queue = JobQueue(db_path)
+    name = worker_name()
+    log.info(f"Worker {name} started")
+    evict_traces(DEFAULT_TRACE_DIR, **trace_limits)
+    prewarm()
+    last_job = last_prewarm = time.monotonic()
+
+    while True:
+        job = queue.claim(name)
+        if job is None:
+            now = time.monotonic()
+            if now - last_prewarm > PREWARM_INTERVAL and now - last_job < PREWARM_WINDOW:
+                prewarm()
+                last_prewarm = now
+            time.sleep(poll_interval)
+            continue
+
+        job_id = job["id"]
+        params = job["params"]
+        log.info(f"Worker {name} running job {job_id}")
+        trace_file = os.path.join(DEFAULT_TRACE_DIR, f"job_{job_id}.json")
+        try:
+            output_file = run_pipeline(
+                params["clickup_task_id"],
+                params["figma_file_key"],
+                params["figma_node_id"],
+                progress=lambda stage: _set_stage(queue, job_id, stage),
+                trace_path=trace_file,
+                on_event=lambda kind, payload: _add_event(queue, job_id, kind, payload),
+                prefetched=params.get("prefetched"),
+                backend=params.get("output_backend"),
+            )
+            key = "page_url" if output_backend(params.get("output_backend")) == "confluence" else "output_file"
+            queue.complete(job_id, {key: output_file, "trace_file": trace_file})
+        except JobCancelled:
+            log.info(f"Job {job_id} was cancelled")
+        except Exception as e:
+            log.error(f"Job {job_id} failed: {e}")
+            queue.fail(job_id, f"{e}\n\n{traceback.format_exc()}")
+        evict_traces(DEFAULT_TRACE_DIR, **trace_limits)
+        last_job = last_prewarm = time.monotonic()
+
+
+def _set_stage(queue: JobQueue, job_id: str, stage: str):
+    if queue.is_cancelled(job_id):
+        raise JobCancelled(job_id)
+    queue.set_stage(job_id, stage)
+
+
+def _add_event(queue: JobQueue, job_id: str, kind: str, payload: dict):
+    # Checked on every partial result, so a cancelled job stops within one screen
+    if queue.is_cancelled(job_id):
+        raise JobCancelled(job_id)
+    queue.add_event(job_id, kind, payload)
+
+
+class WorkerPool:
+    """Fixed-size pool of worker processes consuming the SQLite job queue."""
+
+    def __init__(self, num_workers: int = 2, db_path: str = DEFAULT_DB_PATH, poll_interval: float = 1.0):
+        self.num_workers = num_workers
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.processes: List[multiprocessing.Process] = []
+        self._ctx = multiprocessing.get_context("spawn")
+
+    def start(self) -> "WorkerPool":
+        JobQueue(self.db_path).requeue_orphans()
+        for i in range(self.num_workers):
+            proc = self._ctx.Process(
+                target=worker_loop,
+                args=(self.db_path, self.poll_interval),
+                name=f"story-worker-{i}",
+                daemon=True,
+            )
+            proc.start()
+            self.processes.append(proc)
+        log.info(f"Started {self.num_workers} story workers")
+        return self
+
+    def ensure_alive(self):
+        """Replace any worker process that has died."""
+        for i, proc in enumerate(self.processes):
+            if not proc.is_alive():
+                log.warning(f"Worker {proc.name} exited ({proc.exitcode}), restarting")
+                JobQueue(self.db_path).requeue_orphans()
+                replacement = self._ctx.Process(
+                    target=worker_loop,
+                    args=(self.db_path, self.poll_interval),
+                    name=proc.name,
+                    daemon=True,
+                )
+                replacement.start()
+                self.processes[i] = replacement
+
+    def stop(self):
+        for proc in self.processes:
+            proc.terminate()
+        for proc in self.processes:
+            proc.join(timeout=10)
+        self.processes = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run story-generation worker processes.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    pool = WorkerPool(args.workers, args.db).start()
+    try:
+        while True:
+            time.sleep(5)
+            pool.ensure_alive()
+    except KeyboardInterrupt:
+        pool.stop()